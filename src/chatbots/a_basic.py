@@ -1,13 +1,13 @@
-# External imports
-from openai import OpenAI
-
 from src.config.parameters import EXIT_WORDS
 
 # Internal imports
-from src.config.settings import OPENAI_API_KEY, OPENAI_COMPLETIONS_MODEL
+from src.config.settings import OPENAI_COMPLETIONS_MODEL
+from src.models_ia.answer_cache import cached_chat_completion
+from src.models_ia.clients import get_client
+from src.models_ia.conversation_memory import ConversationMemory, chat_summarizer
 
-# Set your OpenAI API key
-client = OpenAI(api_key=OPENAI_API_KEY, base_url="https://api.openai.com/v1")
+# OpenAI client (OPENAI_API_KEY), on the shared connection pool
+client = get_client("openai")
 
 
 def initial_message(welcome_message):
@@ -28,19 +28,6 @@ def initial_message(welcome_message):
     return messages
 
 
-def format_response(response):
-    """
-    Format the response from the model.
-
-    Args:
-        response (ChatResponse): The response from the model
-
-    Returns:
-        str: The formatted response
-    """
-    return response.choices[0].message.content
-
-
 def generate_response(message_history):
     """
     Generate a response from the model.
@@ -50,10 +37,12 @@ def generate_response(message_history):
         message_history (list): The message history
 
     Returns:
-        ChatResponse: The response from the model
+        str: The content of the response. Answers at temperature 0 come from the shared answer
+        cache when the same conversation was already answered.
     """
 
-    response = client.chat.completions.create(
+    response = cached_chat_completion(
+        client,
         model=OPENAI_COMPLETIONS_MODEL,  # Models: https://platform.openai.com/docs/models/overview
         messages=message_history,
         temperature=0,  # The temperature can range from 0 to 2.
@@ -71,13 +60,16 @@ def main() -> None:
     )
     print(f"🤖: {welcome_message}")
 
-    message_history = initial_message(welcome_message)
+    # Recent turns verbatim, older ones folded into a running summary (MEMORY_* parameters)
+    memory = ConversationMemory(
+        initial_message(welcome_message), chat_summarizer(client, OPENAI_COMPLETIONS_MODEL)
+    )
 
     while True:
         # Get user input
         print("🧑: ", end="")
         user_input = input()
-        message_history.append({"role": "user", "content": user_input})
+        memory.add("user", user_input)
 
         # Check if the conversation is complete
         if any(exit_keyword in user_input.lower() for exit_keyword in EXIT_WORDS):
@@ -85,12 +77,11 @@ def main() -> None:
             break
 
         # Generate and display the bot's response
-        response = generate_response(message_history)
-        bot_response = format_response(response)
+        bot_response = generate_response(memory.messages())
         print(f"🤖: {bot_response}")
 
         # Add the bot's response to the chat history
-        message_history.append({"role": "assistant", "content": bot_response})
+        memory.add("assistant", bot_response)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,12 @@
-# External imports
-from openai import OpenAI
-
 from src.config.parameters import EXIT_WORDS
 
 # Internal imports
-from src.config.settings import DEEPSEEK_API_KEY, DEEPSEEK_COMPLETIONS_MODEL
+from src.config.settings import DEEPSEEK_COMPLETIONS_MODEL
+from src.models_ia.clients import get_client
+from src.models_ia.conversation_memory import ConversationMemory, chat_summarizer
 
-# Set your OpenAI API key
-client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
+# DeepSeek client (DEEPSEEK_API_KEY), on the shared connection pool
+client = get_client("deepseek")
 
 
 def initial_message(welcome_message):
@@ -28,19 +27,6 @@ def initial_message(welcome_message):
     return messages
 
 
-def format_response(response):
-    """
-    Format the response from the model.
-
-    Args:
-        response (ChatResponse): The response from the model
-
-    Returns:
-        str: The formatted response
-    """
-    return response.choices[0].message.content
-
-
 def generate_response(message_history):
     """
     Generate a response from the model.
@@ -50,7 +36,7 @@ def generate_response(message_history):
         message_history (list): The message history
 
     Returns:
-        ChatResponse: The response from the model
+        str: The content of the response.
     """
 
     response = client.chat.completions.create(
@@ -62,7 +48,7 @@ def generate_response(message_history):
         frequency_penalty=0.0,
         presence_penalty=0.0,
     )
-    return response
+    return response.choices[0].message.content
 
 
 def main() -> None:
@@ -71,13 +57,16 @@ def main() -> None:
     )
     print(f"🤖: {welcome_message}")
 
-    message_history = initial_message(welcome_message)
+    # Recent turns verbatim, older ones folded into a running summary (MEMORY_* parameters)
+    memory = ConversationMemory(
+        initial_message(welcome_message), chat_summarizer(client, DEEPSEEK_COMPLETIONS_MODEL)
+    )
 
     while True:
         # Get user input
         print("🧑: ", end="")
         user_input = input()
-        message_history.append({"role": "user", "content": user_input})
+        memory.add("user", user_input)
 
         # Check if the conversation is complete
         if any(exit_keyword in user_input.lower() for exit_keyword in EXIT_WORDS):
@@ -85,12 +74,11 @@ def main() -> None:
             break
 
         # Generate and display the bot's response
-        response = generate_response(message_history)
-        bot_response = format_response(response)
+        bot_response = generate_response(memory.messages())
         print(f"🤖: {bot_response}")
 
         # Add the bot's response to the chat history
-        message_history.append({"role": "assistant", "content": bot_response})
+        memory.add("assistant", bot_response)
 
 
 if __name__ == "__main__":
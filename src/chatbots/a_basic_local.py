@@ -5,6 +5,7 @@ from src.config.parameters import EXIT_WORDS
 
 # Internal imports
 from src.local_llm.client_local import LocalAI
+from src.models_ia.conversation_memory import ConversationMemory, chat_summarizer
 
 # Initialize the LocalAI client
 # client = LocalAI(model_id="HuggingFaceTB/SmolLM2-1.7B-Instruct", by_api=False)
@@ -20,16 +21,20 @@ def initial_message(welcome_message):
     return messages
 
 
-def format_response(response):
-    return response.choices[0].message.content
-
-
 def generate_response(message_history):
-    # Generate a response from LocalAI
+    # Stream the response from LocalAI, printing the words as they are generated
     response = client.chat.completions.create(
         messages=message_history,
+        stream=True,
     )
-    return response
+    parts = []
+    for chunk in response:
+        content = chunk.choices[0].delta.content
+        if content:
+            print(content, end="", flush=True)
+            parts.append(content)
+    print()
+    return "".join(parts)
 
 
 def main() -> None:
@@ -38,13 +43,16 @@ def main() -> None:
     )
     print(f"🤖: {welcome_message}")
 
-    message_history = initial_message(welcome_message)
+    # Recent turns verbatim, older ones folded into a running summary (MEMORY_* parameters)
+    memory = ConversationMemory(
+        initial_message(welcome_message), chat_summarizer(client, client.model_id)
+    )
 
     while True:
         # Get user input
         print("🧑: ", end="")
         user_input = input()
-        message_history.append({"role": "user", "content": user_input})
+        memory.add("user", user_input)
 
         # Check if the conversation is complete
         if any(exit_keyword in user_input.lower() for exit_keyword in EXIT_WORDS):
@@ -52,12 +60,11 @@ def main() -> None:
             break
 
         # Generate and display the bot's response
-        response = generate_response(message_history)
-        bot_response = format_response(response)
-        print(f"🤖: {bot_response}")
+        print("🤖: ", end="", flush=True)
+        bot_response = generate_response(memory.messages())
 
         # Add the bot's response to the chat history
-        message_history.append({"role": "assistant", "content": bot_response})
+        memory.add("assistant", bot_response)
 
 
 if __name__ == "__main__":
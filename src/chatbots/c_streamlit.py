@@ -1,14 +1,12 @@
 # External imports
 import streamlit as st
-from openai import OpenAI
-from openai.types.chat.chat_completion import ChatCompletion
 
 # Internal imports
-from src.config.settings import OPENAI_API_KEY, OPENAI_COMPLETIONS_MODEL  # , DEEPSEEK_API_KEY
+from src.models_ia.conversation_memory import ConversationMemory, chat_summarizer
+from src.models_ia.router import get_router
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY, base_url="https://api.openai.com/v1")
-# client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com")
+# Route each answer to the fastest healthy backend (ROUTER_BACKENDS), hedging slow ones
+client = get_router()
 
 
 def initial_message(welcome_message: str) -> list:
@@ -20,13 +18,8 @@ def initial_message(welcome_message: str) -> list:
     return messages
 
 
-def format_response(response: ChatCompletion) -> str:
-    return response.choices[0].message.content
-
-
-def generate_response(message_history: list) -> ChatCompletion:
+def generate_response(message_history: list) -> str:
     response = client.chat.completions.create(
-        model=OPENAI_COMPLETIONS_MODEL,
         messages=message_history,
         temperature=0.7,
         top_p=1.0,
@@ -34,7 +27,7 @@ def generate_response(message_history: list) -> ChatCompletion:
         frequency_penalty=0.0,
         presence_penalty=0.0,
     )
-    return response
+    return response.choices[0].message.content
 
 
 def main() -> None:
@@ -44,6 +37,10 @@ def main() -> None:
     if "messages" not in st.session_state:
         welcome_message = "¡Hola! Soy tu chatbot. ¿En qué puedo ayudarte hoy?"
         st.session_state.messages = initial_message(welcome_message)
+        # What is sent to the model: recent turns verbatim, older ones summarized
+        st.session_state.memory = ConversationMemory(
+            st.session_state.messages, chat_summarizer(client)
+        )
 
     # Display chat history
     for message in st.session_state.messages[1:]:  # Skip the system message
@@ -54,6 +51,7 @@ def main() -> None:
     if prompt := st.chat_input("¿Qué te gustaría saber?"):
         # Add user message to chat history
         st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.memory.add("user", prompt)
 
         # Display user message
         with st.chat_message("user"):
@@ -61,13 +59,12 @@ def main() -> None:
 
         # Generate and display assistant response
         with st.chat_message("assistant"):
-            response = generate_response(st.session_state.messages)
-            print(type(response))
-            bot_response = format_response(response)
+            bot_response = generate_response(st.session_state.memory.messages())
             st.markdown(bot_response)
 
             # Add assistant response to chat history
             st.session_state.messages.append({"role": "assistant", "content": bot_response})
+            st.session_state.memory.add("assistant", bot_response)
 
 
 if __name__ == "__main__":
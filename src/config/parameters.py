@@ -13,4 +13,88 @@ EXIT_WORDS = [
 
 # PARAM FOR NAIVE RAG
 NAIVE_RAG_THRESHOLD = 0.25
-MAX_PAGES = 5
+RAG_TOP_K = 4  # Number of chunks retrieved per question
+
+# PARAM FOR VECTOR INDEX
+VECTOR_INDEX_MODE = "auto"  # 'exact', 'hnsw', 'ivf' or 'auto' (exact below ANN_MIN_CHUNKS)
+ANN_MIN_CHUNKS = 50_000  # Corpus size from which 'auto' switches to an approximate index
+HNSW_M = 32  # Neighbours per node of the HNSW graph
+HNSW_EF_CONSTRUCTION = 200  # Candidate list size while building the HNSW graph
+HNSW_EF_SEARCH = 64  # Candidate list size at query time (higher = better recall, slower)
+IVF_NPROBE = 16  # Inverted lists visited per query in IVF mode
+
+# PARAM FOR HYBRID (BM25 + DENSE) RETRIEVAL
+HYBRID_CANDIDATES = 20  # Candidates taken from each ranking before fusion
+HYBRID_RRF_K = 60  # Reciprocal rank fusion constant
+
+# PARAM FOR PROMPT CONTEXT
+CONTEXT_CANDIDATES = 12  # Chunks retrieved per question, packed into the context by score
+CONTEXT_MAX_TOKENS = 3_000  # Token budget of the retrieved context in the prompt
+CONTEXT_DUPLICATE_THRESHOLD = 0.8  # Word overlap (Jaccard) from which a chunk is a near-duplicate
+ANSWER_MAX_TOKENS = 256  # Maximum length of the generated answer
+ANSWER_TEMPERATURE = 0  # Sampling temperature of the answer (0 = deterministic, cacheable)
+
+# PARAM FOR ANSWER CACHE
+ANSWER_CACHE_TTL = 7 * 24 * 3600  # Seconds an answer is served from the cache
+ANSWER_CACHE_MAX_BYTES = 64 * 1024**2  # Size bound of the local answer cache
+
+# PARAM FOR QUESTION CACHE
+QUESTION_CACHE_THRESHOLD = 0.95  # Cosine similarity from which a past question's answer is reused
+QUESTION_CACHE_MAX_ENTRIES = 500  # Questions remembered per set of queried documents
+
+# PARAM FOR DOCUMENT EXTRACTION
+MAX_PAGES = None  # Optional page budget per PDF (None = every page, warns when pages are left)
+PDF_EXTRACTION_WORKERS = 4  # Worker processes extracting the pages of long PDFs
+PDF_PAGES_PER_TASK = 16  # Pages per worker task; PDFs up to this size are extracted serially
+TABULAR_BATCH_ROWS = 5_000  # CSV/Excel rows read, serialized and embedded at a time
+
+# PARAM FOR TABULAR QUERIES
+TABLE_FREE_TEXT_MIN_CHARS = 40  # Mean length from which a text column is embedded, not filtered
+TABLE_MAX_ROWS = 20  # Rows listed in the answer to a table query
+MAX_UPLOAD_BYTES = 200 * 1024**2  # Largest file opened in memory (Streamlit's default upload cap)
+
+# PARAM FOR INGESTION JOBS
+INGESTION_WORKERS = 2  # Documents processed at the same time, across all sessions
+INGESTION_JOB_TTL = 3600  # Seconds a finished job (and its result) is kept for sessions to pick up
+INGESTION_POLL_SECONDS = 1.0  # Refresh interval of the progress of a job in the app
+
+# PARAM FOR INDEX CACHE
+INDEX_CACHE_MAX_BYTES = 2 * 1024**3  # Loaded indexes kept in memory, shared by all sessions
+
+# PARAM FOR HTTP CLIENTS
+HTTP_MAX_CONNECTIONS = 100  # Connections open at once to the model APIs, shared by all clients
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20  # Idle connections kept warm for reuse
+HTTP_KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection is kept
+HTTP_CONNECT_TIMEOUT = 5.0  # Seconds to open a connection
+HTTP_READ_TIMEOUT = 60.0  # Seconds to wait for each part of a response
+
+# PARAM FOR CONVERSATION MEMORY
+MEMORY_MAX_TOKENS = 3_000  # Token budget of the history sent to the model on each turn
+MEMORY_RECENT_TOKENS = 1_500  # Recent turns kept verbatim before older ones are summarized
+MEMORY_MIN_RECENT_MESSAGES = 4  # Last messages never folded into the summary
+MEMORY_SUMMARY_MAX_TOKENS = 300  # Maximum length of the running summary of older turns
+
+# PARAM FOR MODEL ROUTER
+ROUTER_BACKENDS = [
+    "openai",
+    "deepseek",
+]  # Backends of the router, in order of preference ('local')
+ROUTER_LOCAL_MODEL_ID = "HuggingFaceTB/SmolLM2-1.7B-Instruct"  # Model of the 'local' backend
+ROUTER_WINDOW_SECONDS = 300  # Age of the requests kept in each backend's latency window
+ROUTER_WINDOW_SIZE = 100  # Requests kept at most in each backend's latency window
+ROUTER_MIN_SAMPLES = 5  # Requests from which a backend's p95 and error rate are trusted
+ROUTER_MAX_ERROR_RATE = 0.5  # Share of failed recent requests from which a backend is skipped
+ROUTER_HEDGE = True  # Send a request again to the next backend once its p95 has passed
+ROUTER_HEDGE_DELAY = 5.0  # Seconds before hedging while a backend's p95 is not yet measured
+
+# PARAM FOR LOCAL MODELS
+LOCAL_MODELS_MAX_BYTES = 8 * 1024**3  # Weights of the local models kept loaded, shared by LocalAI
+
+# PARAM FOR EMBEDDINGS
+EMBEDDINGS_DIMENSION = 1536  # Dimension of the small embeddings model
+EMBEDDINGS_BATCH_SIZE = 256  # Max number of paragraphs sent in a single embeddings request
+EMBEDDINGS_MAX_TOKENS_PER_REQUEST = 100_000  # Approximate token cap per embeddings request
+EMBEDDINGS_MAX_CONCURRENCY = 4  # Max embeddings requests in flight (lowered on HTTP 429)
+EMBEDDINGS_MAX_RETRIES = 5  # Retries of a rate-limited embeddings batch
+EMBEDDINGS_RETRY_BASE_DELAY = 1.0  # Seconds to wait after a 429 without retry-after header
+EMBEDDINGS_CACHE_MAX_BYTES = 512 * 1024**2  # Size bound of the local paragraph embedding cache
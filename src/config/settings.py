@@ -25,6 +25,7 @@ ORGANIZATION_ID = os.getenv("ORGANIZATION_ID", None)
 OPENAI_COMPLETIONS_MODEL = os.getenv("OPENAI_COMPLETIONS_MODEL", None)
 OPENAI_EMBEDDINGS_MODEL = os.getenv("OPENAI_EMBEDDINGS_MODEL", None)
 OPENAI_ASSISTANT_ID = os.getenv("OPENAI_ASSISTANT_ID", None)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # None = the SDK default (api.openai.com)
 
 # DEEPSEEK CREDENTIALS
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", None)
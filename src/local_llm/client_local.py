@@ -1,8 +1,76 @@
 # External imports
+from threading import Event, Thread
+from typing import Iterator
+
 import torch
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint, HuggingFacePipeline
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+# Internal imports
+from src.local_llm.model_registry import PIPELINE_KWARGS, LoadedModel, get_model_registry
+
+
+def to_langchain_messages(messages: list) -> list:
+    """
+    Convert OpenAI-style messages to LangChain message format.
+
+    Args:
+        messages (list): List of message dictionaries with role and content
+
+    Returns:
+        list: The LangChain messages
+    """
+    langchain_messages = []
+
+    for msg in messages:
+        role = msg["role"]
+        content = msg["content"]
+
+        if role == "system":
+            langchain_messages.append(SystemMessage(content=content))
+        elif role == "user":
+            langchain_messages.append(HumanMessage(content=content))
+        elif role == "assistant":
+            langchain_messages.append(AIMessage(content=content))
+    return langchain_messages
+
+
+def generation_kwargs(temperature: float | None = None, max_tokens: int | None = None) -> dict:
+    """
+    Returns the arguments of `model.generate` for a request, from the pipeline settings.
+
+    Args:
+        temperature (float | None): Sampling temperature. 0 decodes greedily (deterministic
+            answers); None keeps the pipeline's temperature.
+        max_tokens (int | None): Maximum number of new tokens (512 by default)
+
+    Returns:
+        dict: The generation settings.
+    """
+    kwargs = {k: v for k, v in PIPELINE_KWARGS.items() if k != "return_full_text"}
+    if max_tokens is not None:
+        kwargs["max_new_tokens"] = max_tokens
+    if temperature == 0:
+        kwargs["do_sample"] = False
+        del kwargs["temperature"]
+    elif temperature is not None:
+        kwargs["temperature"] = temperature
+    return kwargs
+
+
+class StopOnEvent(StoppingCriteria):
+    """
+    Stopping criterion that ends a generation once an event is set.
+    """
+
+    def __init__(self, event: Event) -> None:
+        self.event = event
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs):
+        return torch.full(
+            (input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device
+        )
 
 
 class Chat:
@@ -23,36 +91,100 @@ class ChatCompletions:
     def __init__(self, parent: "LocalAI") -> None:
         self.parent = parent
 
-    def create(self, messages: list = None, **kwargs):
+    def create(self, messages: list = None, stream: bool = False, **kwargs):
         """
         Create a chat completion similar to OpenAI's interface.
 
         Args:
             messages (list): List of message dictionaries with role and content
-            **kwargs: Additional arguments (ignored for simplicity)
+            stream (bool): Whether to return the answer as it is generated, chunk by chunk
+            **kwargs: Additional arguments. A local model honours temperature (0 decodes
+                greedily) and max_tokens; the others are ignored for simplicity, as are all of
+                them with the Hugging Face API.
 
         Returns:
-            ChatResponse: A response object containing the generated text
+            ChatResponse | Iterator[ChatCompletionChunk]: A response object containing the
+            generated text, or an iterator over the chunks of the text when streaming
         """
-        # Convert OpenAI-style messages to LangChain message format
-        langchain_messages = []
-
-        for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
+        temperature, max_tokens = kwargs.get("temperature"), kwargs.get("max_tokens")
+        if stream:
+            return self._stream(messages, max_tokens=max_tokens, temperature=temperature)
+
+        if self.parent.by_api:
+            # Generate response using LangChain
+            response = self.parent.chat_model.invoke(to_langchain_messages(messages))
+            # Format response to match OpenAI structure
+            return ChatResponse(response.content)
+
+        tokenizer, model, inputs = self._inputs(messages)
+        output = model.generate(**inputs, **generation_kwargs(temperature, max_tokens))
+        answer = output[0][inputs["input_ids"].shape[1] :]
+        return ChatResponse(tokenizer.decode(answer, skip_special_tokens=True))
+
+    def _inputs(self, messages: list) -> tuple:
+        """Returns the tokenizer, the model and the tokenized chat prompt of a local request."""
+        # Held for this answer only, so the registry can unload the model between requests
+        loaded = self.parent.loaded_model()
+        tokenizer, model = loaded.tokenizer, loaded.model
+        prompt = tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
+        )
+        return tokenizer, model, tokenizer(prompt, return_tensors="pt").to(model.device)
+
+    def _stream(
+        self, messages: list, max_tokens: int | None = None, temperature: float | None = None
+    ) -> Iterator["ChatCompletionChunk"]:
+        """
+        Stream a chat completion similar to OpenAI's `create(stream=True)`.
 
-            if role == "system":
-                langchain_messages.append(SystemMessage(content=content))
-            elif role == "user":
-                langchain_messages.append(HumanMessage(content=content))
-            elif role == "assistant":
-                langchain_messages.append(AIMessage(content=content))
+        The local model generates in a background thread and hands over its text through a
+        TextIteratorStreamer, so the first words are shown long before the whole answer is done.
+        If the consumer stops iterating (the generator is closed or garbage collected), the
+        generation stops at the next token instead of running on to max_new_tokens.
 
-        # Generate response using LangChain
-        response = self.parent.chat_model.invoke(langchain_messages)
+        Args:
+            messages (list): List of message dictionaries with role and content
+            max_tokens (int | None): Maximum number of new tokens (512 by default)
+            temperature (float | None): Sampling temperature, 0 for greedy decoding
 
-        # Format response to match OpenAI structure
-        return ChatResponse(response.content)
+        Yields:
+            ChatCompletionChunk: The pieces of the answer, then an empty chunk with finish_reason
+        """
+        if self.parent.by_api:
+            for chunk in self.parent.chat_model.stream(to_langchain_messages(messages)):
+                if chunk.content:
+                    yield ChatCompletionChunk(chunk.content)
+            yield ChatCompletionChunk(None, finish_reason="stop")
+            return
+
+        tokenizer, model, inputs = self._inputs(messages)
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        # Same generation settings as the non-streamed answers
+        kwargs = generation_kwargs(temperature, max_tokens)
+        cancelled = Event()
+        kwargs["stopping_criteria"] = StoppingCriteriaList([StopOnEvent(cancelled)])
+        errors = []
+
+        def generate() -> None:
+            try:
+                model.generate(**inputs, streamer=streamer, **kwargs)
+            except Exception as e:
+                # Unblock the consumer, which raises the error
+                errors.append(e)
+                streamer.end()
+
+        Thread(target=generate, daemon=True).start()
+        try:
+            for text in streamer:
+                if text:
+                    yield ChatCompletionChunk(text)
+        finally:
+            # Also reached on GeneratorExit, when the consumer closes the stream early
+            cancelled.set()
+        if errors:
+            raise errors[0]
+        yield ChatCompletionChunk(None, finish_reason="stop")
 
 
 class ChatResponse:
@@ -73,6 +205,25 @@ class Choice:
         self.message = Message(content)
 
 
+class ChatCompletionChunk:
+    """
+    A class to simulate OpenAI's streamed chunk structure.
+    """
+
+    def __init__(self, content: str | None, finish_reason: str | None = None) -> None:
+        self.choices = [ChunkChoice(content, finish_reason)]
+
+
+class ChunkChoice:
+    """
+    A class to simulate OpenAI's streamed choice structure.
+    """
+
+    def __init__(self, content: str | None, finish_reason: str | None = None) -> None:
+        self.delta = Message(content)
+        self.finish_reason = finish_reason
+
+
 class Message:
     """
     A class to simulate OpenAI's message structure.
@@ -114,14 +265,10 @@ class LocalAI:
                 "Memory total (MB):", torch.cuda.get_device_properties(0).total_memory / 1024**2
             )
 
-        # Initialize the model and tokenizer
+        # Load the model now, once per process and shared by all instances. It is not kept here:
+        # each request gets it from the registry, which may unload it in between (LOCAL_MODELS_*)
         if not self.by_api:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_id)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_id,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                device_map="auto" if self.device == "cuda" else None,
-            )
+            self.loaded_model()
 
         # Initialize pipeline and LangChain components
         self._init_pipeline()
@@ -129,11 +276,50 @@ class LocalAI:
         # Initialize the chat attribute to match OpenAI client structure
         self.chat = Chat(self)
 
+    def loaded_model(self) -> LoadedModel:
+        """Returns the local model from the registry. Use it for one request, do not keep it."""
+        return get_model_registry().get(self.model_id, device=self.device)
+
+    @property
+    def tokenizer(self):
+        """The tokenizer of the local model."""
+        return self.loaded_model().tokenizer
+
+    @property
+    def model(self):
+        """The local causal language model."""
+        return self.loaded_model().model
+
+    @property
+    def pipeline(self):
+        """The text-generation pipeline of the local model (see PIPELINE_KWARGS)."""
+        return self.loaded_model().pipeline
+
+    @property
+    def llm(self):
+        """
+        LangChain LLM of the model. For a local model it wraps the current pipeline: a chain that
+        keeps it also keeps the model in memory.
+        """
+        if self.by_api:
+            return self._endpoint
+        return HuggingFacePipeline(pipeline=self.pipeline)
+
+    @property
+    def chat_model(self):
+        """LangChain chat model of the model, built for each request of a local model."""
+        if self.by_api:
+            return self._chat_endpoint
+        loaded = self.loaded_model()
+        return ChatHuggingFace(
+            llm=HuggingFacePipeline(pipeline=loaded.pipeline), tokenizer=loaded.tokenizer
+        )
+
     def _init_pipeline(self) -> None:
-        """Initialize the text generation pipeline and LangChain components."""
+        """Initialize the LangChain components of the Hugging Face API."""
 
         if self.by_api:
-            self.llm = HuggingFaceEndpoint(
+            self._endpoint = HuggingFaceEndpoint(
                 repo_id=self.model_id,
                 task="text-generation",
                 max_new_tokens=512,
@@ -142,20 +328,5 @@ class LocalAI:
                 return_full_text=False,
                 repetition_penalty=1.03,
             )
-        else:
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_new_tokens=512,
-                temperature=0.7,
-                do_sample=True,  # when temperature used, do_sample is True
-                return_full_text=False,
-                repetition_penalty=1.03,
-            )
-
-            # Create LangChain HuggingFacePipeline
-            self.llm = HuggingFacePipeline(pipeline=self.pipeline)
-
-        # Create ChatHuggingFace model
-        self.chat_model = ChatHuggingFace(llm=self.llm)
+            # Create ChatHuggingFace model
+            self._chat_endpoint = ChatHuggingFace(llm=self._endpoint)
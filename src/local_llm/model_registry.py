@@ -0,0 +1,266 @@
+"""
+Process-wide registry of the local Hugging Face models used by LocalAI.
+
+Loading a model (tokenizer, weights and text-generation pipeline) takes seconds and as much memory
+as its weights. The registry loads each (model_id, dtype, device) once, on first use, and shares it
+between every LocalAI instance and thread of the process. Concurrent requests for a model being
+loaded wait for that load instead of starting another one; different models load in parallel.
+
+The load time and memory of each model are logged. The loaded models are kept within
+LOCAL_MODELS_MAX_BYTES: before a model is loaded, the least recently used ones are unloaded to make
+room for its weights (their size from a previous load, or from the safetensors metadata on the
+Hub), and again after the load if the estimate fell short. An unloaded model is loaded again the
+next time it is requested.
+
+The registry can only drop its own references: the memory of an unloaded model is released once
+no caller holds it. Callers must therefore not keep a LoadedModel, or its model, tokenizer or
+pipeline, beyond the request they serve, and get it again from the registry on the next one (as
+LocalAI does).
+"""
+
+# Standard imports
+import gc
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# Third party imports
+import torch
+from loguru import logger
+from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+# Internal imports
+from src.config.parameters import LOCAL_MODELS_MAX_BYTES
+
+# Generation settings of the text-generation pipelines (see client_local.LocalAI)
+PIPELINE_KWARGS = {
+    "max_new_tokens": 512,
+    "temperature": 0.7,
+    "do_sample": True,  # when temperature used, do_sample is True
+    "return_full_text": False,
+    "repetition_penalty": 1.03,
+}
+
+
+def default_device() -> str:
+    """Returns 'cuda' when a GPU is available, else 'cpu'."""
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def default_dtype(device: str) -> str:
+    """Returns the dtype the weights are loaded in: float16 on GPU, float32 on CPU."""
+    return "float16" if device == "cuda" else "float32"
+
+
+def estimate_nbytes(model_id: str, dtype: str) -> int | None:
+    """
+    Estimates the memory the weights of a model will take once loaded, before loading it.
+
+    Args:
+        model_id (str): The Hugging Face model ID.
+        dtype (str): dtype the weights will be loaded in.
+
+    Returns:
+        int | None: Parameter count from the safetensors metadata on the Hub times the size of
+        the dtype, or None when the metadata is not available (local folder, .bin weights...).
+    """
+    try:
+        from huggingface_hub import get_safetensors_metadata
+
+        metadata = get_safetensors_metadata(model_id)
+    except Exception as e:
+        logger.debug(f"No safetensors metadata for {model_id}: {e}")
+        return None
+    return sum(metadata.parameter_count.values()) * getattr(torch, dtype).itemsize
+
+
+def model_nbytes(model: torch.nn.Module) -> int:
+    """Returns the memory taken by the parameters and buffers of a model, in bytes."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+@dataclass
+class LoadedModel:
+    """
+    A local model loaded in memory.
+
+    Attributes:
+        model_id (str): The Hugging Face model ID.
+        dtype (str): dtype of the weights ('float16', 'float32'...).
+        device (str): 'cuda' or 'cpu'.
+        tokenizer: The model's tokenizer.
+        model: The causal language model.
+        pipeline: Text-generation pipeline over the model and tokenizer.
+        nbytes (int): Memory taken by the weights.
+        load_seconds (float): Time it took to load.
+    """
+
+    model_id: str
+    dtype: str
+    device: str
+    tokenizer: object
+    model: object
+    pipeline: object
+    nbytes: int
+    load_seconds: float
+
+
+@dataclass
+class _Slot:
+    """Registry entry of a model, loaded or being loaded."""
+
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    loaded: LoadedModel | None = None
+
+
+class ModelRegistry:
+    """Loads local models once and shares them. Safe to share between threads."""
+
+    def __init__(self, max_bytes: int = LOCAL_MODELS_MAX_BYTES) -> None:
+        """
+        Args:
+            max_bytes (int): Memory of the loaded models from which the least recently used ones
+                are unloaded.
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Models by (model_id, dtype, device), least recently used first
+        self._slots: OrderedDict[tuple[str, str, str], _Slot] = OrderedDict()
+        # Measured memory of the models loaded at least once, to make room before reloading them
+        self._sizes: dict[tuple[str, str, str], int] = {}
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the loaded models."""
+        with self._lock:
+            return sum(slot.loaded.nbytes for slot in self._slots.values() if slot.loaded)
+
+    def get(
+        self, model_id: str, dtype: str | None = None, device: str | None = None
+    ) -> LoadedModel:
+        """
+        Returns a model, loading it on first use.
+
+        Keep the result only for the current request and call `get` again for the next one:
+        a reference held longer keeps an unloaded model in memory.
+
+        Args:
+            model_id (str): The Hugging Face model ID.
+            dtype (str | None): dtype of the weights. Defaults to float16 on GPU, float32 on CPU.
+            device (str | None): 'cuda' or 'cpu'. Defaults to the GPU when available.
+
+        Returns:
+            LoadedModel: The model, its tokenizer and its text-generation pipeline.
+        """
+        device = device or default_device()
+        key = (model_id, dtype or default_dtype(device), device)
+        with self._lock:
+            slot = self._slots.setdefault(key, _Slot())
+            self._slots.move_to_end(key)
+
+        # Only the threads asking for this model wait for its load
+        with slot.lock:
+            if slot.loaded is None:
+                # Make room before loading: the weights are in memory as soon as they are read
+                incoming = self._sizes.get(key) or estimate_nbytes(key[0], key[1]) or 0
+                self._evict(keep=key, incoming=incoming)
+                slot.loaded = self._load(*key)
+                with self._lock:
+                    self._sizes[key] = slot.loaded.nbytes
+                # The estimate may have fallen short
+                self._evict(keep=key)
+            loaded = slot.loaded
+        return loaded
+
+    def _load(self, model_id: str, dtype: str, device: str) -> LoadedModel:
+        """Loads the tokenizer, the weights and the pipeline of a model."""
+        logger.info(f"Loading local model {model_id} ({dtype}, {device})")
+        start = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id,
+            torch_dtype=getattr(torch, dtype),
+            device_map="auto" if device == "cuda" else None,
+        )
+        generator = pipeline(
+            "text-generation", model=model, tokenizer=tokenizer, **PIPELINE_KWARGS
+        )
+        load_seconds = time.perf_counter() - start
+        nbytes = model_nbytes(model)
+
+        message = f"Loaded {model_id} in {load_seconds:.1f}s, {nbytes / 1024**2:.0f} MB of weights"
+        if device == "cuda":
+            message += f", {torch.cuda.memory_allocated() / 1024**2:.0f} MB allocated on the GPU"
+        logger.info(message)
+        return LoadedModel(
+            model_id, dtype, device, tokenizer, model, generator, nbytes, load_seconds
+        )
+
+    def _evict(self, keep: tuple[str, str, str], incoming: int = 0) -> None:
+        """
+        Unloads the least recently used models while the loaded ones exceed the budget.
+
+        Args:
+            keep (tuple[str, str, str]): Key of the model being requested, never unloaded.
+            incoming (int): Memory of a model about to be loaded, to make room for.
+        """
+        with self._lock:
+            loaded = {key: slot for key, slot in self._slots.items() if slot.loaded is not None}
+            total = sum(slot.loaded.nbytes for slot in loaded.values()) + incoming
+            evicted = []
+            for key in list(loaded):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                total -= loaded[key].loaded.nbytes
+                evicted.append(key)
+                del self._slots[key]
+        if evicted:
+            self._free(evicted)
+
+    def unload(self, model_id: str, dtype: str | None = None, device: str | None = None) -> None:
+        """Drops a model from the registry. Arguments are those of `get`."""
+        device = device or default_device()
+        key = (model_id, dtype or default_dtype(device), device)
+        with self._lock:
+            slot = self._slots.pop(key, None)
+        if slot is not None and slot.loaded is not None:
+            self._free([key])
+
+    def _free(self, keys: list[tuple[str, str, str]]) -> None:
+        # The memory is released once no caller holds the models anymore
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"Unloaded local models {[model_id for model_id, *_ in keys]}")
+
+    def stats(self) -> list[dict]:
+        """Returns the model ID, dtype, device, memory and load time of each loaded model."""
+        with self._lock:
+            return [
+                {
+                    "model_id": slot.loaded.model_id,
+                    "dtype": slot.loaded.dtype,
+                    "device": slot.loaded.device,
+                    "nbytes": slot.loaded.nbytes,
+                    "load_seconds": slot.loaded.load_seconds,
+                }
+                for slot in self._slots.values()
+                if slot.loaded is not None
+            ]
+
+
+_default_registry: ModelRegistry | None = None
+_default_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Returns the process-wide model registry, creating it on first use."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+        return _default_registry
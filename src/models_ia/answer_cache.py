@@ -0,0 +1,242 @@
+"""
+Persistent exact-match cache of chat completion answers.
+
+The helpdesk gets the same questions about the same manuals every shift. Deterministic requests
+(temperature 0) are answered from a local SQLite database under DATA_PATH instead of paying a
+new round trip. Each request is keyed by the sha256 of its model, temperature, sampling
+parameters and messages, or of a caller-provided key. The RAG answer, for instance, is keyed by
+its system prompt, question and ordered context chunk ids. Entries expire after
+ANSWER_CACHE_TTL seconds. When the database grows beyond ANSWER_CACHE_MAX_BYTES, the least
+recently used answers are evicted. Requests without a model name (the model router, whose backends
+answer with their own models) are not cached: their key could not tell those answers apart.
+
+`cached_chat_completion` and `cached_chat_completion_stream` wrap `client.chat.completions.create`
+for any OpenAI-compatible client, and are shared by the RAG app and the chatbot scripts.
+"""
+
+# Standard imports
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterator
+
+# Third party imports
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import ANSWER_CACHE_MAX_BYTES, ANSWER_CACHE_TTL
+from src.config.settings import DATA_PATH
+
+ANSWER_CACHE_PATH = os.path.join(DATA_PATH, "answers", "answer_cache.sqlite")
+
+
+def request_key(model: str, temperature: float, key: dict | list, **params) -> str:
+    """
+    Returns the cache key of a chat completion request.
+
+    Args:
+        model (str): The chat model name.
+        temperature (float): The sampling temperature.
+        key (dict | list): What identifies the request: its messages, or a caller-provided key.
+        **params: Other parameters that change the answer (max_tokens, top_p...).
+
+    Returns:
+        str: The sha256 hexadecimal key.
+    """
+    request = {"model": model, "temperature": temperature, "key": key, "params": params}
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with TTL and size eviction. Safe to share between threads."""
+
+    def __init__(
+        self,
+        path: str = ANSWER_CACHE_PATH,
+        max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+        ttl: float = ANSWER_CACHE_TTL,
+    ) -> None:
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+            max_bytes (int): Maximum total size of the stored answers before eviction.
+            ttl (float): Seconds after which an answer expires.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: str) -> str | None:
+        """Returns the answer stored under a key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, created FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._conn.commit()
+
+        logger.info(
+            f"Answer cache {'hit' if row is not None else 'miss'}: hit ratio "
+            f"{self.hit_ratio:.0%} over {self.hits + self.misses} lookups"
+        )
+        return row[0] if row is not None else None
+
+    def put(self, key: str, answer: str) -> None:
+        """Stores an answer and evicts expired and old entries if the cache is too big."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, answer, len(answer.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Deletes expired answers, then the least recently used ones down to 90% of max_bytes."""
+        self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            freed = 0
+            to_delete = []
+            for rowid, size in self._conn.execute(
+                "SELECT rowid, size FROM answers ORDER BY last_used ASC"
+            ).fetchall():
+                if total - freed <= target:
+                    break
+                to_delete.append((rowid,))
+                freed += size
+            self._conn.executemany("DELETE FROM answers WHERE rowid = ?", to_delete)
+            logger.info(f"Answer cache evicted {len(to_delete)} answers ({freed / 1024:.0f} KB)")
+        self._conn.commit()
+
+
+_default_cache: AnswerCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Returns the process-wide answer cache, opening it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AnswerCache()
+        return _default_cache
+
+
+def cached_chat_completion(
+    client,
+    model: str,
+    messages: list[dict],
+    temperature: float,
+    cache_key: dict | None = None,
+    **params,
+) -> str:
+    """
+    Returns the answer of a chat completion, from the cache when the request is deterministic.
+
+    Args:
+        client: An OpenAI-compatible client.
+        model (str): The chat model name. Requests without one are not cached.
+        messages (list[dict]): The conversation sent to the model.
+        temperature (float): The sampling temperature. Only temperature 0 answers are cached.
+        cache_key (dict | None): What identifies the request in place of the messages, e.g.
+            the question and the ordered ids of the context chunks.
+        **params: Other arguments of `chat.completions.create` (max_tokens, top_p...).
+
+    Returns:
+        str: The content of the answer.
+    """
+    if temperature != 0 or model is None:
+        response = client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **params
+        )
+        return response.choices[0].message.content
+
+    cache = get_answer_cache()
+    key = request_key(model, temperature, messages if cache_key is None else cache_key, **params)
+    answer = cache.get(key)
+    if answer is None:
+        response = client.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **params
+        )
+        answer = response.choices[0].message.content
+        cache.put(key, answer)
+    return answer
+
+
+def cached_chat_completion_stream(
+    client,
+    model: str,
+    messages: list[dict],
+    temperature: float,
+    cache_key: dict | None = None,
+    **params,
+) -> Iterator[str]:
+    """
+    Streams the answer of a chat completion. A cached answer is yielded at once.
+
+    Arguments are those of `cached_chat_completion`. The streamed answer is only stored once the
+    model has finished it.
+
+    Yields:
+        str: The text deltas of the answer.
+    """
+    cache = get_answer_cache() if temperature == 0 and model is not None else None
+    key = None
+    if cache is not None:
+        key = request_key(
+            model, temperature, messages if cache_key is None else cache_key, **params
+        )
+        answer = cache.get(key)
+        if answer is not None:
+            yield answer
+            return
+
+    response = client.chat.completions.create(
+        model=model, messages=messages, temperature=temperature, stream=True, **params
+    )
+    deltas = []
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            deltas.append(chunk.choices[0].delta.content)
+            yield deltas[-1]
+    if cache is not None:
+        cache.put(key, "".join(deltas))
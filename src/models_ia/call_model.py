@@ -3,42 +3,128 @@ Created by Datoscout at 27/03/2024
 solutions@datoscout.ec
 """
 
+# Standard imports
+from typing import Iterator
+
 # Third party imports
 from loguru import logger
-from openai import OpenAI
 
 # Internal imports
-from src.config.settings import OPENAI_API_KEY, OPENAI_COMPLETIONS_MODEL, OPENAI_EMBEDDINGS_MODEL
+from src.config.parameters import (
+    ANSWER_MAX_TOKENS,
+    ANSWER_TEMPERATURE,
+    EMBEDDINGS_BATCH_SIZE,
+    EMBEDDINGS_DIMENSION,
+    EMBEDDINGS_MAX_CONCURRENCY,
+    EMBEDDINGS_MAX_TOKENS_PER_REQUEST,
+)
+from src.config.settings import OPENAI_COMPLETIONS_MODEL, OPENAI_EMBEDDINGS_MODEL
+from src.models_ia.answer_cache import cached_chat_completion, cached_chat_completion_stream
+from src.models_ia.clients import get_client
+from src.models_ia.scheduler import RateLimitScheduler
 
 # Configure logging
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = get_client("openai")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used to size embedding requests."""
+    return len(text) // 4 + 1
+
+
+def batch_texts(
+    texts: list[str],
+    batch_size: int = EMBEDDINGS_BATCH_SIZE,
+    max_tokens: int = EMBEDDINGS_MAX_TOKENS_PER_REQUEST,
+) -> list[list[int]]:
+    """
+    Groups texts into batches bounded by number of items and estimated tokens.
+
+    Args:
+        texts (list[str]): The texts to group.
+        batch_size (int): Maximum number of texts per batch.
+        max_tokens (int): Maximum estimated tokens per batch. A single text larger than the cap
+            is sent alone.
+
+    Returns:
+        list[list[int]]: Batches of indices into `texts`, preserving the original order.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
 
 
 def get_embeddings(
-    text: list,
+    text: list | str,
     model: str = OPENAI_EMBEDDINGS_MODEL,
-    dimension: int = 1536,
+    dimension: int = EMBEDDINGS_DIMENSION,
+    batch_size: int = EMBEDDINGS_BATCH_SIZE,
+    max_tokens: int = EMBEDDINGS_MAX_TOKENS_PER_REQUEST,
+    max_concurrency: int = EMBEDDINGS_MAX_CONCURRENCY,
 ) -> list:
     """
     text = ["this is a text", "this is divided into parts"]
     model = EMBEDDINGS_MODEL
     dimension = 1536 dimension of the small model
-    """
+    batch_size = maximum number of texts sent per request
+    max_tokens = approximate maximum number of tokens sent per request
+    max_concurrency = maximum number of requests in flight, lowered automatically on HTTP 429
 
-    logger.info(f"Getting embeddings for {text} with model {model}")
+    Returns one embedding per input text, in the same order as `text`.
+    """
 
     if not model:
         raise KeyError("model not provided")
 
-    response = client.embeddings.create(input=text, model=model, dimensions=dimension)
-    return [data.embedding for data in response.data]
+    texts = [text] if isinstance(text, str) else list(text)
+    batches = batch_texts(texts, batch_size, max_tokens)
+    logger.info(
+        f"Getting embeddings for {len(texts)} texts in {len(batches)} requests with model {model}"
+    )
+
+    # Retries (429s, connection errors, timeouts and 5xx) are handled by the scheduler, so that
+    # 429s also lower the concurrency
+    embeddings_api = client.with_options(max_retries=0).embeddings
 
+    def embed_batch(batch: list[int]) -> list:
+        response = embeddings_api.create(
+            input=[texts[i] for i in batch], model=model, dimensions=dimension
+        )
+        # The API reports the position of each input inside the request
+        return [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
 
-def generate_answer(question: str, context: str):
+    scheduler = RateLimitScheduler(max_concurrency=max_concurrency)
+    results = scheduler.map(embed_batch, batches)
+
+    embeddings = [None] * len(texts)
+    for batch, vectors in zip(batches, results):
+        for i, vector in zip(batch, vectors):
+            embeddings[i] = vector
+    return embeddings
+
+
+def generate_answer(
+    question: str,
+    context: str,
+    stream: bool = False,
+    max_tokens: int = ANSWER_MAX_TOKENS,
+    context_ids: list[str] | None = None,
+) -> str | Iterator[str]:
     """
-    temperature=0,  # Controls the randomness in the output generation. The hotter, the more random.
+    temperature=0,  # (ANSWER_TEMPERATURE) Controls the randomness in the output generation. The hotter, the more random.
                       A temperature of 1 is a standard setting for creative or varied outputs.
-    max_tokens=500, # The maximum length of the model's response.
+    max_tokens=256, # The maximum length of the model's response (ANSWER_MAX_TOKENS by default).
     top_p=1,        # (or nucleus sampling) this parameter controls the cumulative probability distribution
                       of token selection. A value of 1 means no truncation, allowing all tokens to be considered
                       for selection based on their probability.
@@ -48,6 +134,10 @@ def generate_answer(question: str, context: str):
     presence_penalty=0,  # Alters the likelihood of introducing new concepts into the text.
                            A penalty of 0 implies no adjustment, meaning the model is neutral about introducing
                            new topics or concepts.
+    stream=True,    # Returns an iterator over the text deltas as the model produces them, instead of
+                      waiting for the full completion.
+    context_ids=[...],  # Ordered ids of the context chunks, used instead of the context text to key
+                          the answer cache. Answers at temperature 0 are served from the cache.
     generate_answer("how old is Eduardo", "Eduardo was born in 1982, since then he has been growing more and more handsome")
     """
 
@@ -58,18 +148,24 @@ def generate_answer(question: str, context: str):
     Question: {question}
     """
 
-    response = client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": context},
+    ]
+    # Chunk ids start with the document's content key: the same question over the same chunks
+    # is answered from the cache, in any session
+    cache_key = None
+    if context_ids is not None:
+        cache_key = {"system": prompt, "question": question, "context_ids": context_ids}
+    completion = cached_chat_completion_stream if stream else cached_chat_completion
+    return completion(
+        client,
         model=OPENAI_COMPLETIONS_MODEL,
-        temperature=1,
-        max_tokens=256,
+        messages=messages,
+        temperature=ANSWER_TEMPERATURE,
+        cache_key=cache_key,
+        max_tokens=max_tokens,
         top_p=1,
         frequency_penalty=0,
         presence_penalty=0,
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": context},
-        ],
     )
-
-    response_ = response.model_dump()
-    return response_["choices"][0]["message"]["content"]
@@ -0,0 +1,101 @@
+"""
+Factory of the OpenAI-compatible API clients, shared by the RAG app and the chatbot scripts.
+
+Every client of the process goes through one tuned httpx connection pool (HTTP/2, keep-alive
+connections, explicit timeouts). Concurrent sessions and the parallel embedding requests then
+reuse warm TLS connections instead of each module opening its own pool. Clients are created once
+per provider, synchronous (`get_client`) or asynchronous (`get_async_client`):
+    - 'openai':   OpenAI API, with OPENAI_API_KEY.
+    - 'deepseek': DeepSeek API (OpenAI-compatible), with DEEPSEEK_API_KEY.
+"""
+
+# Standard imports
+from functools import lru_cache
+
+# Third party imports
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+# Internal imports
+from src.config.parameters import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_READ_TIMEOUT,
+)
+from src.config.settings import DEEPSEEK_API_KEY, OPENAI_API_KEY, OPENAI_BASE_URL
+
+# API key and base URL of each provider. OPENAI_BASE_URL can point the OpenAI client at a proxy
+# or a local fake endpoint; unset, the SDK default applies
+PROVIDERS = {
+    "openai": (OPENAI_API_KEY, OPENAI_BASE_URL),
+    "deepseek": (DEEPSEEK_API_KEY, "https://api.deepseek.com"),
+}
+
+TIMEOUT = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+LIMITS = httpx.Limits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+)
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.Client:
+    """Returns the process-wide HTTP/2 connection pool of the synchronous clients."""
+    return DefaultHttpxClient(http2=True, limits=LIMITS, timeout=TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide HTTP/2 connection pool of the asynchronous clients.
+
+    Its connections belong to the event loop that opens them: use the async clients from a single,
+    long-lived loop.
+    """
+    return DefaultAsyncHttpxClient(http2=True, limits=LIMITS, timeout=TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def _create_client(provider: str, asynchronous: bool) -> OpenAI | AsyncOpenAI:
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider '{provider}'. Choose one of {list(PROVIDERS)}.")
+    api_key, base_url = PROVIDERS[provider]
+    if asynchronous:
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=TIMEOUT,
+            http_client=get_async_http_client(),
+        )
+    return OpenAI(
+        api_key=api_key, base_url=base_url, timeout=TIMEOUT, http_client=get_http_client()
+    )
+
+
+def get_client(provider: str = "openai") -> OpenAI:
+    """
+    Returns the synchronous client of a provider, created on first use.
+
+    Args:
+        provider (str): 'openai' or 'deepseek'.
+
+    Returns:
+        OpenAI: The client, on the shared connection pool.
+    """
+    return _create_client(provider, asynchronous=False)
+
+
+def get_async_client(provider: str = "openai") -> AsyncOpenAI:
+    """
+    Returns the asynchronous client of a provider, created on first use.
+
+    Args:
+        provider (str): 'openai' or 'deepseek'.
+
+    Returns:
+        AsyncOpenAI: The client, on the shared asynchronous connection pool.
+    """
+    return _create_client(provider, asynchronous=True)
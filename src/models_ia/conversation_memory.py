@@ -0,0 +1,191 @@
+"""
+Token-bounded conversation memory for the chatbots.
+
+Resending the whole history on every turn makes long support sessions slower and more expensive
+with each message, until they hit the model's context limit. The memory sends instead:
+    1. The pinned system messages of the conversation.
+    2. A running summary of the older turns.
+    3. The recent turns, verbatim.
+When the recent turns exceed MEMORY_RECENT_TOKENS, the oldest ones are folded into the summary
+until the window is back to half that size, always keeping the last MEMORY_MIN_RECENT_MESSAGES.
+The summary is updated incrementally (previous summary + folded turns) by the chat model, in a
+background thread, so the user never waits for it. Whatever happens to the summarizer, the
+messages sent never exceed MEMORY_MAX_TOKENS: the oldest recent turns are left out first.
+"""
+
+# Standard imports
+import threading
+from typing import Callable
+
+# Third party imports
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import (
+    MEMORY_MAX_TOKENS,
+    MEMORY_MIN_RECENT_MESSAGES,
+    MEMORY_RECENT_TOKENS,
+    MEMORY_SUMMARY_MAX_TOKENS,
+)
+from src.models_ia.answer_cache import cached_chat_completion
+from src.models_ia.tokens import count_tokens
+
+# Tokens added by the chat format to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """Update the summary of a support conversation with its next turns.
+Keep the facts, the user's problem, the data they gave (names, codes, places...) and what was
+already answered or agreed. Be concise and write in the language of the conversation.
+Answer only with the updated summary."""
+
+
+def message_tokens(message: dict) -> int:
+    """Returns the tokens of a chat message, with the overhead of the chat format."""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def chat_summarizer(
+    client, model: str | None = None, max_tokens: int = MEMORY_SUMMARY_MAX_TOKENS
+) -> Callable[[str, list[dict]], str]:
+    """
+    Returns a summarizer that updates the summary with a chat model.
+
+    Args:
+        client: An OpenAI-compatible client (OpenAI, DeepSeek, LocalAI or the model router).
+            It must honour temperature 0, as the summaries are cached as deterministic answers.
+        model (str | None): The chat model name, which keys the cached summaries. Without it
+            (the model router) the summaries are not cached.
+        max_tokens (int): Maximum length of the summary.
+
+    Returns:
+        Callable: `summarize(summary, turns)`, returning the updated summary.
+    """
+
+    def summarize(summary: str, turns: list[dict]) -> str:
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {
+                "role": "user",
+                "content": f"Summary so far:\n{summary or '(empty)'}\n\nNext turns:\n{transcript}",
+            },
+        ]
+        return cached_chat_completion(
+            client, model=model, messages=messages, temperature=0, max_tokens=max_tokens
+        )
+
+    return summarize
+
+
+class ConversationMemory:
+    """
+    History of a conversation kept within a token budget. Safe to share between threads.
+
+    Example:
+        memory = ConversationMemory(initial_messages, chat_summarizer(client, model))
+        memory.add("user", user_input)
+        answer = generate_response(memory.messages())
+        memory.add("assistant", answer)
+    """
+
+    def __init__(
+        self,
+        messages: list[dict],
+        summarizer: Callable[[str, list[dict]], str],
+        max_tokens: int = MEMORY_MAX_TOKENS,
+        recent_tokens: int = MEMORY_RECENT_TOKENS,
+        min_recent_messages: int = MEMORY_MIN_RECENT_MESSAGES,
+    ) -> None:
+        """
+        Args:
+            messages (list[dict]): The initial messages. The leading system messages are pinned,
+                the others are the first turns.
+            summarizer (Callable): `summarize(summary, turns)`, returning the summary updated with
+                the turns (see `chat_summarizer`).
+            max_tokens (int): Hard budget of the messages sent to the model.
+            recent_tokens (int): Size of the verbatim recent window from which older turns are
+                folded into the summary.
+            min_recent_messages (int): Last messages always kept verbatim.
+        """
+        pinned = 0
+        while pinned < len(messages) and messages[pinned]["role"] == "system":
+            pinned += 1
+        self.system = list(messages[:pinned])
+        self.summary = ""
+        self.summarizer = summarizer
+        self.max_tokens = max_tokens
+        self.recent_tokens = recent_tokens
+        self.min_recent_messages = min_recent_messages
+        self._recent = list(messages[pinned:])
+        self._lock = threading.Lock()
+        self._folding = False
+
+    def add(self, role: str, content: str) -> None:
+        """Appends a turn, and folds the oldest turns into the summary if the window is full."""
+        with self._lock:
+            self._recent.append({"role": role, "content": content})
+            turns = self._turns_to_fold()
+            if turns:
+                self._folding = True
+        if turns:
+            threading.Thread(target=self._fold, args=(turns,), daemon=True).start()
+
+    def _turns_to_fold(self) -> list[dict]:
+        """Oldest turns to fold to bring the window to half its budget. Called under the lock."""
+        tokens = [message_tokens(message) for message in self._recent]
+        if self._folding or sum(tokens) <= self.recent_tokens:
+            return []
+        count, remaining = 0, sum(tokens)
+        while (
+            remaining > self.recent_tokens // 2
+            and len(self._recent) - count > self.min_recent_messages
+        ):
+            remaining -= tokens[count]
+            count += 1
+        return self._recent[:count]
+
+    def _fold(self, turns: list[dict]) -> None:
+        """Summarizes the turns with the current summary, then drops them from the window."""
+        try:
+            summary = self.summarizer(self.summary, turns)
+        except Exception as e:
+            # The turns stay in the window; the budget of `messages` still bounds the request
+            logger.warning(f"Conversation summary failed, {len(turns)} turns kept verbatim: {e}")
+            with self._lock:
+                self._folding = False
+            return
+        with self._lock:
+            # Only appends happen meanwhile: the folded turns are still the oldest ones
+            self.summary = summary
+            del self._recent[: len(turns)]
+            self._folding = False
+        logger.info(f"Folded {len(turns)} turns into the conversation summary")
+
+    def messages(self) -> list[dict]:
+        """
+        Returns the messages to send to the model.
+
+        Returns:
+            list[dict]: The pinned system messages, the summary and the recent turns, oldest
+            turns left out if they exceed the token budget.
+        """
+        with self._lock:
+            head = list(self.system)
+            if self.summary:
+                head.append(
+                    {
+                        "role": "system",
+                        "content": f"Summary of the earlier conversation:\n{self.summary}",
+                    }
+                )
+            recent = list(self._recent)
+        budget = self.max_tokens - sum(message_tokens(message) for message in head)
+        kept = []
+        for message in reversed(recent):
+            budget -= message_tokens(message)
+            if budget < 0 and kept:
+                break
+            kept.append(message)
+        if len(kept) < len(recent):
+            logger.warning(f"{len(recent) - len(kept)} turns left out of the token budget")
+        return head + kept[::-1]
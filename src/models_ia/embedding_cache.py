@@ -0,0 +1,170 @@
+"""
+Persistent, content-addressed cache of paragraph embeddings.
+
+Embeddings are stored in a local SQLite database under DATA_PATH, keyed by the embedding model,
+the dimension and the sha256 of the paragraph text. The same paragraph is therefore embedded only
+once, whatever document or file name it comes from. The database is bounded in size: when it grows
+beyond the configured limit, the least recently used vectors are evicted.
+"""
+
+# Standard imports
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Third party imports
+import numpy as np
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import EMBEDDINGS_CACHE_MAX_BYTES
+from src.config.settings import DATA_PATH
+
+EMBEDDINGS_CACHE_PATH = os.path.join(DATA_PATH, "embeddings", "paragraph_cache.sqlite")
+
+
+def text_hash(text: str) -> str:
+    """Returns the sha256 hex digest of a paragraph, used as its cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed embedding cache keyed by (model, dimension, sha256(text)).
+
+    Vectors are stored as float32 blobs. The cache is safe to share between threads.
+    """
+
+    def __init__(
+        self, path: str = EMBEDDINGS_CACHE_PATH, max_bytes: int = EMBEDDINGS_CACHE_MAX_BYTES
+    ) -> None:
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+            max_bytes (int): Maximum total size of the stored vectors before eviction.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimension, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, texts: list[str], model: str, dimension: int) -> list[list[float] | None]:
+        """
+        Looks up the embeddings of several texts.
+
+        Args:
+            texts (list[str]): The paragraphs to look up.
+            model (str): The embedding model name.
+            dimension (int): The embedding dimension.
+
+        Returns:
+            list: One embedding (list of floats) per text, or None for cache misses.
+        """
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # Query in chunks to stay below SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = list(set(hashes[start : start + 500]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "  # nosec B608
+                    f"WHERE model = ? AND dimension = ? AND text_hash IN ({placeholders})",
+                    [model, dimension, *chunk],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model = ? AND dimension = ? AND text_hash = ?",
+                    [(now, model, dimension, h) for h in found],
+                )
+                self._conn.commit()
+
+        return [
+            np.frombuffer(found[h], dtype=np.float32).tolist() if h in found else None
+            for h in hashes
+        ]
+
+    def put_many(
+        self, texts: list[str], embeddings: list[list[float]], model: str, dimension: int
+    ) -> None:
+        """
+        Stores the embeddings of several texts and evicts old entries if the cache is too big.
+
+        Args:
+            texts (list[str]): The paragraphs.
+            embeddings (list[list[float]]): Their embeddings, in the same order.
+            model (str): The embedding model name.
+            dimension (int): The embedding dimension.
+        """
+        now = time.time()
+        rows = []
+        for text, emb in zip(texts, embeddings):
+            blob = np.asarray(emb, dtype=np.float32).tobytes()
+            rows.append((model, dimension, text_hash(text), blob, len(blob), now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, dimension, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used vectors until the cache is below 90% of max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT rowid, size FROM embeddings ORDER BY last_used ASC"
+        ).fetchall()
+        to_delete = []
+        for rowid, size in rows:
+            if total - freed <= target:
+                break
+            to_delete.append((rowid,))
+            freed += size
+            evicted += 1
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", to_delete)
+        self._conn.commit()
+        logger.info(f"Embedding cache evicted {evicted} vectors ({freed / 1024**2:.1f} MB)")
+
+
+_default_cache: EmbeddingCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache, opening it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
@@ -0,0 +1,399 @@
+"""
+Latency-aware router of chat completions across the interchangeable model backends.
+
+OpenAI, DeepSeek and the local models (local_llm.client_local.LocalAI) answer the same chat
+completion requests. The router keeps, for each backend, the latencies and errors of its recent
+requests in a sliding window (the last ROUTER_WINDOW_SIZE requests of the last
+ROUTER_WINDOW_SECONDS). Each request goes to the healthy backend with the lowest median latency.
+A backend is unhealthy when more than ROUTER_MAX_ERROR_RATE of its recent requests failed. A failed
+request is retried on the next backend.
+
+With hedging on, a request still running when the backend's p95 latency has passed is sent again
+to the next backend. The first answer wins and the other request is cancelled. The tail latency
+of a request is then bounded by the p95 of the fastest backend, instead of by one provider's bad
+minutes. A cancelled request is recorded as a loss, with the time it had run as a lower bound of
+its latency: it counts towards the median used for ranking, so a backend that keeps losing moves
+down, but not towards the p95 or the error rate. On failover, the next backend gets its own p95
+deadline. Streamed answers only record whether the request was accepted: the time to the first
+chunk is not comparable with the duration of a whole completion.
+
+Requests run on one background event loop with the asynchronous clients, so hedged requests can be
+cancelled. The local models have no asynchronous client: they run in a worker thread that cannot be
+stopped, and their late answers are discarded. The router mimics the OpenAI client
+(`router.chat.completions.create`), so it can replace it in the chatbots and the answer cache.
+"""
+
+# Standard imports
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+# Third party imports
+import numpy as np
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import (
+    ROUTER_BACKENDS,
+    ROUTER_HEDGE,
+    ROUTER_HEDGE_DELAY,
+    ROUTER_LOCAL_MODEL_ID,
+    ROUTER_MAX_ERROR_RATE,
+    ROUTER_MIN_SAMPLES,
+    ROUTER_WINDOW_SECONDS,
+    ROUTER_WINDOW_SIZE,
+)
+from src.config.settings import (
+    DEEPSEEK_API_KEY,
+    DEEPSEEK_COMPLETIONS_MODEL,
+    OPENAI_API_KEY,
+    OPENAI_COMPLETIONS_MODEL,
+)
+from src.models_ia.clients import get_async_client, get_client
+
+
+# Outcomes of the requests recorded in a LatencyWindow
+OK, ERROR, LOST, STREAMED = "ok", "error", "lost", "streamed"
+
+
+class LatencyWindow:
+    """Latencies and outcomes of the recent requests of a backend. Safe to share across threads."""
+
+    def __init__(
+        self, window_seconds: float = ROUTER_WINDOW_SECONDS, size: int = ROUTER_WINDOW_SIZE
+    ) -> None:
+        """
+        Args:
+            window_seconds (float): Age in seconds from which a request is forgotten.
+            size (int): Requests kept at most.
+        """
+        self.window_seconds = window_seconds
+        self._samples: deque[tuple[float, float, str]] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, outcome: str = OK) -> None:
+        """
+        Adds a request to the window.
+
+        Args:
+            latency (float): Duration of the request in seconds. For a LOST request, the time it
+                ran before being cancelled, i.e. a lower bound of its latency.
+            outcome (str): OK, ERROR, LOST (cancelled by a hedge that answered first) or STREAMED
+                (a stream was opened; its latency is not used).
+        """
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, outcome))
+
+    def _recent(self) -> list[tuple[float, float, str]]:
+        limit = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < limit:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def stats(self) -> dict:
+        """
+        Returns the summary of the window.
+
+        Returns:
+            dict: 'samples', 'completed' (successful completions), 'error_rate', 'loss_rate', the
+            'p50' and 'p95' latencies in seconds of the successful completions, and the
+            'ranking_latency': the median of those latencies and of the lower bounds of the lost
+            requests (None without any of them).
+        """
+        samples = self._recent()
+        latencies = [latency for _, latency, outcome in samples if outcome == OK]
+        lower_bounds = [latency for _, latency, outcome in samples if outcome == LOST]
+        errors = sum(1 for *_, outcome in samples if outcome == ERROR)
+        p50, p95 = np.percentile(latencies, [50, 95]).tolist() if latencies else (None, None)
+        ranked = latencies + lower_bounds
+        return {
+            "samples": len(samples),
+            "completed": len(latencies),
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "loss_rate": len(lower_bounds) / len(samples) if samples else 0.0,
+            "p50": p50,
+            "p95": p95,
+            "ranking_latency": float(np.median(ranked)) if ranked else None,
+        }
+
+
+@dataclass
+class Backend:
+    """
+    A model backend the router can send requests to.
+
+    Attributes:
+        name (str): Name of the backend in the logs ('openai', 'deepseek', 'local').
+        model (str): Chat model requested from the backend.
+        client: OpenAI-compatible synchronous client (also used for streamed answers).
+        async_client: Asynchronous client, or None to run the synchronous one in a thread.
+        streams (bool): Whether the backend can stream answers.
+        window (LatencyWindow): Recent latencies and errors of the backend.
+    """
+
+    name: str
+    model: str
+    client: object
+    async_client: object | None = None
+    streams: bool = True
+    window: LatencyWindow = field(default_factory=LatencyWindow)
+
+
+class _Completions:
+    """Mimics `client.chat.completions` of the OpenAI client."""
+
+    def __init__(self, router: "ModelRouter") -> None:
+        self.router = router
+
+    def create(self, messages: list, model: str | None = None, stream: bool = False, **params):
+        """
+        Creates a chat completion on the backend chosen by the router.
+
+        Args:
+            messages (list): List of message dictionaries with role and content.
+            model (str | None): Ignored: each backend answers with its own model.
+            stream (bool): Whether to return an iterator over the chunks of the answer.
+            **params: Other arguments of `chat.completions.create` (temperature, max_tokens...).
+
+        Returns:
+            The backend's completion, or its stream of chunks.
+        """
+        if stream:
+            return self.router.stream(messages, **params)
+        return self.router.complete(messages, **params)
+
+
+class _Chat:
+    """Mimics `client.chat` of the OpenAI client."""
+
+    def __init__(self, router: "ModelRouter") -> None:
+        self.completions = _Completions(router)
+
+
+class ModelRouter:
+    """
+    Sends each chat completion to the fastest healthy backend, hedging slow requests.
+
+    Example:
+        router = ModelRouter([openai_backend, deepseek_backend])
+        response = router.chat.completions.create(messages=messages, temperature=0)
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        hedge: bool = ROUTER_HEDGE,
+        hedge_delay: float = ROUTER_HEDGE_DELAY,
+        min_samples: int = ROUTER_MIN_SAMPLES,
+        max_error_rate: float = ROUTER_MAX_ERROR_RATE,
+    ) -> None:
+        """
+        Args:
+            backends (list[Backend]): The backends, in order of preference while they have no
+                latency history.
+            hedge (bool): Whether to send a slow request again to the next backend.
+            hedge_delay (float): Seconds after which a request is hedged while its backend has
+                fewer than `min_samples` successful requests to estimate its p95.
+            min_samples (int): Requests in the window from which a backend's p95 and error rate
+                are trusted.
+            max_error_rate (float): Share of failed requests from which a backend is skipped.
+        """
+        if not backends:
+            raise ValueError("The router needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.chat = _Chat(self)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="model-router", daemon=True).start()
+
+    def ranking(self) -> list[Backend]:
+        """
+        Returns the backends in the order they are tried.
+
+        Healthy backends come first, by their ranking latency (the median of their completions
+        and lost races). Backends without history keep their configured order ahead of the
+        measured ones, so each of them gets tried; those with only recent errors go after the
+        measured ones. Unhealthy backends come last, fewest errors first, as the last resort.
+        """
+        healthy, unhealthy = [], []
+        for position, backend in enumerate(self.backends):
+            stats = backend.window.stats()
+            if stats["samples"] >= self.min_samples and stats["error_rate"] > self.max_error_rate:
+                unhealthy.append((stats["error_rate"], position, backend))
+            elif stats["ranking_latency"] is not None:
+                healthy.append((stats["ranking_latency"], position, backend))
+            else:
+                healthy.append((float("inf") if stats["error_rate"] else 0.0, position, backend))
+        return [backend for *_, backend in sorted(healthy) + sorted(unhealthy)]
+
+    def _hedge_after(self, backend: Backend) -> float:
+        """Seconds after which a request to a backend is hedged: its p95, once measured."""
+        stats = backend.window.stats()
+        if stats["completed"] < self.min_samples:
+            return self.hedge_delay
+        return stats["p95"]
+
+    async def _call(self, backend: Backend, messages: list, params: dict):
+        """Runs one request on a backend and records its latency and outcome."""
+        start = time.perf_counter()
+        try:
+            if backend.async_client is not None:
+                response = await backend.async_client.chat.completions.create(
+                    model=backend.model, messages=messages, **params
+                )
+            else:
+                response = await asyncio.to_thread(
+                    backend.client.chat.completions.create,
+                    model=backend.model,
+                    messages=messages,
+                    **params,
+                )
+        except asyncio.CancelledError:
+            # Lost the race: it would have taken at least this long
+            backend.window.record(time.perf_counter() - start, LOST)
+            raise
+        except Exception:
+            backend.window.record(time.perf_counter() - start, ERROR)
+            raise
+        backend.window.record(time.perf_counter() - start, OK)
+        return response
+
+    async def _complete(self, messages: list, params: dict):
+        """Races the ranked backends: failover on errors, one hedge past the p95 deadline."""
+        queue = self.ranking()
+        primary = queue.pop(0)
+        pending = {asyncio.create_task(self._call(primary, messages, params)): primary}
+        deadline = time.monotonic() + self._hedge_after(primary)
+        hedged = not self.hedge
+        error = None
+        while pending:
+            timeout = None if hedged or not queue else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                backend = queue.pop(0)
+                logger.info(
+                    f"Request to '{primary.name}' past its p95, hedging on '{backend.name}'"
+                )
+                pending[asyncio.create_task(self._call(backend, messages, params))] = backend
+                hedged = True
+                continue
+
+            for task in done:
+                backend = pending.pop(task)
+                if task.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return task.result()
+                error = task.exception()
+                logger.warning(f"Request to '{backend.name}' failed: {error}")
+            if not pending and queue:
+                # Failover: the next backend gets its own deadline and may be hedged in turn
+                primary = queue.pop(0)
+                pending[asyncio.create_task(self._call(primary, messages, params))] = primary
+                deadline = time.monotonic() + self._hedge_after(primary)
+                hedged = not self.hedge
+        raise error
+
+    def complete(self, messages: list, **params):
+        """
+        Returns the chat completion of the first backend to answer.
+
+        Args:
+            messages (list): List of message dictionaries with role and content.
+            **params: Other arguments of `chat.completions.create` (temperature, max_tokens...).
+
+        Returns:
+            The completion, in the format of the OpenAI client.
+
+        Raises:
+            Exception: The error of the last backend tried, when every backend failed.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._complete(messages, params), self._loop)
+        return future.result()
+
+    def stream(self, messages: list, **params):
+        """
+        Streams the chat completion from the fastest healthy backend that accepts the request.
+
+        Streamed answers are not hedged, and a failed request is retried on the next backend.
+        Only the outcome is recorded: the time to open a stream (immediate for the lazy local
+        streams) says nothing about the latency of a completion.
+
+        Returns:
+            The stream of chunks, in the format of the OpenAI client.
+        """
+        error = None
+        for backend in (backend for backend in self.ranking() if backend.streams):
+            start = time.perf_counter()
+            try:
+                response = backend.client.chat.completions.create(
+                    model=backend.model, messages=messages, stream=True, **params
+                )
+            except Exception as e:
+                backend.window.record(time.perf_counter() - start, ERROR)
+                logger.warning(f"Streamed request to '{backend.name}' failed: {e}")
+                error = e
+                continue
+            backend.window.record(time.perf_counter() - start, STREAMED)
+            return response
+        if error is None:
+            raise ValueError("No backend of the router can stream answers")
+        raise error
+
+    def stats(self) -> dict[str, dict]:
+        """Returns the window summary of each backend (see LatencyWindow.stats), by name."""
+        return {backend.name: backend.window.stats() for backend in self.backends}
+
+
+def default_backends(names: list[str] = ROUTER_BACKENDS) -> list[Backend]:
+    """
+    Builds the configured backends. Providers without API key or model are left out.
+
+    Args:
+        names (list[str]): Backends among 'openai', 'deepseek' and 'local'.
+
+    Returns:
+        list[Backend]: The available backends, in the configured order.
+    """
+    available = {
+        "openai": (OPENAI_API_KEY, OPENAI_COMPLETIONS_MODEL),
+        "deepseek": (DEEPSEEK_API_KEY, DEEPSEEK_COMPLETIONS_MODEL),
+    }
+    backends = []
+    for name in names:
+        if name == "local":
+            # Imported here: loading torch and the model is only paid when the backend is used
+            from src.local_llm.client_local import LocalAI
+
+            client = LocalAI(model_id=ROUTER_LOCAL_MODEL_ID, by_api=False)
+            backends.append(Backend(name, ROUTER_LOCAL_MODEL_ID, client))
+            continue
+        if name not in available:
+            raise ValueError(f"Unknown backend '{name}'. Choose one of {[*available, 'local']}.")
+        api_key, model = available[name]
+        if not api_key or not model:
+            logger.warning(f"Backend '{name}' left out of the router: no API key or model set")
+            continue
+        backends.append(Backend(name, model, get_client(name), get_async_client(name)))
+    return backends
+
+
+_default_router: ModelRouter | None = None
+_default_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Returns the process-wide router over the configured backends, creating it on first use."""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter(default_backends())
+        return _default_router
@@ -0,0 +1,176 @@
+"""
+Concurrent, rate-limit-aware scheduler for batched model requests.
+
+Runs several request batches at once on a thread pool while adapting the number of requests in
+flight to the provider's rate limits: every 429 halves the allowed concurrency and pauses new
+requests for the time given in the retry-after headers, and every run of successful requests
+raises it again by one (AIMD). Transient failures (connection errors, timeouts, 5xx responses)
+are retried with exponential backoff without touching the concurrency. Results are always
+returned in the order of the input batches.
+"""
+
+# Standard imports
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence, TypeVar
+
+# Third party imports
+from loguru import logger
+from openai import APIConnectionError
+
+# Internal imports
+from src.config.parameters import (
+    EMBEDDINGS_MAX_CONCURRENCY,
+    EMBEDDINGS_MAX_RETRIES,
+    EMBEDDINGS_RETRY_BASE_DELAY,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Returns True if the exception is an HTTP 429 response from the provider."""
+    return getattr(error, "status_code", None) == 429
+
+
+def is_transient(error: Exception) -> bool:
+    """Returns True for failures worth retrying as is: lost connections, timeouts and 5xx."""
+    # APITimeoutError is an APIConnectionError
+    if isinstance(error, APIConnectionError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """
+    Reads the delay requested by the provider from the error's response headers.
+
+    Args:
+        error (Exception): The exception raised by the client. OpenAI errors expose the HTTP
+            response as `error.response`.
+
+    Returns:
+        float | None: Seconds to wait, or None if the response carries no retry hint.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class RateLimitScheduler:
+    """
+    Thread-pool scheduler that keeps results in order and adapts its concurrency to 429s.
+
+    Example:
+        scheduler = RateLimitScheduler(max_concurrency=4)
+        results = scheduler.map(embed_batch, batches)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = EMBEDDINGS_MAX_CONCURRENCY,
+        max_retries: int = EMBEDDINGS_MAX_RETRIES,
+        base_delay: float = EMBEDDINGS_RETRY_BASE_DELAY,
+    ) -> None:
+        """
+        Args:
+            max_concurrency (int): Upper bound of requests in flight.
+            max_retries (int): Number of times a rate-limited or transiently failed batch is
+                retried before failing.
+            base_delay (float): Pause in seconds after a 429 or a transient failure without
+                retry-after headers. It doubles with every consecutive retry of the same batch.
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.concurrency = self.max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def _acquire(self) -> None:
+        """Blocks until a slot is free under the current concurrency limit and no pause is active."""
+        with self._condition:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self._in_flight < self.concurrency:
+                    self._in_flight += 1
+                    return
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+    def _release(self, rate_limited: bool = False, delay: float = 0.0) -> None:
+        """Frees a slot and updates the concurrency limit (additive increase, halving on 429)."""
+        with self._condition:
+            self._in_flight -= 1
+            if rate_limited:
+                self.concurrency = max(1, self.concurrency // 2)
+                self._successes = 0
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(
+                    f"Rate limited, concurrency lowered to {self.concurrency}, "
+                    f"pausing {delay:.2f}s"
+                )
+            else:
+                self._successes += 1
+                if self._successes >= self.concurrency and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+    def _run(self, func: Callable[[T], R], item: T) -> R:
+        """Runs one batch, retrying it on 429s and transient failures."""
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = func(item)
+            except Exception as e:
+                rate_limited = is_rate_limited(e)
+                if not (rate_limited or is_transient(e)) or attempt >= self.max_retries:
+                    self._release()
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self.base_delay * 2**attempt
+                if rate_limited:
+                    self._release(rate_limited=True, delay=delay)
+                else:
+                    # Only this batch backs off: the provider is not asking to slow down
+                    self._release()
+                    logger.warning(f"Transient error ({e}), retrying the batch in {delay:.2f}s")
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            self._release()
+            return result
+
+    def map(self, func: Callable[[T], R], items: Sequence[T]) -> list[R]:
+        """
+        Applies `func` to every item concurrently.
+
+        Args:
+            func (Callable): The request to run for each item (e.g. one embeddings batch).
+            items (Sequence): The items to process.
+
+        Returns:
+            list: The results, in the same order as `items`. Errors other than rate limits and
+            transient failures, and batches that exhaust their retries, are raised once the
+            running requests finish.
+        """
+        if len(items) <= 1:
+            return [self._run(func, item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as executor:
+            futures = [executor.submit(self._run, func, item) for item in items]
+            return [future.result() for future in futures]
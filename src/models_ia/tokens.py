@@ -0,0 +1,63 @@
+"""
+Token counting for the chat models, used to fit the retrieved context into the prompt budget.
+
+Tokens are counted with the tiktoken encoding of the completions model. If the encoding cannot
+be loaded (unknown model, or no network access to download the encoding files), counts fall
+back to the ~4 characters per token estimate used to size embedding requests.
+"""
+
+# Standard imports
+from functools import lru_cache
+
+# Third party imports
+import tiktoken
+from loguru import logger
+from tiktoken.model import encoding_name_for_model
+
+# Internal imports
+from src.config.settings import OPENAI_COMPLETIONS_MODEL
+
+# Encoding of the recent OpenAI chat models, used for models unknown to tiktoken
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str | None = OPENAI_COMPLETIONS_MODEL) -> tiktoken.Encoding | None:
+    """
+    Returns the tiktoken encoding of a model, loaded once.
+
+    Args:
+        model (str | None): The chat model name.
+
+    Returns:
+        tiktoken.Encoding | None: The encoding, or None if it cannot be loaded.
+    """
+    try:
+        name = encoding_name_for_model(model) if model else DEFAULT_ENCODING
+    except KeyError:
+        name = DEFAULT_ENCODING
+    try:
+        # Downloaded on first use, then read from tiktoken's cache directory
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({e}), token counts are estimated")
+        return None
+
+
+def count_tokens(text: str, model: str | None = OPENAI_COMPLETIONS_MODEL) -> int:
+    """Returns the number of tokens of a text for a model."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(
+    text: str, max_tokens: int, model: str | None = OPENAI_COMPLETIONS_MODEL
+) -> str:
+    """Cuts a text to its first `max_tokens` tokens."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
@@ -23,6 +23,10 @@ nltk.download("punkt")
 nltk.download("punkt_tab")
 nltk.download("stopwords")
 
+# Built once: rebuilding them for every text dominated the preprocessing time
+STOP_WORDS = frozenset(stopwords.words("spanish"))
+PUNCTUATION_PATTERN = re.compile(f"[{re.escape(string.punctuation)}]")
+
 
 # Helper Functions
 def preprocess_text(text: str) -> str:
@@ -31,12 +35,11 @@ def preprocess_text(text: str) -> str:
     text = text.lower()
 
     # Remove punctuation
-    text = re.sub(f"[{string.punctuation}]", " ", text)
+    text = PUNCTUATION_PATTERN.sub(" ", text)
 
     # Remove stopwords
-    stop_words = set(stopwords.words("spanish"))
     tokens = word_tokenize(text)
-    filtered_tokens = [word for word in tokens if word not in stop_words]
+    filtered_tokens = [word for word in tokens if word not in STOP_WORDS]
 
     # Join tokens back into a string
     return " ".join(filtered_tokens)
@@ -166,22 +169,16 @@ def compare_documents_bm25(corpus: list[str], queries: list[str]) -> pd.DataFram
     # Create BM25 index
     bm25_index, tokenized_corpus = create_bm25_index(corpus)
 
-    # Initialize results dataframe
-    results = pd.DataFrame(index=range(len(queries)), columns=range(len(corpus)))
-
-    # Fill results with BM25 scores
-    for i, query in enumerate(queries):
-        scores = get_bm25_scores(query, bm25_index, tokenized_corpus)
-        for j, score in enumerate(scores):
-            results.iloc[i, j] = score
-
-    # Set column names as document snippets
-    results.columns = [f"Doc {i + 1}: {doc[:35]}..." for i, doc in enumerate(corpus)]
+    # Score every query, then build the dataframe at once (numeric, one row per query)
+    scores = np.vstack([get_bm25_scores(query, bm25_index, tokenized_corpus) for query in queries])
 
-    # Set row names as queries
-    results.index = [f"Query: {query}" for query in queries]
-
-    return results
+    return pd.DataFrame(
+        scores,
+        # Set row names as queries
+        index=[f"Query: {query}" for query in queries],
+        # Set column names as document snippets
+        columns=[f"Doc {i + 1}: {doc[:35]}..." for i, doc in enumerate(corpus)],
+    )
 
 
 def visualize_similarity_heatmap(results: pd.DataFrame) -> None:
@@ -0,0 +1,283 @@
+"""
+Approximate nearest-neighbour (ANN) index modes for large corpora, backed by FAISS.
+
+Exact scoring (VectorIndex) reads every vector for each question, which stops scaling once whole
+equipment libraries are loaded. This module provides two FAISS backends with the same interface:
+    - 'hnsw': graph index (IndexHNSWFlat), no training, very low latency, more memory.
+    - 'ivf':  inverted lists (IndexIVFFlat), trained with k-means, searches `nprobe` lists.
+Both use inner product over unit-normalized vectors, i.e. cosine similarity.
+
+The mode is chosen per corpus at ingestion (see build_index) and persisted in the store manifest,
+with the FAISS index saved next to the vectors. Running this module prints a recall@k versus
+latency report to choose the parameters:
+    python -m src.rag.b_basica.ann_index --n 100000 --dim 1536
+"""
+
+# Standard imports
+import argparse
+import time
+
+# Third party imports
+import faiss
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import (
+    ANN_MIN_CHUNKS,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    IVF_NPROBE,
+    VECTOR_INDEX_MODE,
+)
+from src.rag.b_basica.vector_index import VectorIndex, normalize_rows
+
+ANN_MODES = ("hnsw", "ivf")
+
+
+class FaissIndex(VectorIndex):
+    """
+    Vector index answering searches with an approximate FAISS index.
+
+    The normalized matrix is kept (memory-mapped when loaded from storage) so that the index can
+    be rebuilt or evaluated against exact search.
+    """
+
+    def __init__(
+        self,
+        chunks: pd.DataFrame,
+        matrix: np.ndarray,
+        faiss_index: faiss.Index,
+        mode: str,
+        normalized: bool = False,
+    ) -> None:
+        """
+        Args:
+            chunks (pd.DataFrame): Paragraph metadata, without the embeddings column.
+            matrix (np.ndarray): The embeddings, one row per chunk.
+            faiss_index (faiss.Index): The FAISS index built over the normalized matrix.
+            mode (str): 'hnsw' or 'ivf'.
+            normalized (bool): Whether the rows of `matrix` already have unit norm.
+        """
+        super().__init__(chunks, matrix, normalized=normalized)
+        self.faiss_index = faiss_index
+        self.mode = mode
+
+    @property
+    def nbytes(self) -> int:
+        # FAISS keeps its own copy of the vectors, plus the graph links (HNSW) or list ids (IVF)
+        n_chunks, dimension = self.matrix.shape
+        per_vector = 4 * dimension + (8 * HNSW_M if self.mode == "hnsw" else 8)
+        return super().nbytes + n_chunks * per_vector
+
+    @property
+    def params(self) -> dict:
+        index = faiss.downcast_index(self.faiss_index)
+        if self.mode == "hnsw":
+            return {"M": index.hnsw.nb_neighbors(1), "ef_search": self.ef_search}
+        return {"nlist": index.nlist, "nprobe": self.nprobe}
+
+    @property
+    def ef_search(self) -> int:
+        return faiss.downcast_index(self.faiss_index).hnsw.efSearch
+
+    @ef_search.setter
+    def ef_search(self, value: int) -> None:
+        faiss.downcast_index(self.faiss_index).hnsw.efSearch = value
+
+    @property
+    def nprobe(self) -> int:
+        return faiss.downcast_index(self.faiss_index).nprobe
+
+    @nprobe.setter
+    def nprobe(self, value: int) -> None:
+        faiss.downcast_index(self.faiss_index).nprobe = value
+
+    def serialize(self) -> bytes:
+        return faiss.serialize_index(self.faiss_index).tobytes()
+
+    def search(self, query_embedding: list | np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        if len(self) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+        scores, ids = self.faiss_index.search(query, min(k, len(self)))
+        # FAISS pads with -1 when fewer than k neighbours are found
+        found = ids[0] >= 0
+        return ids[0][found], scores[0][found]
+
+
+def _build_faiss(matrix: np.ndarray, mode: str) -> faiss.Index:
+    """Builds and fills a FAISS inner-product index over a normalized matrix."""
+    n, dimension = matrix.shape
+    if mode == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif mode == "ivf":
+        # ~4*sqrt(n) lists, with enough points per list to train k-means
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 39))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+        index.nprobe = min(IVF_NPROBE, nlist)
+    else:
+        raise ValueError(f"Unknown ANN mode '{mode}'. Choose one of {ANN_MODES}.")
+    index.add(matrix)
+    return index
+
+
+def resolve_mode(n_chunks: int, mode: str = VECTOR_INDEX_MODE) -> str:
+    """Resolves the 'auto' mode: exact search for small corpora, HNSW for large ones."""
+    if mode == "auto":
+        return "hnsw" if n_chunks >= ANN_MIN_CHUNKS else "exact"
+    return mode
+
+
+def build_index(index: VectorIndex, mode: str = VECTOR_INDEX_MODE) -> VectorIndex:
+    """
+    Builds the search structure of a corpus in the requested mode.
+
+    Args:
+        index (VectorIndex): An exact index holding the chunks and normalized matrix.
+        mode (str): 'exact', 'hnsw', 'ivf' or 'auto'.
+
+    Returns:
+        VectorIndex: The same index for exact search, or a FaissIndex sharing its data.
+    """
+    mode = resolve_mode(len(index), mode)
+    if mode == "exact" or len(index) == 0:
+        return index
+
+    start = time.perf_counter()
+    faiss_index = _build_faiss(index.matrix, mode)
+    logger.info(
+        f"Built {mode} index over {len(index)} chunks in {time.perf_counter() - start:.2f}s"
+    )
+    return FaissIndex(index.chunks, index.matrix, faiss_index, mode, normalized=True)
+
+
+def load_index(
+    chunks: pd.DataFrame, matrix: np.ndarray, manifest: dict, faiss_path: str | None
+) -> VectorIndex:
+    """
+    Rebuilds a stored index from its chunks, normalized vectors, manifest and FAISS file.
+
+    Args:
+        chunks (pd.DataFrame): Stored chunk metadata.
+        matrix (np.ndarray): Stored unit-normalized vectors (typically memory-mapped).
+        manifest (dict): Store manifest, with the 'index_mode' chosen at ingestion.
+        faiss_path (str | None): Path of the stored FAISS index, if any.
+
+    Returns:
+        VectorIndex: The index in the stored mode. If the FAISS file is missing, the ANN index
+        is rebuilt from the vectors.
+    """
+    exact = VectorIndex(chunks, matrix, normalized=True)
+    mode = manifest.get("index_mode", "exact")
+    if mode == "exact":
+        return exact
+    if faiss_path is None:
+        logger.warning(f"Stored {mode} index not found, rebuilding it from the vectors")
+        return build_index(exact, mode)
+    return FaissIndex(chunks, matrix, faiss.read_index(faiss_path), mode, normalized=True)
+
+
+def recall_report(
+    index: VectorIndex,
+    queries: np.ndarray,
+    k: int = 4,
+    hnsw_ef_search: tuple[int, ...] = (16, 32, 64, 128, 256),
+    ivf_nprobe: tuple[int, ...] = (1, 4, 16, 64),
+) -> pd.DataFrame:
+    """
+    Measures recall@k and latency of every ANN mode against exact search.
+
+    Args:
+        index (VectorIndex): Exact index over the corpus.
+        queries (np.ndarray): Query embeddings, one per row.
+        k (int): Number of neighbours retrieved per query.
+        hnsw_ef_search (tuple[int, ...]): HNSW efSearch values to evaluate.
+        ivf_nprobe (tuple[int, ...]): IVF nprobe values to evaluate.
+
+    Returns:
+        pd.DataFrame: One row per (mode, parameter) with build time, recall@k and latency.
+    """
+
+    def evaluate(candidate: VectorIndex) -> tuple[float, list[float]]:
+        hits = 0
+        latencies = []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            ids, _ = candidate.search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(set(ids.tolist()) & expected)
+        return hits / (len(queries) * k), latencies
+
+    truth = [set(index.search(query, k)[0].tolist()) for query in queries]
+    rows = []
+
+    recall, latencies = evaluate(index)
+    rows.append(("exact", "", 0.0, recall, latencies))
+
+    for mode, values, param in (
+        ("hnsw", hnsw_ef_search, "ef_search"),
+        ("ivf", ivf_nprobe, "nprobe"),
+    ):
+        start = time.perf_counter()
+        ann = build_index(index, mode)
+        build_seconds = time.perf_counter() - start
+        for value in values:
+            setattr(ann, param, value)
+            recall, latencies = evaluate(ann)
+            rows.append((mode, f"{param}={value}", build_seconds, recall, latencies))
+
+    return pd.DataFrame(
+        [
+            {
+                "mode": mode,
+                "params": params,
+                "build_s": round(build_s, 2),
+                f"recall@{k}": round(recall, 4),
+                "latency_ms_p50": round(float(np.percentile(lat, 50)), 3),
+                "latency_ms_p95": round(float(np.percentile(lat, 95)), 3),
+            }
+            for mode, params, build_s, recall, lat in rows
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k versus latency of the ANN modes")
+    parser.add_argument(
+        "--store", help="File name or key of a stored document (default: synthetic vectors)"
+    )
+    parser.add_argument("--n", type=int, default=100_000, help="Number of synthetic chunks")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.store:
+        from src.rag.b_basica.document_aliases import get_document_aliases
+        from src.rag.b_basica.storage import download_embeddings
+
+        # A file name resolves to the key of its most recently seen version
+        doc_keys = get_document_aliases().doc_keys(args.store)
+        chunks, vectors, _ = download_embeddings(doc_keys[0] if doc_keys else args.store)
+    else:
+        # Clustered synthetic vectors behave closer to real embeddings than uniform noise
+        centers = rng.normal(size=(max(1, args.n // 100), args.dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, len(centers), args.n)]
+        vectors += 0.5 * rng.normal(size=vectors.shape).astype(np.float32)
+        chunks = pd.DataFrame({"chunk": range(args.n)})
+
+    # Queries are perturbed corpus vectors, so every query has close neighbours
+    queries = np.asarray(vectors[rng.integers(0, len(vectors), args.queries)])
+    queries = queries + 0.3 * queries.std() * rng.normal(size=queries.shape).astype(np.float32)
+
+    exact_index = VectorIndex(chunks, vectors)
+    print(recall_report(exact_index, queries, k=args.k).to_string(index=False))
@@ -3,13 +3,13 @@ Chatbot de Soporte Técnico Claro - Interfaz Profesional Mejorada
 """
 
 import logging
-import time
 
 import streamlit as st
 
-from src.config.parameters import MAX_PAGES
-from src.rag.b_basica.nlp_proc import compute_embeddings, response_generator
-from src.rag.b_basica.utils import extract_context, retrieve_dataframe, store_dataframe
+from src.config.parameters import INGESTION_POLL_SECONDS, MAX_PAGES
+from src.rag.b_basica.corpus import Corpus
+from src.rag.b_basica.ingestion_jobs import get_ingestion_queue
+from src.rag.b_basica.nlp_proc import response_generator
 
 # Configuración del logger
 logging.basicConfig(level=logging.INFO)
@@ -585,7 +585,7 @@ def render_upload_section():
             with col1:
                 st.success(f"✅ **{uploaded_file.name}** cargado correctamente")
             with col2:
-                file_size = len(uploaded_file.getvalue()) / 1024 / 1024
+                file_size = uploaded_file.size / 1024 / 1024
                 st.info(f"📊 {file_size:.1f} MB")
             with col3:
                 process_btn = st.button("🚀 Procesar", key="process_btn", use_container_width=True)
@@ -711,6 +711,65 @@ def render_typing_indicator():
     )
 
 
+def render_documents(corpus):
+    """Lista los documentos cargados, permite quitarlos y elegir cuáles consultar"""
+    with st.expander(f"📚 Documentos cargados ({len(corpus.documents)})"):
+        for doc_id, file_name in list(corpus.documents.items()):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(f"📄 **{file_name}**")
+            with col2:
+                if st.button("🗑️ Quitar", key=f"remove_{doc_id}", use_container_width=True):
+                    corpus.remove(doc_id)
+                    if not corpus.documents:
+                        st.session_state.processed = False
+                        st.session_state.show_upload = True
+                    st.rerun()
+
+        selected = st.multiselect(
+            "Consultar en",
+            options=list(corpus.documents),
+            default=list(corpus.documents),
+            format_func=corpus.documents.get,
+        )
+    # Sin selección explícita se consultan todos los documentos
+    return selected or None
+
+
+@st.fragment(run_every=INGESTION_POLL_SECONDS)
+def render_ingestion_job(job_id):
+    """Muestra el avance de un documento en proceso; el trabajo sigue aunque se recargue la página"""
+    job = get_ingestion_queue().get(job_id)
+    if job is None or job.status == "failed":
+        # Se muestra junto al área de carga, para volver a intentarlo
+        st.session_state.ingestion_error = (
+            "El procesamiento del documento ya no está disponible. Vuelva a cargarlo."
+            if job is None
+            else f"Error al procesar el documento: {job.error}"
+        )
+        st.session_state.show_upload = True
+        del st.query_params["job"]
+        st.rerun()
+
+    if job.status == "done":
+        # Added next to the documents already loaded. Its vector and BM25 indexes are shared with
+        # the other sessions querying the same document
+        document = job.document
+        st.session_state.corpus.add(
+            job.doc_key,
+            job.file_name,
+            document.index,
+            lexical=document.lexical,
+            table=document.table,
+        )
+        st.session_state.processed = True
+        st.session_state.show_upload = False
+        del st.query_params["job"]
+        st.rerun()
+
+    st.progress(job.progress, text=f"⏳ {job.file_name}: {job.message}")
+
+
 def render_stats(processed_docs=0, total_messages=0):
     """Renderiza estadísticas del sistema"""
     st.markdown(
@@ -752,13 +811,15 @@ def main():
     if "processed" not in st.session_state:
         st.session_state.processed = False
     if "show_upload" not in st.session_state:
-        st.session_state.show_upload = True
-    if "processed_docs" not in st.session_state:
-        st.session_state.processed_docs = 0
+        # Tras recargar la página con un documento en proceso, se sigue su avance
+        st.session_state.show_upload = "job" not in st.query_params
+    if "corpus" not in st.session_state:
+        # Documentos de la sesión, consultados como un único índice
+        st.session_state.corpus = Corpus()
 
     # Estadísticas
     render_stats(
-        processed_docs=st.session_state.processed_docs,
+        processed_docs=len(st.session_state.corpus.documents),
         total_messages=len(st.session_state.messages),
     )
 
@@ -766,49 +827,29 @@ def main():
     if st.session_state.show_upload:
         uploaded_file, process_btn = render_upload_section()
 
-        if uploaded_file and process_btn:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        if "ingestion_error" in st.session_state:
+            st.error(f"❌ {st.session_state.pop('ingestion_error')}")
 
+        if uploaded_file and process_btn:
             try:
-                status_text.info("🔍 Analizando documento...")
-                progress_bar.progress(25)
-
-                file_name = uploaded_file.name
-                embds = retrieve_dataframe(file_name)
-
-                if embds.empty:
-                    status_text.info("🧠 Generando embeddings...")
-                    progress_bar.progress(50)
-
-                    final_text = extract_context(uploaded_file)
-                    progress_bar.progress(75)
-
-                    embds = compute_embeddings(final_text)
-                    store_dataframe(file_name, embds)
-
-                progress_bar.progress(100)
-                status_text.success("✅ Documento procesado exitosamente")
-
-                time.sleep(1)  # Pequeña pausa para mejor UX
-
-                st.session_state.embds = embds
-                st.session_state.processed = True
+                # Extraction and embeddings run in the background: the job is followed by id, kept
+                # in the URL so that it survives reruns and page reloads
+                job = get_ingestion_queue().submit(uploaded_file.name, uploaded_file.getvalue())
+                st.query_params["job"] = job.job_id
                 st.session_state.show_upload = False
-                st.session_state.messages = []
-                st.session_state.processed_docs += 1
-
                 st.rerun()
 
             except Exception as e:
                 st.error(f"❌ Error al procesar el documento: {str(e)}")
                 logger.error(f"Error processing file: {str(e)}")
-            finally:
-                progress_bar.empty()
-                status_text.empty()
+
+    # Documento en proceso
+    if "job" in st.query_params:
+        render_ingestion_job(st.query_params["job"])
 
     # Interfaz de chat
     if st.session_state.processed:
+        selected_docs = render_documents(st.session_state.corpus)
         render_chat_interface()
 
         # Input de chat
@@ -826,14 +867,19 @@ def main():
 
             try:
                 # Generar respuesta
-                response_gen = response_generator(prompt, st.session_state.embds)
+                response_gen = response_generator(
+                    prompt, st.session_state.corpus, doc_ids=selected_docs
+                )
 
                 # Contenedor para la respuesta en streaming
                 response_placeholder = st.empty()
                 full_response = ""
 
-                # Simular streaming (si el generador no es realmente streaming)
+                # Renderizar los fragmentos a medida que llegan del modelo
                 for chunk in response_gen:
+                    if not full_response:
+                        # Primer fragmento: el indicador de escritura ya no es necesario
+                        typing_placeholder.empty()
                     full_response += chunk
                     # Actualizar respuesta progresivamente
                     with response_placeholder:
@@ -860,7 +906,7 @@ def main():
         # Botón para nueva consulta
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            if st.button("🔄 Nuevo Documento", use_container_width=True):
+            if st.button("➕ Agregar Documento", use_container_width=True):
                 st.session_state.show_upload = True
                 st.session_state.processed = False
                 st.rerun()
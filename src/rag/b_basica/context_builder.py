@@ -0,0 +1,103 @@
+"""
+Token-aware packing of the retrieved chunks into the prompt context.
+
+Retrieval returns more candidates than fit in the prompt. Their lengths vary widely, from a
+one-line table row to a full page of an installation guide. The builder fills a budget of
+CONTEXT_MAX_TOKENS by score instead of taking a fixed number of chunks:
+    1. Candidates are taken best first. A chunk whose words mostly repeat a chunk already taken
+       (Jaccard similarity of their word sets >= CONTEXT_DUPLICATE_THRESHOLD) is dropped.
+    2. A chunk that does not fit in the remaining budget is skipped, so shorter, lower-ranked
+       chunks can still use the budget. The best chunk is truncated if it alone exceeds it.
+    3. Selected paragraphs that follow each other on the same page are merged back into one
+       passage, in reading order.
+"""
+
+# Standard imports
+from dataclasses import dataclass
+
+# Third party imports
+import pandas as pd
+
+# Internal imports
+from src.config.parameters import CONTEXT_DUPLICATE_THRESHOLD, CONTEXT_MAX_TOKENS
+from src.models_ia.tokens import count_tokens, truncate_tokens
+from src.rag.b_basica.lexical_index import tokenize
+
+# Separator of the passages in the context
+PASSAGE_SEPARATOR = "\n\n"
+
+
+@dataclass
+class PackedContext:
+    """
+    Context sent to the model.
+
+    Attributes:
+        text (str): The passages, best first, separated by blank lines.
+        chunks (pd.DataFrame): The chunks included, best first, to cite as sources.
+        tokens (int): Tokens used by the context.
+    """
+
+    text: str
+    chunks: pd.DataFrame
+    tokens: int
+
+
+def _jaccard(words: set[str], other: set[str]) -> float:
+    if not words or not other:
+        return 0.0
+    return len(words & other) / len(words | other)
+
+
+def build_context(
+    chunks: pd.DataFrame,
+    max_tokens: int = CONTEXT_MAX_TOKENS,
+    duplicate_threshold: float = CONTEXT_DUPLICATE_THRESHOLD,
+) -> PackedContext:
+    """
+    Selects the best chunks that fit in a token budget and merges adjacent paragraphs.
+
+    Args:
+        chunks (pd.DataFrame): Retrieved chunks with 'doc_id', 'page', 'paragraph', 'text' and
+            'score' columns (see nlp_proc.retrieve_chunks).
+        max_tokens (int): Token budget of the context.
+        duplicate_threshold (float): Word-set Jaccard similarity from which a chunk is considered
+            a near-duplicate of a better one.
+
+    Returns:
+        PackedContext: The context text, the chunks it includes and its size in tokens.
+    """
+    candidates = chunks.sort_values("score", ascending=False, kind="stable")
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR)
+    selected, texts, word_sets = [], [], []
+    used = 0
+    for position, row in enumerate(candidates.itertuples()):
+        words = set(tokenize(row.text))
+        if any(_jaccard(words, other) >= duplicate_threshold for other in word_sets):
+            continue
+        text = row.text
+        tokens = count_tokens(text) + separator_tokens
+        if used + tokens > max_tokens:
+            if selected:
+                continue
+            # The best chunk alone exceeds the budget: keep its beginning
+            text = truncate_tokens(text, max_tokens - separator_tokens)
+            tokens = max_tokens
+        selected.append(position)
+        texts.append(text)
+        word_sets.append(words)
+        used += tokens
+
+    ranked = candidates.iloc[selected].assign(text=texts)
+
+    # Runs of consecutive paragraphs of the same page form one passage, ranked by its best chunk
+    passages = []
+    for _, group in ranked.groupby(["doc_id", "page"], sort=False):
+        group = group.sort_values("paragraph")
+        run_start = (group["paragraph"].diff() != 1).cumsum()
+        for _, run in group.groupby(run_start):
+            passages.append((run["score"].max(), "\n".join(run["text"])))
+    passages.sort(key=lambda passage: -passage[0])
+
+    text = PASSAGE_SEPARATOR.join(passage for _, passage in passages)
+    return PackedContext(text, ranked, used)
@@ -0,0 +1,89 @@
+"""
+One-shot converter of the legacy pickled embedding DataFrames (data/embeddings/*.pkl) into the
+paragraph embedding cache (models_ia.embedding_cache).
+
+Stores are now keyed by the content of the uploaded file, which a pickle does not hold, so the
+pickles cannot become stores themselves. Their (text, embedding) rows seed the embedding cache
+instead: when a document is uploaded again, its paragraphs that were already embedded come from
+the cache, and only the ones that changed (e.g. table chunks since CHUNKING_VERSION 2) call the
+embeddings API.
+
+Pickles can execute arbitrary code when loaded: only run this on files produced by this project.
+
+Usage:
+    python -m src.rag.b_basica.convert_pickles [--model MODEL] [--remove]
+"""
+
+# Standard imports
+import argparse
+import glob
+import os
+import pickle  # nosec B403
+
+# Third party imports
+import numpy as np
+from loguru import logger
+
+# Internal imports
+from src.config.settings import DATA_PATH, OPENAI_EMBEDDINGS_MODEL
+from src.models_ia.embedding_cache import EmbeddingCache, get_embedding_cache
+
+
+def convert_pickle(pickle_path: str, model: str, cache: EmbeddingCache | None = None) -> int:
+    """
+    Adds the paragraphs of a pickled embeddings DataFrame to the embedding cache.
+
+    Args:
+        pickle_path (str): Path to the .pkl file.
+        model (str): Embedding model used to compute the stored vectors (not recorded in pickles).
+        cache (EmbeddingCache | None): The cache to seed. Defaults to the process-wide cache.
+
+    Returns:
+        int: Number of paragraphs added to the cache.
+    """
+    with open(pickle_path, "rb") as f:
+        df = pickle.load(f)  # nosec B301
+    if df.empty:
+        return 0
+
+    # Stored embeddings are nested as [[...]], so reshape to one row per paragraph
+    matrix = np.asarray(df["embeddings"].tolist(), dtype=np.float32).reshape(len(df), -1)
+    # The vectors were embedded at their full length: that is their cache dimension
+    cache = cache or get_embedding_cache()
+    cache.put_many(df["text"].tolist(), list(matrix), model, matrix.shape[1])
+    return len(df)
+
+
+def convert_pickles(model: str = OPENAI_EMBEDDINGS_MODEL, remove: bool = False) -> int:
+    """
+    Seeds the embedding cache with every pickle found in the local 'embeddings' directory.
+
+    Args:
+        model (str): Embedding model used to compute the stored vectors.
+        remove (bool): Whether to delete each pickle once it has been converted.
+
+    Returns:
+        int: Number of converted files.
+    """
+    converted = 0
+    for pickle_path in sorted(glob.glob(os.path.join(DATA_PATH, "embeddings", "*.pkl"))):
+        try:
+            paragraphs = convert_pickle(pickle_path, model)
+        except Exception as e:
+            logger.error(f"Could not convert {pickle_path}: {e}")
+            continue
+        logger.info(f"Cached {paragraphs} paragraph embeddings from {pickle_path}")
+        converted += 1
+        if remove:
+            os.remove(pickle_path)
+    logger.info(f"Converted {converted} pickled embedding files")
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default=OPENAI_EMBEDDINGS_MODEL, help="Embedding model name")
+    parser.add_argument("--remove", action="store_true", help="Delete the converted pickles")
+    args = parser.parse_args()
+
+    convert_pickles(model=args.model, remove=args.remove)
@@ -0,0 +1,213 @@
+"""
+Multi-document corpus for the RAG chatbot.
+
+A session can hold several ingested documents (e.g. a chassis guide and a battery datasheet) and
+query them as one retrieval index. Each document is kept as a segment with its own vector and BM25
+indexes, so adding or removing a document never rebuilds the others: searches run on every
+selected segment and their results are merged by score. Chunks are addressed by their position
+across the segments, and `rows` returns them with the document id and file name, so results can be
+filtered by document and cited by file. The segments' indexes may be shared with other sessions
+(see index_cache): the corpus only reads them and never copies them whole. Tabular documents also
+carry their TableEngine, which answers filter and aggregate questions without embeddings.
+"""
+
+# Standard imports
+from dataclasses import dataclass
+
+# Third party imports
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# Internal imports
+from src.rag.b_basica.lexical_index import LexicalIndex, identifiers
+from src.rag.b_basica.table_engine import TableEngine
+from src.rag.b_basica.vector_index import VectorIndex
+
+
+@dataclass
+class Segment:
+    """One ingested document: its indexes and its position in the merged chunks table."""
+
+    doc_id: str
+    file_name: str
+    index: VectorIndex
+    lexical: LexicalIndex
+    offset: int = 0
+    table: TableEngine | None = None
+
+
+class Corpus:
+    """
+    Set of documents searched as a single index, with incremental add and remove.
+
+    Attributes:
+        segments (dict[str, Segment]): The documents, by id, in insertion order.
+    """
+
+    def __init__(self) -> None:
+        self.segments: dict[str, Segment] = {}
+
+    def __len__(self) -> int:
+        return sum(len(segment.index) for segment in self.segments.values())
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.segments
+
+    @property
+    def documents(self) -> dict[str, str]:
+        """File name of every document, by id."""
+        return {doc_id: segment.file_name for doc_id, segment in self.segments.items()}
+
+    def rows(self, ids: np.ndarray) -> pd.DataFrame:
+        """
+        Returns the metadata of chunks by position, with 'doc_id' and 'file_name' columns.
+
+        Args:
+            ids (np.ndarray): Chunk positions, as returned by the searches.
+
+        Returns:
+            pd.DataFrame: A copy of the selected rows, in the order of `ids`.
+        """
+        segments = list(self.segments.values())
+        if len(ids) == 0 or not segments:
+            return pd.DataFrame(columns=["doc_id", "file_name"])
+        offsets = np.array([segment.offset for segment in segments])
+        # Segment holding each chunk: the last one starting at or before its position
+        owners = np.searchsorted(offsets, ids, side="right") - 1
+        frames = []
+        for position, owner in zip(ids, owners):
+            segment = segments[owner]
+            row = segment.index.chunks.iloc[[position - segment.offset]]
+            frames.append(row.assign(doc_id=segment.doc_id, file_name=segment.file_name))
+        return pd.concat(frames, ignore_index=True)
+
+    def add(
+        self,
+        doc_id: str,
+        file_name: str,
+        index: VectorIndex,
+        lexical: LexicalIndex | None = None,
+        table: TableEngine | None = None,
+    ) -> None:
+        """
+        Adds a document to the corpus, replacing any document with the same id.
+
+        Args:
+            doc_id (str): Unique id of the document.
+            file_name (str): Name shown in the answer references.
+            index (VectorIndex): Vector index of the document's chunks.
+            lexical (LexicalIndex | None): BM25 index over the same chunks, built if not given.
+            table (TableEngine | None): Query engine of a tabular document.
+        """
+        if lexical is None:
+            lexical = LexicalIndex(index.chunks["text"].tolist())
+        if doc_id in self.segments:
+            self.remove(doc_id)
+        self.segments[doc_id] = Segment(
+            doc_id, file_name, index, lexical, offset=len(self), table=table
+        )
+        logger.info(f"Added {file_name} ({len(index)} chunks) to the corpus")
+
+    def remove(self, doc_id: str) -> None:
+        """
+        Removes a document from the corpus. The other documents' indexes are left untouched.
+
+        Args:
+            doc_id (str): Id of the document to remove.
+        """
+        segment = self.segments.pop(doc_id, None)
+        if segment is None:
+            return
+        offset = 0
+        for other in self.segments.values():
+            other.offset = offset
+            offset += len(other.index)
+        logger.info(f"Removed {segment.file_name} from the corpus")
+
+    def _selected(self, doc_ids: list[str] | None) -> list[Segment]:
+        if doc_ids is None:
+            return list(self.segments.values())
+        return [self.segments[doc_id] for doc_id in doc_ids if doc_id in self.segments]
+
+    def tables(self, doc_ids: list[str] | None = None) -> list[Segment]:
+        """Returns the selected documents that have a table query engine."""
+        return [segment for segment in self._selected(doc_ids) if segment.table is not None]
+
+    @staticmethod
+    def _merge(
+        results: list[tuple[np.ndarray, np.ndarray]], k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Merges per-segment (global ids, scores) results into the k best, best first."""
+        if not results:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate([ids for ids, _ in results])
+        scores = np.concatenate([scores for _, scores in results])
+        top = np.argsort(-scores, kind="stable")[:k]
+        return ids[top], scores[top]
+
+    def search(
+        self, query_embedding: list | np.ndarray, k: int, doc_ids: list[str] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k chunks most similar to a query embedding across the selected documents.
+
+        Args:
+            query_embedding (list | np.ndarray): The query embedding.
+            k (int): Number of results to return.
+            doc_ids (list[str] | None): Documents to search, or None for all of them.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Chunk positions (see `rows`) and cosine similarities,
+            sorted by decreasing similarity.
+        """
+        results = []
+        for segment in self._selected(doc_ids):
+            ids, scores = segment.index.search(query_embedding, k)
+            results.append((ids + segment.offset, scores))
+        return self._merge(results, k)
+
+    def lexical_search(
+        self, query: str, k: int, doc_ids: list[str] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k chunks with the highest BM25 score across the selected documents.
+
+        BM25 statistics are per document, which is enough for the rank-based fusion done at
+        query time.
+
+        Args:
+            query (str): The question.
+            k (int): Number of results to return.
+            doc_ids (list[str] | None): Documents to search, or None for all of them.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Chunk positions (see `rows`) and BM25 scores, best
+            first.
+        """
+        results = []
+        for segment in self._selected(doc_ids):
+            ids, scores = segment.lexical.search(query, k)
+            results.append((ids + segment.offset, scores))
+        return self._merge(results, k)
+
+    def exact_identifiers(self, query: str, doc_ids: list[str] | None = None) -> list[str]:
+        """
+        Returns the identifiers of the query when all of them appear verbatim in the corpus.
+
+        Args:
+            query (str): The question.
+            doc_ids (list[str] | None): Documents to look in, or None for all of them.
+
+        Returns:
+            list[str]: The identifiers, or an empty list if the query has none or any of them is
+            unknown to the selected documents.
+        """
+        query_identifiers = identifiers(query)
+        segments = self._selected(doc_ids)
+        if query_identifiers and all(
+            any(token in segment.lexical.vocabulary for segment in segments)
+            for token in query_identifiers
+        ):
+            return query_identifiers
+        return []
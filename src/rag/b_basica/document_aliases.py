@@ -0,0 +1,87 @@
+"""
+File name aliases of the stored documents.
+
+Stored documents are keyed by a hash of their content and processing parameters (see
+utils.document_key), so the same file uploaded under several names is embedded once and two
+different files sharing a name never collide. This local SQLite table remembers which file names
+each document key was seen under, so tools that only know a file name can find its stores with a
+primary-key lookup, without reading or parsing the file.
+"""
+
+# Standard imports
+import os
+import sqlite3
+import threading
+import time
+
+# Internal imports
+from src.config.settings import DATA_PATH
+
+DOCUMENT_ALIASES_PATH = os.path.join(DATA_PATH, "embeddings", "document_aliases.sqlite")
+
+
+class DocumentAliases:
+    """SQLite-backed (file name -> document key) table. Safe to share between threads."""
+
+    def __init__(self, path: str = DOCUMENT_ALIASES_PATH) -> None:
+        """
+        Args:
+            path (str): Location of the SQLite database file.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS aliases (
+                file_name TEXT NOT NULL,
+                doc_key TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (file_name, doc_key)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_doc_key ON aliases (doc_key)")
+        self._conn.commit()
+
+    def add(self, file_name: str, doc_key: str) -> None:
+        """Records that a document was uploaded under a file name."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aliases (file_name, doc_key, last_seen) VALUES (?, ?, ?)",
+                (file_name, doc_key, time.time()),
+            )
+            self._conn.commit()
+
+    def doc_keys(self, file_name: str) -> list[str]:
+        """Returns the keys of the documents seen under a file name, most recent first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_key FROM aliases WHERE file_name = ? ORDER BY last_seen DESC",
+                (file_name,),
+            ).fetchall()
+        return [doc_key for (doc_key,) in rows]
+
+    def file_names(self, doc_key: str) -> list[str]:
+        """Returns the file names a document was seen under, most recent first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_name FROM aliases WHERE doc_key = ? ORDER BY last_seen DESC",
+                (doc_key,),
+            ).fetchall()
+        return [file_name for (file_name,) in rows]
+
+
+_default_aliases: DocumentAliases | None = None
+_default_aliases_lock = threading.Lock()
+
+
+def get_document_aliases() -> DocumentAliases:
+    """Returns the process-wide alias table, opening it on first use."""
+    global _default_aliases
+    with _default_aliases_lock:
+        if _default_aliases is None:
+            _default_aliases = DocumentAliases()
+        return _default_aliases
@@ -0,0 +1,154 @@
+"""
+Process-wide cache of the loaded document indexes, shared by every Streamlit session.
+
+Without it, each session would load its own vector index, BM25 index and table connection for a
+document. Thirty technicians working on the same chassis guide would hold thirty copies. Loaded
+documents are kept here instead, keyed by document key (a hash of their content, see
+utils.document_key), in an LRU bounded to INDEX_CACHE_MAX_BYTES. Sessions only hold references
+to them.
+
+Shared entries are never modified: their vectors and BM25 arrays are flagged read-only when
+cached, and the chunk metadata is only read (the corpus copies the rows it returns). An evicted
+document stays alive while a session still holds it; it is reloaded from storage on the next miss.
+Hits, misses and evictions are counted to size the cache.
+"""
+
+# Standard imports
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Third party imports
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import INDEX_CACHE_MAX_BYTES
+from src.rag.b_basica.lexical_index import LexicalIndex
+from src.rag.b_basica.table_engine import TableEngine
+from src.rag.b_basica.vector_index import VectorIndex
+
+
+@dataclass(frozen=True)
+class LoadedDocument:
+    """
+    Indexes of a loaded document, shared by the sessions that query it.
+
+    Attributes:
+        index (VectorIndex): Vector index of the document's chunks.
+        lexical (LexicalIndex): BM25 index over the same chunks.
+        table (TableEngine | None): Query engine of tabular documents.
+        nbytes (int): Approximate memory held by the indexes.
+    """
+
+    index: VectorIndex
+    lexical: LexicalIndex
+    table: TableEngine | None
+    nbytes: int
+
+
+def _read_only(index: VectorIndex, lexical: LexicalIndex) -> None:
+    """Flags the arrays shared between sessions as read-only."""
+    arrays = [index.matrix, lexical.idf, lexical.weights.data]
+    arrays += [lexical.weights.indices, lexical.weights.indptr]
+    for array in arrays:
+        array.flags.writeable = False
+
+
+class IndexCache:
+    """Byte-bounded LRU of loaded documents, by document key. Safe to share between threads."""
+
+    def __init__(self, max_bytes: int = INDEX_CACHE_MAX_BYTES) -> None:
+        """
+        Args:
+            max_bytes (int): Approximate memory bound of the cached indexes.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, LoadedDocument] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, doc_key: str) -> LoadedDocument | None:
+        """Returns a loaded document and marks it as recently used, or None on a miss."""
+        with self._lock:
+            document = self._entries.get(doc_key)
+            if document is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(doc_key)
+            self.hits += 1
+            return document
+
+    def put(
+        self,
+        doc_key: str,
+        index: VectorIndex,
+        lexical: LexicalIndex | None = None,
+        table: TableEngine | None = None,
+    ) -> LoadedDocument:
+        """
+        Caches a loaded document, evicting the least recently used ones beyond the size bound.
+
+        Args:
+            doc_key (str): Key of the document.
+            index (VectorIndex): Its vector index.
+            lexical (LexicalIndex | None): Its BM25 index, built if not given.
+            table (TableEngine | None): Query engine of tabular documents.
+
+        Returns:
+            LoadedDocument: The entry to share. A document larger than the whole cache is
+            returned without being cached.
+        """
+        if lexical is None:
+            lexical = LexicalIndex(index.chunks["text"].tolist())
+        _read_only(index, lexical)
+        document = LoadedDocument(index, lexical, table, index.nbytes + lexical.nbytes)
+
+        with self._lock:
+            if document.nbytes > self.max_bytes:
+                logger.warning(
+                    f"Document {doc_key[:12]} ({document.nbytes / 1024**2:.0f} MB) exceeds the "
+                    f"index cache ({self.max_bytes / 1024**2:.0f} MB), it is not cached"
+                )
+                return document
+            previous = self._entries.pop(doc_key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[doc_key] = document
+            self._bytes += document.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+            logger.info(f"Index cache: {self.stats()}")
+        return document
+
+    def stats(self) -> dict:
+        """Returns the counters and the size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_default_cache: IndexCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def get_index_cache() -> IndexCache:
+    """Returns the process-wide index cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = IndexCache()
+        return _default_cache
@@ -0,0 +1,157 @@
+"""
+Background ingestion of uploaded documents for the RAG chatbot.
+
+Extracting and embedding a long PDF takes minutes. Running it inside the Streamlit script blocks
+the session and is lost when the browser reloads. Uploads are instead submitted to a
+process-wide queue. A pool of INGESTION_WORKERS threads runs `utils.ingest_document` and records
+its real progress (pages extracted, rows loaded, chunks embedded) on the job. Sessions poll their
+job by id, which the app keeps in the URL, so a rerun or a reload picks the same job up again.
+Jobs are deduplicated by document key: when two users upload the same file, both follow a single
+job.
+"""
+
+# Standard imports
+import io
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Third party imports
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import INGESTION_JOB_TTL, INGESTION_WORKERS, MAX_PAGES
+from src.rag.b_basica.document_aliases import get_document_aliases
+from src.rag.b_basica.index_cache import LoadedDocument
+from src.rag.b_basica.utils import document_key, ingest_document
+
+
+@dataclass
+class IngestionJob:
+    """
+    State of a document being ingested. Updated by the worker thread, read by the sessions.
+
+    Attributes:
+        job_id (str): Id used by the sessions to poll the job.
+        doc_key (str): Key of the document, from `utils.document_key`.
+        file_name (str): Name of the upload that created the job.
+        status (str): 'queued', 'running', 'done' or 'failed'.
+        progress (float): Completed fraction, between 0 and 1.
+        message (str): Current step, shown to the user.
+        document (LoadedDocument | None): The document's indexes, once done.
+        error (str | None): Error message of a failed job.
+        finished_at (float | None): Time the job finished, done or failed.
+    """
+
+    job_id: str
+    doc_key: str
+    file_name: str
+    status: str = "queued"
+    progress: float = 0.0
+    message: str = "En cola"
+    document: LoadedDocument | None = None
+    error: str | None = None
+    finished_at: float | None = None
+
+
+class IngestionQueue:
+    """Pool of worker threads ingesting documents, with jobs deduplicated by document key."""
+
+    def __init__(self, workers: int = INGESTION_WORKERS, job_ttl: float = INGESTION_JOB_TTL):
+        """
+        Args:
+            workers (int): Number of documents ingested at the same time.
+            job_ttl (float): Seconds a finished job is kept before being forgotten.
+        """
+        self.job_ttl = job_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion")
+        self._lock = threading.Lock()
+        self._jobs: dict[str, IngestionJob] = {}
+        self._jobs_by_key: dict[str, str] = {}
+
+    def submit(
+        self, file_name: str, content: bytes, max_pages: int | None = MAX_PAGES
+    ) -> IngestionJob:
+        """
+        Queues the ingestion of an uploaded document, or returns the job already ingesting it.
+
+        Args:
+            file_name (str): Name of the upload.
+            content (bytes): Content of the upload. The worker reads its own copy, so the session
+                can let go of the uploaded file.
+            max_pages (int | None): Page budget of PDFs, or None to extract every page.
+
+        Returns:
+            IngestionJob: The job to poll. Failed jobs are not reused: the upload is retried.
+        """
+        upload = io.BytesIO(content)
+        upload.name = file_name
+        doc_key = document_key(upload, max_pages)
+
+        with self._lock:
+            self._forget_expired()
+            job_id = self._jobs_by_key.get(doc_key)
+            if job_id is not None and self._jobs[job_id].status != "failed":
+                job = self._jobs[job_id]
+                logger.info(f"{file_name} is already ingested by job {job.job_id}")
+                get_document_aliases().add(file_name, doc_key)
+                return job
+            job = IngestionJob(uuid.uuid4().hex, doc_key, file_name)
+            self._jobs[job.job_id] = job
+            self._jobs_by_key[doc_key] = job.job_id
+
+        self._executor.submit(self._run, job, upload, max_pages)
+        logger.info(f"Queued job {job.job_id} to ingest {file_name}")
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        """Returns a job by id, or None if unknown or expired."""
+        with self._lock:
+            self._forget_expired()
+            return self._jobs.get(job_id)
+
+    def _forget_expired(self) -> None:
+        """Drops the finished jobs older than the TTL, and their results. Called with the lock."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.job_ttl:
+                del self._jobs[job_id]
+                if self._jobs_by_key.get(job.doc_key) == job_id:
+                    del self._jobs_by_key[job.doc_key]
+
+    @staticmethod
+    def _run(job: IngestionJob, upload: io.BytesIO, max_pages: int | None) -> None:
+        def report(fraction: float, message: str) -> None:
+            job.progress, job.message = fraction, message
+
+        job.status = "running"
+        start = time.perf_counter()
+        try:
+            _, job.document = ingest_document(upload, max_pages, progress=report)
+        except Exception as e:
+            logger.exception(f"Job {job.job_id} failed to ingest {job.file_name}")
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.status = "failed"
+            return
+        # The status is set last: sessions read the results as soon as they see it
+        job.finished_at = time.time()
+        job.status = "done"
+        logger.info(
+            f"Job {job.job_id} ingested {job.file_name} in {time.perf_counter() - start:.1f}s"
+        )
+
+
+_default_queue: IngestionQueue | None = None
+_default_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Returns the process-wide ingestion queue, shared by all sessions, creating it on first use."""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = IngestionQueue()
+        return _default_queue
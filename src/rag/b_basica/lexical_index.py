@@ -0,0 +1,235 @@
+"""
+Lexical (BM25) index for the RAG chatbot, promoted from the BM25 example in
+rag/a_intro/0_lexical_method.py (preprocess_text, create_bm25_index, get_bm25_scores).
+
+Dense embeddings often miss exact identifiers such as part numbers ("SFP-10G-LR",
+"ZXDUPA-WR12"). The lexical index is built at ingestion next to the vector index, and its ranking
+is fused with the dense one using reciprocal rank fusion (RRF). Identifiers are kept as whole
+tokens (and also split into their parts), so a question naming a part number present in the
+document can be answered from the lexical index alone, without calling the embeddings API.
+
+Scoring uses a sparse term-document matrix of precomputed BM25 weights instead of rank_bm25's
+per-document Python loops, so its cost grows with the query terms' postings, not the corpus size.
+"""
+
+# Standard imports
+import re
+import sys
+from functools import lru_cache
+
+# Third party imports
+import nltk
+import numpy as np
+from loguru import logger
+from nltk.corpus import stopwords
+from scipy import sparse
+
+# Internal imports
+from src.config.parameters import HYBRID_RRF_K
+
+# Words, optionally joined by '-', '.', '/' or '_' (e.g. "sfp-10g-lr", "1/1/5", "v2.6r01m01")
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+SPLIT_PATTERN = re.compile(r"[-./_]")
+# An identifier mixes letters and digits, or joins several parts (e.g. "zxdupa-wr12")
+IDENTIFIER_PATTERN = re.compile(r"(?=.*\d)(?=.*[a-z])|[-./]")
+
+
+@lru_cache(maxsize=1)
+def spanish_stopwords() -> frozenset[str]:
+    """Returns the NLTK Spanish stopwords, downloading them on first use if needed."""
+    try:
+        return frozenset(stopwords.words("spanish"))
+    except LookupError:
+        nltk.download("stopwords", quiet=True)
+    try:
+        return frozenset(stopwords.words("spanish"))
+    except LookupError:
+        # BM25's IDF already down-weights frequent words, so keep working without the list
+        logger.warning("NLTK Spanish stopwords unavailable, lexical index keeps every word")
+        return frozenset()
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercases a text and splits it into tokens, removing Spanish stopwords.
+
+    Compound tokens such as part numbers are kept whole and also split into their parts, so
+    "SFP-10G-LR" matches both the exact identifier and a query like "SFP 10G".
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list[str]: The tokens.
+    """
+    stop_words = spanish_stopwords()
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in stop_words:
+            continue
+        tokens.append(token)
+        parts = [part for part in SPLIT_PATTERN.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part not in stop_words)
+    return tokens
+
+
+def identifiers(text: str) -> list[str]:
+    """Returns the identifier-like tokens of a text (part numbers, ports, versions...)."""
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) >= 3 and IDENTIFIER_PATTERN.search(token)
+    ]
+
+
+class LexicalIndex:
+    """
+    BM25 (Okapi) index over the chunks of a document, aligned with the rows of its VectorIndex.
+
+    The corpus is stored as a sparse term-document matrix whose non-zero entries already hold the
+    BM25 weight of each (chunk, term) pair, i.e. IDF and length normalization are precomputed at
+    ingestion. Scoring a query, or a batch of queries, is then a single sparse matrix product.
+    IDF values, including the floor of common terms, follow rank_bm25.BM25Okapi (a_intro example),
+    except that the floor also covers terms found in exactly half of the chunks (IDF 0) and stays
+    positive in segments of one or two chunks, where BM25Okapi's would hide every match.
+    """
+
+    def __init__(self, texts: list[str], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        """
+        Args:
+            texts (list[str]): Chunk texts, in the same order as the vector index rows.
+            k1 (float): Term frequency saturation.
+            b (float): Length normalization strength.
+            epsilon (float): Floor of the IDF of very common terms, as a fraction of the mean IDF.
+        """
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: dict[str, int] = {}
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+
+        n_docs = len(texts)
+        # Duplicate (row, col) pairs are summed, giving the term frequencies
+        tf = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(n_docs, len(self.vocabulary)),
+        )
+        tf.sum_duplicates()
+
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if n_docs and doc_len.mean() > 0 else 1.0
+        doc_freq = np.bincount(tf.indices, minlength=len(self.vocabulary))
+        idf = np.log((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        # Terms found in half of the chunks or more get the floor of BM25Okapi: epsilon * mean IDF.
+        # In segments of one or two chunks that mean is not positive and would hide every match:
+        # the floor is then based on the positive IDFs only (or epsilon when there are none)
+        if len(idf):
+            floor = epsilon * idf.mean()
+            if floor <= 0:
+                positive = idf[idf > 0]
+                floor = epsilon * (positive.mean() if len(positive) else 1.0)
+            idf[idf <= 0] = floor
+        self.idf = idf.astype(np.float32)
+
+        # BM25 weight of every non-zero entry: idf * tf * (k1 + 1) / (tf + k1 * length_norm)
+        length_norm = k1 * (1 - b + b * doc_len / avg_len)
+        weights = tf.copy()
+        row_of_entry = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+        weights.data = (
+            self.idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + length_norm[row_of_entry])
+        ).astype(np.float32)
+        # Column-major, so that only the columns of the query terms are read
+        self.weights = weights.tocsc()
+
+    def __len__(self) -> int:
+        return self.weights.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index: BM25 weights, IDF and vocabulary."""
+        weights = self.weights.data.nbytes + self.weights.indices.nbytes
+        weights += self.weights.indptr.nbytes
+        vocabulary = sys.getsizeof(self.vocabulary) + sum(map(sys.getsizeof, self.vocabulary))
+        return weights + self.idf.nbytes + vocabulary
+
+    def _query_matrix(self, queries: list[str]) -> sparse.csr_matrix:
+        """Builds the (terms x queries) count matrix of a batch of queries."""
+        rows, cols = [], []
+        for col, query in enumerate(queries):
+            for token in tokenize(query):
+                # Terms unknown to the corpus cannot contribute to any score
+                if token in self.vocabulary:
+                    rows.append(self.vocabulary[token])
+                    cols.append(col)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(self.vocabulary), len(queries)),
+        )
+
+    def batch_scores(self, queries: list[str]) -> np.ndarray:
+        """
+        Scores a batch of queries against every chunk with one sparse matrix product.
+
+        Args:
+            queries (list[str]): The questions.
+
+        Returns:
+            np.ndarray: BM25 scores of shape (len(queries), number of chunks).
+        """
+        if not queries:
+            return np.zeros((0, len(self)), dtype=np.float32)
+        scores = self.weights @ self._query_matrix(queries)
+        return np.asarray(scores.T.todense(), dtype=np.float32)
+
+    def scores(self, query: str) -> np.ndarray:
+        """Returns the BM25 score of every chunk for a query."""
+        return self.batch_scores([query])[0]
+
+    def search(self, query: str, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k chunks with the highest BM25 score for a query.
+
+        Args:
+            query (str): The question.
+            k (int): Number of results to return.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Row positions and BM25 scores, sorted by decreasing
+            score. Chunks sharing no term with the query are not returned.
+        """
+        scores = self.scores(query)
+        matching = np.flatnonzero(scores > 0)
+        if len(matching) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = matching[np.argsort(-scores[matching])[:k]]
+        return top, scores[top]
+
+
+def reciprocal_rank_fusion(
+    rankings: list[np.ndarray], k: int = HYBRID_RRF_K
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses several rankings of the same corpus with reciprocal rank fusion.
+
+    Each item receives sum(1 / (k + rank)) over the rankings it appears in (rank starting at 1).
+
+    Args:
+        rankings (list[np.ndarray]): Row positions, best first, one array per retriever.
+        k (int): RRF constant; higher values flatten the contribution of the top ranks.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Row positions and fused scores, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking.tolist(), start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    if not fused:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    ids, scores = zip(*ordered)
+    return np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float32)
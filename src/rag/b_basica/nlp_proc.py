@@ -5,16 +5,32 @@ Support for PDF, Excel, and CSV files with RAG
 
 # Standard imports
 import random
-import time
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List
 
 # Third party imports
 import numpy as np
 import pandas as pd
+from loguru import logger
 
 # Internal imports
-from src.config.parameters import NAIVE_RAG_THRESHOLD
+from src.config.parameters import (
+    CONTEXT_CANDIDATES,
+    CONTEXT_MAX_TOKENS,
+    EMBEDDINGS_DIMENSION,
+    HYBRID_CANDIDATES,
+    NAIVE_RAG_THRESHOLD,
+    RAG_TOP_K,
+)
+from src.config.settings import OPENAI_EMBEDDINGS_MODEL
 from src.models_ia.call_model import generate_answer, get_embeddings
+from src.models_ia.embedding_cache import get_embedding_cache
+from src.models_ia.tokens import count_tokens, truncate_tokens
+from src.rag.b_basica.context_builder import PASSAGE_SEPARATOR, build_context
+from src.rag.b_basica.corpus import Corpus, Segment
+from src.rag.b_basica.lexical_index import identifiers, reciprocal_rank_fusion
+from src.rag.b_basica.question_cache import CachedAnswer, get_question_cache
+from src.rag.b_basica.table_engine import TableAnswer
+from src.rag.b_basica.vector_index import VectorIndex, normalize_rows
 
 
 def compute_embeddings(full_text: dict[int, list[str]]) -> pd.DataFrame:
@@ -29,91 +45,317 @@ def compute_embeddings(full_text: dict[int, list[str]]) -> pd.DataFrame:
     Returns:
         pd.DataFrame with columns: ['page', 'paragraph', 'embeddings', 'text', 'source']
     """
+    # Flatten every (page, paragraph) so the whole document is embedded in batched requests
+    rows = [
+        (page, i, text)
+        for page, paragraphs in full_text.items()
+        for i, text in enumerate(paragraphs)
+    ]
+    embeddings = embed_with_cache([text for _, _, text in rows])
+
     data = []
-    for page, paragraphs in full_text.items():
-        embeddings = [(get_embeddings(pg), pg) for pg in paragraphs]
-        for i, (emb, text) in enumerate(embeddings):
-            data.append(
-                {
-                    "page": page,
-                    "paragraph": i,
-                    "embeddings": emb,
-                    "text": text,
-                    "source": "PDF",  # Default, can be changed by extract_context()
-                }
-            )
+    for (page, i, text), emb in zip(rows, embeddings):
+        data.append(
+            {
+                "page": page,
+                "paragraph": i,
+                "embeddings": [emb],  # Same nested layout as single-text get_embeddings calls
+                "text": text,
+                "source": "PDF",  # Default, can be changed by extract_context()
+            }
+        )
 
     return pd.DataFrame(data)
 
 
-def response_generator(question: str, embeddings: pd.DataFrame):
+def build_vector_index(
+    segments: dict[int, list[str]] | Iterable[tuple[int, list[str] | dict[int, str]]],
+    source: str = "PDF",
+    progress: Callable[[int], None] | None = None,
+) -> VectorIndex:
+    """
+    Embeds a document segment by segment and builds its vector index.
+
+    Segments can be streamed (e.g. batches of rows of a large table): each one is embedded as soon
+    as it is produced and only its float32 vectors are kept, so memory stays bounded by the size
+    of the index rather than of the nested lists used by `compute_embeddings`.
+
+    Args:
+        segments: {page: [paragraphs]} dict, or iterable of (page, paragraphs) pairs. Paragraph
+            numbers continue across segments of the same page, unless paragraphs are given as a
+            {paragraph number: text} dict (e.g. the row numbers of a table).
+        source: Source type of the document ('PDF', 'Excel' or 'CSV').
+        progress: Called with the number of chunks embedded so far, after each segment.
+
+    Returns:
+        VectorIndex with columns ['page', 'paragraph', 'text', 'source']
+    """
+    if isinstance(segments, dict):
+        segments = segments.items()
+
+    pages, paragraphs, texts, matrices = [], [], [], []
+    next_paragraph = {}
+    for page, segment in segments:
+        if not segment:
+            continue
+        if isinstance(segment, dict):
+            numbers, segment = list(segment), list(segment.values())
+        else:
+            start = next_paragraph.get(page, 0)
+            numbers = range(start, start + len(segment))
+        next_paragraph[page] = numbers[-1] + 1
+        pages.extend([page] * len(segment))
+        paragraphs.extend(numbers)
+        texts.extend(segment)
+        matrices.append(normalize_rows(np.asarray(embed_with_cache(segment), dtype=np.float32)))
+        logger.info(f"Embedded {len(texts)} {source} chunks")
+        if progress is not None:
+            progress(len(texts))
+
+    chunks = pd.DataFrame(
+        {"page": pages, "paragraph": paragraphs, "text": texts, "source": source}
+    )
+    if not matrices:
+        return VectorIndex(chunks, np.zeros((0, 0), dtype=np.float32), normalized=True)
+    return VectorIndex(chunks, np.concatenate(matrices), normalized=True)
+
+
+def embed_with_cache(
+    texts: list[str], model: str = OPENAI_EMBEDDINGS_MODEL, dimension: int = EMBEDDINGS_DIMENSION
+) -> list[list[float]]:
+    """
+    Embeds texts, calling the API only for paragraphs missing from the local embedding cache.
+
+    Args:
+        texts: The paragraphs to embed.
+        model: The embedding model name.
+        dimension: The embedding dimension.
+
+    Returns:
+        One embedding per text, in the same order.
+    """
+    if not texts:
+        return []
+
+    cache = get_embedding_cache()
+    embeddings = cache.get_many(texts, model, dimension)
+    misses = [i for i, emb in enumerate(embeddings) if emb is None]
+    logger.info(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses")
+
+    if misses:
+        # Identical paragraphs inside the document are sent only once
+        unique_texts = list(dict.fromkeys(texts[i] for i in misses))
+        new_embeddings = get_embeddings(unique_texts, model=model, dimension=dimension)
+        cache.put_many(unique_texts, new_embeddings, model, dimension)
+        computed = dict(zip(unique_texts, new_embeddings))
+        for i in misses:
+            embeddings[i] = computed[texts[i]]
+
+    return embeddings
+
+
+def retrieve_chunks(
+    question: str,
+    corpus: Corpus,
+    k: int = RAG_TOP_K,
+    doc_ids: list[str] | None = None,
+    question_embedding: list | None = None,
+) -> pd.DataFrame:
+    """
+    Retrieves the chunks most relevant to a question, fusing dense and BM25 rankings.
+
+    Args:
+        question: User query
+        corpus: The session's documents, indexed at ingestion
+        k: Number of chunks to return
+        doc_ids: Documents to search, or None for every document of the corpus
+        question_embedding: Embedding of the question, if already computed
+
+    Returns:
+        The selected chunks (see Corpus.rows) with a 'score' column, best first
+    """
+    # Exact identifiers (e.g. part numbers) found in the corpus: no need to embed the question
+    if corpus.exact_identifiers(question, doc_ids):
+        ids, scores = corpus.lexical_search(question, k, doc_ids)
+        if len(ids):
+            logger.info("Exact identifier match, answering from the lexical index")
+            return corpus.rows(ids).assign(score=scores)
+        logger.info("Exact identifier match without lexical hits, using hybrid retrieval")
+
+    # Calculate question embedding
+    q_emb = get_embeddings(question)[0] if question_embedding is None else question_embedding
+
+    # Get the most relevant chunks, without touching the stored corpus
+    dense_ids, dense_scores = corpus.search(q_emb, HYBRID_CANDIDATES, doc_ids)
+    dense_ids = dense_ids[dense_scores > NAIVE_RAG_THRESHOLD]
+
+    lexical_ids, _ = corpus.lexical_search(question, HYBRID_CANDIDATES, doc_ids)
+    ids, scores = reciprocal_rank_fusion([dense_ids, lexical_ids])
+    return corpus.rows(ids[:k]).assign(score=scores[:k])
+
+
+def response_generator(question: str, corpus: Corpus, doc_ids: list[str] | None = None):
     """
     Generates responses using RAG, now with support for tabular data references.
 
     Args:
         question: User query
-        embeddings: DataFrame with context embeddings and metadata
+        corpus: The session's documents, indexed at ingestion
+        doc_ids: Documents to search, or None for every document of the corpus
 
     Yields:
         Response tokens with source references
     """
-    # Calculate question embedding
-    q_emb = get_embeddings(question)
+    # Aggregate and column questions over tables are answered by their query engine alone
+    table_answers = [
+        (segment, answer)
+        for segment in corpus.tables(doc_ids)
+        if (answer := segment.table.query(question)) is not None
+    ]
+    structured = [(segment, answer) for segment, answer in table_answers if answer.is_structured]
+    if structured:
+        yield "\n\n".join(format_table_answer(answer) for _, answer in structured)
+        yield table_references(structured)
+        return
+
+    # A value only mentioned in passing ("router Nokia") does not make it a table question: the
+    # matching rows join the retrieved context, taking at most half of its budget
+    table_text = ""
+    if table_answers:
+        table_text = PASSAGE_SEPARATOR.join(
+            format_table_answer(answer) for _, answer in table_answers
+        )
+        table_text = truncate_tokens(table_text, CONTEXT_MAX_TOKENS // 2)
 
-    # Compute similarities
-    embeddings["similarities"] = embeddings["embeddings"].apply(
-        lambda x: cosine_similarity(x[0], q_emb[0])
+    # Paraphrases of a question already answered over the same documents skip retrieval and
+    # generation. Embeddings barely tell part numbers apart: questions naming one are not reused
+    scope = [doc_id for doc_id in corpus.documents if doc_ids is None or doc_id in doc_ids]
+    question_embedding = None
+    if not identifiers(question):
+        question_embedding = get_embeddings(question)[0]
+        cached = get_question_cache().lookup(scope, question_embedding)
+        if cached is not None:
+            yield cached.answer
+            yield cached.references
+            return
+
+    result = retrieve_chunks(
+        question,
+        corpus,
+        k=CONTEXT_CANDIDATES,
+        doc_ids=doc_ids,
+        question_embedding=question_embedding,
     )
-    # Get top 4 most relevant chunks
-    embeddings = embeddings.sort_values("similarities", ascending=False).head(4)
-    result = embeddings.loc[embeddings.similarities > NAIVE_RAG_THRESHOLD]
 
-    if result.empty:
-        response = (
+    if result.empty and not table_answers:
+        yield (
             "No encontré información relevante en los documentos. Por favor reformula tu pregunta."
         )
+        return
+
+    # Chunks of tables only hold the embedded free text: show the whole row
+    result["text"] = [
+        (
+            text
+            if (table := corpus.segments[doc_id].table) is None
+            else table.rows([paragraph]).get(paragraph, text)
+        )
+        for doc_id, paragraph, text in zip(result["doc_id"], result["paragraph"], result["text"])
+    ]
+    # Best chunks that fit in the prompt budget, without near-duplicates
+    packed = build_context(result, max_tokens=CONTEXT_MAX_TOKENS - count_tokens(table_text))
+    logger.info(f"Context: {len(packed.chunks)} of {len(result)} chunks, {packed.tokens} tokens")
+
+    source_info = {}
+    for i, row in packed.chunks.iterrows():
+        source = (row["file_name"], row.get("source", "PDF"))
+        page = row["page"]
+
+        if source not in source_info:
+            source_info[source] = {}
+        if page not in source_info[source]:
+            source_info[source][page] = []
+
+        source_info[source][page].append(row["paragraph"])
+
+    # Format context based on source type
+    if all(src_type in ["Excel", "CSV"] for _, src_type in source_info):
+        # Tabular data response
+        response = "".join(format_table_answer(answer) for _, answer in table_answers)
+        if not packed.chunks.empty:
+            response += "Datos relevantes encontrados:\n"
+        for text in packed.chunks["text"]:
+            response += f"- {text}\n"
+        answer = [response]
+        yield response
     else:
-        context = []
-        source_info = {}
-
-        for i, row in result.iterrows():
-            context.append(row["text"])
-            src_type = row.get("source", "PDF")
-            page = row["page"]
-
-            if src_type not in source_info:
-                source_info[src_type] = {}
-            if page not in source_info[src_type]:
-                source_info[src_type][page] = []
-
-            source_info[src_type][page].append(row["paragraph"])
-
-        # Format context based on source type
-        if any(src in source_info for src in ["Excel", "CSV"]):
-            # Tabular data response
-            response = "Datos relevantes encontrados:\n"
-            for text in context:
-                response += f"- {text}\n"
-        else:
-            # PDF text response
-            response = generate_answer(question, "\n".join(context))
+        # PDF text response, streamed from the model as it is generated
+        context_ids = [
+            f"{segment.doc_id}:table:{'; '.join(table_answer.filters)}"
+            for segment, table_answer in table_answers
+        ] + [
+            f"{doc_id}:{page}:{paragraph}"
+            for doc_id, page, paragraph in zip(
+                packed.chunks["doc_id"], packed.chunks["page"], packed.chunks["paragraph"]
+            )
+        ]
+        context = PASSAGE_SEPARATOR.join(text for text in (table_text, packed.text) if text)
+        answer = []
+        for delta in generate_answer(question, context, stream=True, context_ids=context_ids):
+            answer.append(delta)
+            yield delta
+
+    # Add references once the answer is complete
+    references = table_references(table_answers) if table_answers else "\n\nFuentes:\n"
+    for (file_name, src_type), pages in source_info.items():
+        for page, paras in pages.items():
+            paras_str = ", ".join(map(str, paras))
+            references += f"- {file_name} ({src_type}), Página {page}: Secciones {paras_str}\n"
+    yield references
+
+    if question_embedding is not None:
+        get_question_cache().add(
+            scope, question_embedding, CachedAnswer(question, "".join(answer), references)
+        )
+
+
+def table_references(table_answers: list[tuple[Segment, TableAnswer]]) -> str:
+    """
+    Formats the sources of table query results.
+
+    Args:
+        table_answers: The tables' documents and their query results
+
+    Returns:
+        The 'Fuentes' header and one line per table with its filters
+    """
+    references = "\n\nFuentes:\n"
+    for segment, answer in table_answers:
+        filters = "; ".join(answer.filters) or "todos los registros"
+        references += f"- {segment.file_name} (tabla), filtros: {filters}\n"
+    return references
 
-        # Add references
-        response += "\n\nFuentes:\n"
-        for src_type, pages in source_info.items():
-            for page, paras in pages.items():
-                paras_str = ", ".join(map(str, paras))
-                response += f"- {src_type}, Página {page}: Secciones {paras_str}\n"
 
-    # Stream response
-    for word in response.split():
-        yield word + " "
-        time.sleep(0.03)
+def format_table_answer(answer: TableAnswer) -> str:
+    """
+    Formats the result of a table query in the same style as the other tabular answers.
 
+    Args:
+        answer: Result of TableEngine.query
 
-def cosine_similarity(a: np.array, b: np.array) -> float:
-    """Computes cosine similarity between two vectors."""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+    Returns:
+        The number of matching rows, the requested aggregates and the first rows
+    """
+    response = f"Registros encontrados: {answer.total}\n"
+    for label, value in answer.aggregates.items():
+        response += f"- {label}: {'-' if value is None else f'{value:g}'}\n"
+    if answer.rows:
+        response += f"Datos relevantes encontrados ({' | '.join(answer.columns)}):\n"
+        for row in answer.rows:
+            response += f"- {' | '.join('' if value is None else str(value) for value in row)}\n"
+        if answer.total > len(answer.rows):
+            response += f"- ... y {answer.total - len(answer.rows)} registros más\n"
+    return response
 
 
 # Debug/testing functions
@@ -141,5 +383,7 @@ if __name__ == "__main__":
     # Test question answering
     test_question = "¿Qué módulos SFP están disponibles en Bogotá?"
     print("\nTesting response generator:")
-    for token in response_generator(test_question, test_df):
+    test_corpus = Corpus()
+    test_corpus.add("debug", "debug.pdf", VectorIndex.from_dataframe(test_df))
+    for token in response_generator(test_question, test_corpus):
         print(token, end="", flush=True)
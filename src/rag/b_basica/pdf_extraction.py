@@ -0,0 +1,150 @@
+"""
+PDF text extraction for the RAG chatbot.
+
+Pages are split into paragraphs with `identify_paragraphs`. Long documents (installation guides of
+several hundred pages) are extracted in parallel: the page range is cut into tasks of
+PDF_PAGES_PER_TASK pages, spread over a pool of worker processes that each open the document
+once, and the {page: [paragraphs]} results are merged back in page order. The page limit is an
+optional budget: when it leaves pages out, a warning says how many.
+
+This module only depends on PyMuPDF so that worker processes start quickly.
+"""
+
+# Standard imports
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+# Third party imports
+import fitz
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import PDF_EXTRACTION_WORKERS, PDF_PAGES_PER_TASK
+
+# Document opened by each worker process of the pool (see _init_worker)
+_worker_doc: fitz.Document | None = None
+
+
+def identify_paragraphs(text: str) -> list:
+    """
+    Splits a string into paragraphs based on the occurrence of at least two newline (\n) characters,
+    possibly separated by spaces.
+
+    Args:
+        text (str): The input text to split into paragraphs.
+
+    Returns:
+        list: A list of paragraphs (strings) with newlines replaced by spaces and stripped of whitespace.
+    """
+    # Split the text based on the pattern of two or more newlines (with optional spaces)
+    parts = re.split(r"(\n\s*\n)+", text)
+    # Filter out any empty strings or strings that only contain whitespace
+    parts = [part.replace("\n", " ").strip() for part in parts if part.strip()]
+    return parts
+
+
+def _open(pdf_file: str | bytes | memoryview) -> fitz.Document:
+    """Opens a PDF from its path or from its content in memory."""
+    if isinstance(pdf_file, str):
+        return fitz.open(pdf_file)
+    return fitz.open(stream=pdf_file, filetype="pdf")
+
+
+def _extract_pages(doc: fitz.Document, start: int, stop: int) -> dict:
+    """Extracts the paragraphs of pages [start, stop) of an open document."""
+    full_text = {}
+    for pn in range(start, stop):
+        # Extract text from each page
+        page_text = doc[pn].get_text()
+        if page_text:
+            # Split the page text into paragraphs
+            full_text[pn] = identify_paragraphs(page_text)
+    return full_text
+
+
+def _init_worker(pdf_file: str | bytes) -> None:
+    """Opens the document once per worker process; tasks then only carry page ranges."""
+    global _worker_doc
+    _worker_doc = _open(pdf_file)
+
+
+def _extract_page_range(page_range: tuple[int, int]) -> dict:
+    return _extract_pages(_worker_doc, *page_range)
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    """
+    Start method of the workers. Forking the caller (e.g. the multi-threaded Streamlit server) is
+    unsafe, so workers are forked from a fork server that has only imported this module: after the
+    first call, starting a worker costs a fork rather than a fresh interpreter.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def extract_text_from_pdf_fitz(
+    pdf_file: str | bytes | memoryview,
+    max_nb_pages: int | None = None,
+    workers: int = PDF_EXTRACTION_WORKERS,
+    progress: Callable[[int, int], None] | None = None,
+) -> dict:
+    """
+    Extracts text from a PDF file using PyMuPDF (fitz), in parallel for long documents.
+
+    Args:
+        pdf_file (str | bytes | memoryview): Path to the PDF file, or its content.
+        max_nb_pages (int | None): Page budget, or None to extract every page.
+        workers (int): Maximum number of worker processes, capped by the CPU count (1 extracts
+            serially).
+        progress (Callable[[int, int], None] | None): Called with the number of pages extracted
+            and the number of pages to extract, each time a range of pages is done.
+
+    Returns:
+        dict: A dictionary mapping page numbers to lists of paragraphs, in page order.
+    """
+    # Open the PDF document from disk or from memory, and release it once read
+    with _open(pdf_file) as doc:
+        page_count = doc.page_count
+        nb_pages = page_count if max_nb_pages is None else min(max_nb_pages, page_count)
+        if nb_pages < page_count:
+            logger.warning(
+                f"Page budget reached: extracting {nb_pages} of {page_count} pages, "
+                f"the last {page_count - nb_pages} pages are not indexed"
+            )
+
+        page_ranges = [
+            (start, min(start + PDF_PAGES_PER_TASK, nb_pages))
+            for start in range(0, nb_pages, PDF_PAGES_PER_TASK)
+        ]
+        # Extra processes only pay off with spare cores and several tasks to share
+        workers = min(workers, len(page_ranges), os.cpu_count() or 1)
+        if workers <= 1:
+            full_text = {}
+            for start, stop in page_ranges:
+                full_text.update(_extract_pages(doc, start, stop))
+                if progress is not None:
+                    progress(stop, nb_pages)
+            return full_text
+
+    source = pdf_file if isinstance(pdf_file, str) else bytes(pdf_file)
+    full_text = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_mp_context(),
+        initializer=_init_worker,
+        initargs=(source,),
+    ) as executor:
+        # map returns the results in submission order, i.e. by page
+        for (_, stop), pages in zip(page_ranges, executor.map(_extract_page_range, page_ranges)):
+            full_text.update(pages)
+            if progress is not None:
+                progress(stop, nb_pages)
+    logger.info(f"Extracted {nb_pages} pages with {workers} processes")
+
+    return full_text
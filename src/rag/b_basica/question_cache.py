@@ -0,0 +1,137 @@
+"""
+Semantic cache of the answers of the RAG chatbot.
+
+Many helpdesk questions are paraphrases of earlier ones ("¿qué SFP hay en Bogotá?" and "módulos
+SFP disponibles Bogotá"). The exact answer cache (models_ia.answer_cache) misses them. This
+cache keeps, for each set of queried documents, the unit-normalized embeddings of the answered
+questions in a small matrix. A new question whose cosine similarity with a past one reaches
+QUESTION_CACHE_THRESHOLD gets the stored answer and sources, without retrieval or generation.
+
+Entries are keyed by the document keys (content hashes), so edited documents never match old
+answers. They are also invalidated when a document's index is rebuilt. The cache lives in memory
+and is shared by every session of the process. Each set of documents keeps at most
+QUESTION_CACHE_MAX_ENTRIES questions, oldest out first.
+"""
+
+# Standard imports
+import threading
+from dataclasses import dataclass
+
+# Third party imports
+import numpy as np
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import QUESTION_CACHE_MAX_ENTRIES, QUESTION_CACHE_THRESHOLD
+from src.rag.b_basica.vector_index import normalize_rows
+
+
+@dataclass
+class CachedAnswer:
+    """An answered question: the answer and its sources, as yielded to the user."""
+
+    question: str
+    answer: str
+    references: str
+
+
+class QuestionCache:
+    """In-memory semantic cache of answers, by set of documents. Safe to share between threads."""
+
+    def __init__(
+        self,
+        threshold: float = QUESTION_CACHE_THRESHOLD,
+        max_entries: int = QUESTION_CACHE_MAX_ENTRIES,
+    ) -> None:
+        """
+        Args:
+            threshold (float): Cosine similarity from which a past question is reused.
+            max_entries (int): Questions kept per set of documents.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Per set of documents: normalized question embeddings and their answers, row by row
+        self._matrices: dict[tuple[str, ...], np.ndarray] = {}
+        self._answers: dict[tuple[str, ...], list[CachedAnswer]] = {}
+
+    def lookup(self, doc_ids: list[str], embedding: list | np.ndarray) -> CachedAnswer | None:
+        """
+        Finds the answer of the most similar past question over the same documents.
+
+        Args:
+            doc_ids (list[str]): Keys of the queried documents.
+            embedding (list | np.ndarray): Embedding of the question.
+
+        Returns:
+            CachedAnswer | None: The answer, if a past question reaches the threshold.
+        """
+        scope = tuple(sorted(doc_ids))
+        query = normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            matrix = self._matrices.get(scope)
+            best = None
+            if matrix is not None and matrix.shape[1] == query.shape[0]:
+                scores = matrix @ query
+                position = int(np.argmax(scores))
+                if scores[position] >= self.threshold:
+                    best = (self._answers[scope][position], float(scores[position]))
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            lookups = self.hits + self.misses
+
+        if best is None:
+            return None
+        answer, similarity = best
+        logger.info(
+            f"Question cache hit (similarity {similarity:.3f} with '{answer.question}'), "
+            f"hit ratio {self.hits / lookups:.0%} over {lookups} lookups"
+        )
+        return answer
+
+    def add(self, doc_ids: list[str], embedding: list | np.ndarray, answer: CachedAnswer) -> None:
+        """
+        Stores the answer of a question over a set of documents.
+
+        Args:
+            doc_ids (list[str]): Keys of the queried documents.
+            embedding (list | np.ndarray): Embedding of the question.
+            answer (CachedAnswer): The answer and its sources.
+        """
+        scope = tuple(sorted(doc_ids))
+        row = normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+        with self._lock:
+            matrix = self._matrices.get(scope)
+            answers = self._answers.get(scope, [])
+            if matrix is None or matrix.shape[1] != row.shape[1]:
+                matrix, answers = row, []
+            else:
+                matrix = np.vstack([matrix, row])
+            answers = answers + [answer]
+            # Oldest questions out first
+            self._matrices[scope] = matrix[-self.max_entries :]
+            self._answers[scope] = answers[-self.max_entries :]
+
+    def invalidate(self, doc_id: str) -> None:
+        """Drops the answers of every set of documents including a document."""
+        with self._lock:
+            for scope in [scope for scope in self._matrices if doc_id in scope]:
+                del self._matrices[scope]
+                del self._answers[scope]
+
+
+_default_cache: QuestionCache | None = None
+_default_cache_lock = threading.Lock()
+
+
+def get_question_cache() -> QuestionCache:
+    """Returns the process-wide question cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = QuestionCache()
+        return _default_cache
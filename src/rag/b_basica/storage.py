@@ -3,15 +3,25 @@ Created by Datoscout at 27/03/2024
 solutions@datoscout.ec
 
 This module provides functions to upload and download files (specifically pandas DataFrames) to and from AWS S3 or local storage, depending on the environment configuration. It abstracts the storage backend, allowing seamless switching between cloud and local storage for data persistence.
+
+Embedding stores are saved in a columnar layout, one folder per document:
+    manifest.json   - format version, embedding model, dimension and number of chunks
+    chunks.parquet  - text and metadata of every chunk (page, paragraph, text, source)
+    vectors.npy     - float32 matrix of unit-normalized embeddings, opened with np.load(mmap_mode="r")
+    ann.faiss       - optional approximate nearest-neighbour index (FAISS) built over the vectors
 """
 
 # Standard imports
+import json
 import os
 import pickle
+import shutil
+import tempfile
 from io import BytesIO
 
 # Third party imports
 # import boto3
+import numpy as np
 import pandas as pd
 
 # External imports
@@ -146,3 +156,185 @@ def download_file(file_name: str) -> pd.DataFrame | bool:
             # Log any error that occurs during local loading
             logger.error(f"Error loading from local storage: {e}")
             return pd.DataFrame()
+
+
+STORE_FORMAT_VERSION = 1
+STORE_FILES = ("manifest.json", "chunks.parquet", "vectors.npy")
+ANN_INDEX_FILE = "ann.faiss"
+
+
+def _local_store_dir(file_name: str) -> str:
+    """Returns the local folder holding the columnar store of a document."""
+    return os.path.join(DATA_PATH, "embeddings", file_name)
+
+
+def _s3_client():
+    """Creates an S3 client. boto3 is only required when AWS storage is configured."""
+    import boto3
+
+    return boto3.Session(
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        region_name=AWS_REGION,
+    ).client("s3")
+
+
+def upload_embeddings(
+    file_name: str,
+    chunks: pd.DataFrame,
+    vectors: np.ndarray,
+    manifest: dict,
+    ann_index: bytes | None = None,
+) -> bool:
+    """
+    Saves an embedding store (chunks metadata, vectors and manifest) locally and, if available, to S3.
+
+    Args:
+        file_name (str): The name of the store (the folder name).
+        chunks (pd.DataFrame): Text and metadata of each chunk, one row per vector.
+        vectors (np.ndarray): The unit-normalized embeddings, one row per chunk.
+        manifest (dict): Metadata of the store. It must contain 'model' and 'dimension'.
+        ann_index (bytes | None): Serialized approximate nearest-neighbour index, if any.
+
+    Returns:
+        bool: True if the store was saved successfully, False otherwise.
+
+    The files are always written to the local 'embeddings' directory inside DATA_PATH, which
+    also acts as the local copy of the S3 store, so that vectors can be memory-mapped. They are
+    written to a temporary folder first and then moved into place, manifest last: a store being
+    replaced is never truncated under the sessions that still memory-map its vectors.
+    """
+    store_dir = _local_store_dir(file_name)
+    staging_dir = None
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix=f".{file_name}.", dir=os.path.dirname(store_dir))
+
+        manifest = {
+            **manifest,
+            "format_version": STORE_FORMAT_VERSION,
+            "count": len(chunks),
+            "dtype": "float32",
+            "normalized": True,
+        }
+        chunks.reset_index(drop=True).to_parquet(
+            os.path.join(staging_dir, "chunks.parquet"), index=False
+        )
+        np.save(os.path.join(staging_dir, "vectors.npy"), np.asarray(vectors, dtype=np.float32))
+        if ann_index is not None:
+            with open(os.path.join(staging_dir, ANN_INDEX_FILE), "wb") as f:
+                f.write(ann_index)
+        with open(os.path.join(staging_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        # os.replace swaps the directory entries: open memory maps keep the previous files.
+        # The manifest goes last: a store without manifest is considered incomplete
+        for name in ("vectors.npy", "chunks.parquet"):
+            os.replace(os.path.join(staging_dir, name), os.path.join(store_dir, name))
+        ann_path = os.path.join(store_dir, ANN_INDEX_FILE)
+        if ann_index is not None:
+            os.replace(os.path.join(staging_dir, ANN_INDEX_FILE), ann_path)
+        elif os.path.exists(ann_path):
+            os.remove(ann_path)
+        os.replace(
+            os.path.join(staging_dir, "manifest.json"), os.path.join(store_dir, "manifest.json")
+        )
+        logger.info(f"Saved embedding store to local folder: {store_dir}")
+    except Exception as e:
+        logger.error(f"Error saving embedding store to local storage: {e}")
+        return False
+    finally:
+        if staging_dir is not None:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    if IS_AWS_AVAILABLE:
+        try:
+            s3_client = _s3_client()
+            for name in STORE_FILES + ((ANN_INDEX_FILE,) if ann_index is not None else ()):
+                s3_client.upload_file(
+                    os.path.join(store_dir, name),
+                    S3_BUCKET_NAME,
+                    f"{AWS_FOLDER}/{file_name}/{name}",
+                )
+        except Exception as e:
+            logger.error(e)
+            return False
+    return True
+
+
+def download_embeddings(file_name: str) -> tuple[pd.DataFrame, np.ndarray, dict] | None:
+    """
+    Loads an embedding store, memory-mapping its vectors.
+
+    Args:
+        file_name (str): The name of the store (the folder name).
+
+    Returns:
+        tuple[pd.DataFrame, np.ndarray, dict] | None: The chunks metadata, the read-only
+        memory-mapped vectors and the manifest, or None if the store is not found or invalid.
+
+    If the store is not available locally and AWS is configured, it is first downloaded from S3
+    into the local 'embeddings' directory.
+    """
+    store_dir = _local_store_dir(file_name)
+    manifest_path = os.path.join(store_dir, "manifest.json")
+
+    if not os.path.exists(manifest_path) and IS_AWS_AVAILABLE:
+        try:
+            os.makedirs(store_dir, exist_ok=True)
+            s3_client = _s3_client()
+            try:
+                s3_client.download_file(
+                    S3_BUCKET_NAME,
+                    f"{AWS_FOLDER}/{file_name}/{ANN_INDEX_FILE}",
+                    os.path.join(store_dir, ANN_INDEX_FILE),
+                )
+            except Exception:
+                # Stores using exact search have no ANN index
+                pass
+            # Manifest last, so that an interrupted download is not taken as a complete store
+            for name in reversed(STORE_FILES):
+                s3_client.download_file(
+                    S3_BUCKET_NAME,
+                    f"{AWS_FOLDER}/{file_name}/{name}",
+                    os.path.join(store_dir, name),
+                )
+        except Exception as e:
+            logger.error(e)
+            return None
+
+    if not os.path.exists(manifest_path):
+        logger.info(f"Embedding store not found: {store_dir}")
+        return None
+
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != STORE_FORMAT_VERSION:
+            logger.warning(f"Unsupported embedding store version in {store_dir}")
+            return None
+
+        chunks = pd.read_parquet(os.path.join(store_dir, "chunks.parquet"))
+        vectors = np.load(os.path.join(store_dir, "vectors.npy"), mmap_mode="r")
+        if len(chunks) != len(vectors) or len(chunks) != manifest["count"]:
+            logger.warning(f"Inconsistent embedding store in {store_dir}")
+            return None
+        logger.info(f"Loaded embedding store from local folder: {store_dir}")
+        return chunks, vectors, manifest
+    except Exception as e:
+        logger.error(f"Error loading embedding store from local storage: {e}")
+        return None
+
+
+def ann_index_path(file_name: str) -> str | None:
+    """
+    Returns the local path of the ANN index of a store previously loaded with download_embeddings.
+
+    Args:
+        file_name (str): The name of the store (the folder name).
+
+    Returns:
+        str | None: The path of the FAISS index file, or None if the store has no ANN index.
+    """
+    path = os.path.join(_local_store_dir(file_name), ANN_INDEX_FILE)
+    return path if os.path.exists(path) else None
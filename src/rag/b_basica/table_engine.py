@@ -0,0 +1,410 @@
+"""
+Structured query engine for tabular uploads (CSV/Excel), backed by an in-process SQLite database.
+
+Embedding every row of an inventory as a " | "-joined string is slow to ingest and answers exact
+lookups ("SFP modules available in Bogotá") poorly. Tables are instead loaded, batch by batch,
+into a SQLite file per document with typed columns:
+    - 'numeric':   INTEGER or REAL columns, used in aggregates (count, sum, average, min, max).
+    - 'category':  short text columns (sites, models, states...), indexed for filters. Their
+                   distinct values are kept, normalized, in a lookup table.
+    - 'free_text': long text columns (descriptions, comments), the only ones embedded.
+
+A question is answered by finding the category values it mentions (an indexed lookup of its
+n-grams), filtering on them and aggregating the numeric columns it names. Only questions that
+aggregate or name a column ("total de puertos", "modelo de los equipos Nokia") are answered by the
+table alone. A bare value filter ("la batería del router Nokia") may just mention a value in
+passing: its rows are added to the retrieved context instead. Questions that do not mention any
+value fall back to retrieval over the free-text embeddings.
+"""
+
+# Standard imports
+import os
+import sqlite3
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+# Third party imports
+import pyarrow as pa
+import pyarrow.compute as pc
+from loguru import logger
+
+# Internal imports
+from src.config.parameters import TABLE_FREE_TEXT_MIN_CHARS, TABLE_MAX_ROWS, TABULAR_BATCH_ROWS
+from src.config.settings import DATA_PATH
+from src.rag.b_basica.lexical_index import TOKEN_PATTERN, spanish_stopwords
+
+TABLES_PATH = os.path.join(DATA_PATH, "tables")
+TABLE_PAGE = 0  # Rows are presented as the paragraphs of a single page
+
+# Normalized question words asking to aggregate a numeric column (rows are always counted)
+AGGREGATE_WORDS = {
+    "SUM": frozenset({"total", "suma", "sumar"}),
+    "AVG": frozenset({"promedio", "media"}),
+    "MAX": frozenset({"maximo", "maxima", "mayor"}),
+    "MIN": frozenset({"minimo", "minima", "menor"}),
+}
+AGGREGATE_LABELS = {"SUM": "Suma", "AVG": "Promedio", "MAX": "Máximo", "MIN": "Mínimo"}
+MAX_NGRAM = 4  # Longest category value, in words, matched in a question
+INTEGER_PATTERN = r"^\s*[-+]?\d+\s*$"
+REAL_PATTERN = r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$"
+NUMERIC_MIN_RATIO = 0.95  # Share of numeric values from which a column is numeric
+
+
+def normalize_value(value) -> str:
+    """Lowercases a value, strips accents and punctuation ('Bogotá D.C.' -> 'bogota d.c')."""
+    text = unicodedata.normalize("NFKD", str(value).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(TOKEN_PATTERN.findall(text))
+
+
+def table_path(doc_key: str) -> str:
+    """Location of the SQLite database of a document."""
+    return os.path.join(TABLES_PATH, f"{doc_key}.sqlite")
+
+
+def _quote(name: str) -> str:
+    """Quotes a column name for SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _unique_names(names: list[str], reserved: Iterable[str] = ("__row",)) -> list[str]:
+    """
+    Renames duplicate column names the way pandas does ('a', 'a.1', 'a.2'...).
+
+    SQLite compares column names case-insensitively, so 'Modelo' and 'modelo' are duplicates too.
+    The reserved names (the row number column) are renamed as if already taken.
+    """
+    taken = {name.lower() for name in reserved}
+    unique = []
+    for name in names:
+        candidate, suffix = name, 0
+        while candidate.lower() in taken:
+            suffix += 1
+            candidate = f"{name}.{suffix}"
+        taken.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+
+def _infer_column(values: pa.Array) -> tuple[str, str]:
+    """Infers the SQLite type and role of a text column from a sample of its values."""
+    non_empty = pc.filter(values, pc.and_(pc.is_valid(values), pc.not_equal(values, "")))
+    if len(non_empty) == 0:
+        return "TEXT", "category"
+    # A few placeholders such as 'N/A' do not make a numeric column textual
+    for sql_type, pattern in (("INTEGER", INTEGER_PATTERN), ("REAL", REAL_PATTERN)):
+        matches = pc.sum(pc.match_substring_regex(non_empty, pattern)).as_py() or 0
+        if matches >= NUMERIC_MIN_RATIO * len(non_empty):
+            return sql_type, "numeric"
+    mean_length = pc.mean(pc.utf8_length(non_empty)).as_py()
+    return "TEXT", "free_text" if mean_length >= TABLE_FREE_TEXT_MIN_CHARS else "category"
+
+
+@dataclass
+class TableAnswer:
+    """Result of a structured query over a table."""
+
+    filters: list[str]
+    columns: list[str]
+    rows: list[tuple]
+    total: int
+    aggregates: dict[str, float] = field(default_factory=dict)
+    projected: list[str] = field(default_factory=list)
+
+    @property
+    def is_structured(self) -> bool:
+        """Whether the question asks for an aggregate or a column, not only mentions a value."""
+        return bool(self.aggregates or self.projected)
+
+
+class TableEngine:
+    """
+    SQLite database holding one table upload, with its column types and category values.
+
+    Attributes:
+        columns (dict[str, str]): Role of every column ('numeric', 'category' or 'free_text').
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens an existing table database (see `ingest` to create one).
+
+        Args:
+            path (str): Location of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self.columns = dict(self._conn.execute("SELECT name, role FROM columns ORDER BY position"))
+
+    @classmethod
+    def open(cls, path: str) -> "TableEngine | None":
+        """Opens the table database at `path`, or returns None if it was never completed."""
+        return cls(path) if os.path.exists(path) else None
+
+    @classmethod
+    def ingest(cls, path: str, batches: Iterable[pa.Table]) -> "TableEngine":
+        """
+        Loads a table, batch by batch, into a new SQLite database.
+
+        Column types are inferred on the first batch. Later values that do not fit are stored as
+        text (SQLite column affinity), so a stray 'N/A' does not stop the ingestion.
+
+        Args:
+            path (str): Location of the SQLite database file.
+            batches (Iterable[pa.Table]): The rows, every column as text (see tabular_extraction).
+
+        Returns:
+            TableEngine: The engine over the loaded table.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Built under a temporary name: an interrupted ingestion is never opened as complete
+        partial_path = f"{path}.partial"
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        conn = sqlite3.connect(partial_path)
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+
+        columns, n_rows = {}, 0
+        # The row number is the paragraph number of the row's chunk in the vector index
+        conn.execute("CREATE TABLE data (__row INTEGER PRIMARY KEY)")
+        for batch in batches:
+            if not columns:
+                # Duplicate headers, accepted by the readers, would make the columns ambiguous
+                names = _unique_names(batch.column_names)
+                if names != batch.column_names:
+                    logger.warning(f"Renamed table columns {batch.column_names} to {names}")
+                for name, values in zip(names, batch.columns):
+                    columns[name] = _infer_column(values.combine_chunks())
+                definitions = ", ".join(
+                    f"{_quote(name)} {sql_type}" for name, (sql_type, _) in columns.items()
+                )
+                conn.execute("DROP TABLE data")
+                conn.execute(f"CREATE TABLE data (__row INTEGER PRIMARY KEY, {definitions})")
+                placeholders = ", ".join("?" * (len(columns) + 1))
+                insert = f"INSERT INTO data VALUES ({placeholders})"  # nosec B608
+
+            # Empty cells become NULL; SQLite converts numeric text to the declared column type
+            cells = [
+                pc.if_else(pc.equal(values, ""), None, values).to_pylist()
+                for values in batch.columns
+            ]
+            conn.executemany(insert, zip(range(n_rows, n_rows + batch.num_rows), *cells))
+            n_rows += batch.num_rows
+
+        conn.execute(
+            "CREATE TABLE columns (position INTEGER, name TEXT, sql_type TEXT, role TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO columns VALUES (?, ?, ?, ?)",
+            [
+                (i, name, sql_type, role)
+                for i, (name, (sql_type, role)) in enumerate(columns.items())
+            ],
+        )
+        conn.execute("CREATE TABLE category_values (name TEXT, norm TEXT, value TEXT)")
+        conn.create_function("normalize_value", 1, normalize_value, deterministic=True)
+        for position, (name, (_, role)) in enumerate(columns.items()):
+            if role != "category":
+                continue
+            column = _quote(name)
+            conn.execute(f"CREATE INDEX idx_col_{position} ON data ({column})")
+            conn.execute(
+                f"INSERT INTO category_values SELECT ?, normalize_value({column}), {column} "
+                f"FROM data WHERE {column} IS NOT NULL GROUP BY {column}",  # nosec B608
+                (name,),
+            )
+        conn.execute("CREATE INDEX idx_norm ON category_values (norm)")
+        conn.commit()
+        conn.close()
+        os.replace(partial_path, path)
+
+        logger.info(f"Loaded {n_rows} rows and {len(columns)} columns into {path}")
+        return cls(path)
+
+    @property
+    def row_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+
+    @property
+    def free_text_columns(self) -> list[str]:
+        return [name for name, role in self.columns.items() if role == "free_text"]
+
+    def free_text_segments(
+        self, batch_rows: int = TABULAR_BATCH_ROWS
+    ) -> Iterator[tuple[int, dict[int, str]]]:
+        """
+        Streams the free-text columns of the rows that have any, to be embedded.
+
+        Args:
+            batch_rows (int): Number of rows per segment.
+
+        Yields:
+            tuple[int, dict[int, str]]: TABLE_PAGE and the free text of each row, by row number.
+        """
+        names = self.free_text_columns
+        if not names:
+            return
+        text = " || ' | ' || ".join(f"COALESCE({_quote(name)}, '')" for name in names)
+        non_empty = " OR ".join(f"{_quote(name)} IS NOT NULL" for name in names)
+        # A connection of its own, so that queries can run while the rows are being embedded
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(
+                f"SELECT __row, {text} FROM data WHERE {non_empty} ORDER BY __row"  # nosec B608
+            )
+            while rows := cursor.fetchmany(batch_rows):
+                yield TABLE_PAGE, dict(rows)
+        finally:
+            conn.close()
+
+    def rows(self, row_numbers: list[int]) -> dict[int, str]:
+        """Returns rows, serialized with ' | ' like the other chunks, by row number."""
+        if not row_numbers:
+            return {}
+        placeholders = ", ".join("?" * len(row_numbers))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT * FROM data WHERE __row IN ({placeholders})",  # nosec B608
+                list(row_numbers),
+            )
+            result = cursor.fetchall()
+        return {
+            row[0]: " | ".join("" if value is None else str(value) for value in row[1:])
+            for row in result
+        }
+
+    def _match_values(self, words: list[str]) -> list[tuple[str, list[tuple[str, str]]]]:
+        """
+        Finds the category values mentioned in a question, longest first and without overlaps.
+
+        Returns:
+            list: One (matched text, [(column, value), ...]) pair per mentioned value.
+        """
+        spans = {}
+        for size in range(MAX_NGRAM, 0, -1):
+            for start in range(len(words) - size + 1):
+                spans.setdefault(" ".join(words[start : start + size]), (start, start + size))
+        stop_words = spanish_stopwords()
+        candidates = [ngram for ngram in spans if ngram not in stop_words and len(ngram) > 1]
+        if not candidates:
+            return []
+
+        found = {}
+        with self._lock:
+            # Query in chunks to stay below SQLite's bound-parameter limit
+            for start in range(0, len(candidates), 500):
+                chunk = candidates[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT norm, name, value FROM category_values "  # nosec B608
+                    f"WHERE norm IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for norm, name, value in rows:
+                    found.setdefault(norm, []).append((name, value))
+
+        matches, used = [], set()
+        for norm in sorted(
+            found, key=lambda ngram: spans[ngram][1] - spans[ngram][0], reverse=True
+        ):
+            positions = set(range(*spans[norm]))
+            if positions & used:
+                continue
+            used |= positions
+            matches.append((norm, found[norm]))
+        return matches
+
+    def _named_columns(self, word_set: set[str]) -> list[str]:
+        """Returns the columns whose name is mentioned in a question, in table order."""
+        stop_words = spanish_stopwords()
+        named = []
+        for name in self.columns:
+            # Names such as '2023' or '%' normalize to no words, and would match every question
+            name_words = set(normalize_value(name).split()) - stop_words
+            if name_words and name_words <= word_set:
+                named.append(name)
+        return named
+
+    def query(self, question: str) -> TableAnswer | None:
+        """
+        Answers a question with a filter (and aggregate) query over the table.
+
+        Args:
+            question (str): The user's question.
+
+        Returns:
+            TableAnswer | None: The answer, or None when the question mentions neither a value nor
+            an aggregated numeric column of the table (it then needs semantic retrieval). Only
+            answers that are `is_structured` answer the question alone.
+        """
+        words = normalize_value(question).split()
+        matches = self._match_values(words)
+
+        word_set = set(words)
+        named = self._named_columns(word_set)
+        aggregates = [
+            (function, name)
+            for function, triggers in AGGREGATE_WORDS.items()
+            if word_set & triggers
+            for name in named
+            if self.columns[name] == "numeric"
+        ]
+        # Counting the whole table is only done when a numeric column is also named: "cuántos"
+        # alone is more likely a question about another document
+        if not matches and not aggregates:
+            return None
+        # Columns asked for, other than those filtered on or aggregated
+        filtered = {name for _, pairs in matches for name, _ in pairs}
+        aggregated = {name for _, name in aggregates}
+        projected = [name for name in named if name not in filtered | aggregated]
+
+        # Values of the same column are alternatives; a text found in several columns matches any
+        conditions, params, filters = [], [], []
+        by_column = {}
+        for norm, pairs in matches:
+            if len({name for name, _ in pairs}) == 1:
+                by_column.setdefault(pairs[0][0], []).extend(value for _, value in pairs)
+            else:
+                conditions.append(
+                    "(" + " OR ".join(f"{_quote(name)} = ?" for name, _ in pairs) + ")"
+                )
+                params.extend(value for _, value in pairs)
+                filters.append(" o ".join(f"{name} = {value}" for name, value in pairs))
+        for name, values in by_column.items():
+            conditions.insert(0, f"{_quote(name)} IN ({', '.join('?' * len(values))})")
+            params[:0] = values
+            filters.insert(0, f"{name} = {' o '.join(values)}")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # Values left as text in numeric columns (e.g. 'N/A') are ignored by the aggregates
+        selected = ["COUNT(*)"] + [
+            f"{function}(CASE WHEN typeof({_quote(name)}) IN ('integer', 'real') "
+            f"THEN {_quote(name)} END)"
+            for function, name in aggregates
+        ]
+        with self._lock:
+            totals = self._conn.execute(
+                f"SELECT {', '.join(selected)} FROM data {where}", params  # nosec B608
+            ).fetchone()
+            cursor = self._conn.execute(
+                f"SELECT * FROM data {where} ORDER BY __row LIMIT ?",  # nosec B608
+                [*params, TABLE_MAX_ROWS],
+            )
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+
+        return TableAnswer(
+            filters=filters,
+            columns=columns[1:],
+            rows=[row[1:] for row in rows],
+            total=totals[0],
+            aggregates={
+                f"{AGGREGATE_LABELS[function]} de {name}": value
+                for (function, name), value in zip(aggregates, totals[1:])
+            },
+            projected=projected,
+        )
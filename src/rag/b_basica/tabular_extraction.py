@@ -0,0 +1,158 @@
+"""
+Streaming extraction of CSV and Excel uploads for the RAG chatbot.
+
+Inventory exports can reach hundreds of thousands of rows, so tables are never loaded whole:
+CSV files are read in blocks with pyarrow's streaming reader and Excel workbooks with openpyxl in
+read-only mode. Each batch of TABULAR_BATCH_ROWS rows is serialized to " | "-joined strings with
+Arrow compute kernels and yielded as a (page, rows) segment, so the caller can embed it before the
+next batch is read.
+"""
+
+# Standard imports
+from typing import Iterator
+
+# Third party imports
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+
+# Internal imports
+from src.config.parameters import TABULAR_BATCH_ROWS
+
+# Tables are presented as a single page whose paragraphs are the rows
+TABLE_PAGE = 0
+
+
+def serialize_rows(batch: pa.RecordBatch | pa.Table) -> list[str]:
+    """
+    Joins the cells of every row with " | ", column by column (no Python loop over rows).
+
+    Args:
+        batch (pa.RecordBatch | pa.Table): The rows; columns of any type.
+
+    Returns:
+        list[str]: One string per row. Empty cells become empty strings.
+    """
+    columns = [pc.fill_null(pc.cast(column, pa.string()), "") for column in batch.columns]
+    if not columns:
+        return [""] * batch.num_rows
+    return pc.binary_join_element_wise(*columns, " | ").to_pylist()
+
+
+def iter_csv_batches(file, batch_rows: int = TABULAR_BATCH_ROWS) -> Iterator[pa.Table]:
+    """
+    Reads a CSV file in batches of rows, every column as text.
+
+    Args:
+        file: Binary file-like object positioned at the start of the CSV.
+        batch_rows (int): Number of rows per batch.
+
+    Yields:
+        pa.Table: The next batch of rows.
+    """
+    # Read the header first, so that every column is parsed as text: types inferred on the first
+    # block could reject a later one (e.g. "N/A" in a numeric column)
+    start = file.tell()
+    column_names = csv.open_csv(file).schema.names
+    file.seek(start)
+    reader = csv.open_csv(
+        file,
+        convert_options=csv.ConvertOptions(
+            column_types={name: pa.string() for name in column_names}
+        ),
+    )
+
+    pending, pending_rows = [], 0
+    for record_batch in reader:
+        pending.append(record_batch)
+        pending_rows += record_batch.num_rows
+        while pending_rows >= batch_rows:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, batch_rows)
+            pending = table.slice(batch_rows).to_batches()
+            pending_rows -= batch_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
+
+
+def iter_excel_batches(file, batch_rows: int = TABULAR_BATCH_ROWS) -> Iterator[pa.Table]:
+    """
+    Reads the first sheet of an Excel workbook in batches of rows.
+
+    Args:
+        file: Binary file-like object of the workbook.
+        batch_rows (int): Number of rows per batch.
+
+    Yields:
+        pa.Table: The next batch of rows, with the header row as column names.
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        names = [str(name) if name is not None else f"column_{i}" for i, name in enumerate(header)]
+
+        def to_table(batch: list[tuple]) -> pa.Table:
+            # Read-only sheets can return short rows; cells are kept as text, like in CSV files
+            cells = [
+                [str(row[i]) if i < len(row) and row[i] is not None else None for row in batch]
+                for i in range(len(names))
+            ]
+            return pa.table([pa.array(column, pa.string()) for column in cells], names=names)
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_rows:
+                yield to_table(batch)
+                batch = []
+        if batch:
+            yield to_table(batch)
+    finally:
+        workbook.close()
+
+
+def iter_table_batches(
+    file, file_name: str, batch_rows: int = TABULAR_BATCH_ROWS
+) -> Iterator[pa.Table]:
+    """
+    Streams a CSV or Excel upload in batches of rows, every column as text.
+
+    Args:
+        file: Binary file-like object of the upload.
+        file_name (str): Name of the upload, used to pick the reader.
+        batch_rows (int): Number of rows per batch.
+
+    Yields:
+        pa.Table: The next batch of rows.
+    """
+    name = file_name.lower()
+    if name.endswith(".csv"):
+        yield from iter_csv_batches(file, batch_rows)
+    elif name.endswith(".xlsx"):
+        yield from iter_excel_batches(file, batch_rows)
+    else:
+        # Legacy .xls workbooks are not supported by openpyxl: read them whole with pandas
+        yield pa.Table.from_pandas(pd.read_excel(file, dtype=str), preserve_index=False)
+
+
+def iter_table_segments(
+    file, file_name: str, batch_rows: int = TABULAR_BATCH_ROWS
+) -> Iterator[tuple[int, list[str]]]:
+    """
+    Streams a CSV or Excel upload as (page, serialized rows) segments.
+
+    Args:
+        file: Binary file-like object of the upload.
+        file_name (str): Name of the upload, used to pick the reader.
+        batch_rows (int): Number of rows per segment.
+
+    Yields:
+        tuple[int, list[str]]: TABLE_PAGE and the next batch of serialized rows.
+    """
+    for batch in iter_table_batches(file, file_name, batch_rows):
+        yield TABLE_PAGE, serialize_rows(batch)
@@ -6,126 +6,105 @@ This module provides utility functions for PDF context extraction, text processi
 """
 
 # Standard imports
-import base64
 import hashlib
-import re
-import tempfile
-from io import BytesIO
-from typing import Union
+import json
+import os
+from typing import Callable, Iterator, Union
 
 # Third party imports
-import fitz
-import pandas as pd
+from loguru import logger
 
 # Internal imports
-from src.config.parameters import MAX_PAGES
-from src.rag.b_basica.storage import download_file, upload_file
-
-
-# Nueva función para detectar tipo de archivo
-def extract_context(uploaded_file, max_pages: int = MAX_PAGES) -> dict:
-    """Extiende soporte para PDF, Excel, y CSV."""
-    if uploaded_file.name.lower().endswith(".pdf"):
-        return extract_pdf_context(uploaded_file, max_pages)
-    elif uploaded_file.name.lower().endswith((".xlsx", ".xls", ".csv")):
-        return extract_excel_context(uploaded_file)
+from src.config.parameters import EMBEDDINGS_DIMENSION, MAX_PAGES, MAX_UPLOAD_BYTES
+from src.config.settings import OPENAI_EMBEDDINGS_MODEL
+from src.rag.b_basica.ann_index import build_index, load_index
+from src.rag.b_basica.document_aliases import get_document_aliases
+from src.rag.b_basica.index_cache import LoadedDocument, get_index_cache
+from src.rag.b_basica.nlp_proc import build_vector_index
+from src.rag.b_basica.pdf_extraction import extract_text_from_pdf_fitz
+from src.rag.b_basica.question_cache import get_question_cache
+from src.rag.b_basica.storage import ann_index_path, download_embeddings, upload_embeddings
+from src.rag.b_basica.table_engine import TableEngine, table_path
+from src.rag.b_basica.tabular_extraction import iter_table_batches, iter_table_segments
+from src.rag.b_basica.vector_index import VectorIndex
+
+# Version of the chunking, part of the document keys: bump it when chunking changes
+# (2: tables only embed their free-text columns)
+CHUNKING_VERSION = 2
+
+# Shares of the ingestion progress given to extraction (PDF pages, table rows) and to building and
+# storing the index; the rest goes to the embeddings, which take most of the time
+EXTRACTION_PROGRESS_SHARE = 0.3
+INDEXING_PROGRESS_SHARE = 0.05
+
+
+def source_type(file_name: str) -> str:
+    """Returns the source type of an upload ('PDF', 'Excel' or 'CSV') from its file name."""
+    name = file_name.lower()
+    if name.endswith(".pdf"):
+        return "PDF"
+    elif name.endswith((".xlsx", ".xls")):
+        return "Excel"
+    elif name.endswith(".csv"):
+        return "CSV"
     else:
         raise ValueError("Formato no soportado. Use PDF, Excel, o CSV.")
 
 
-def extract_pdf_context(uploaded_file, max_pages: int) -> dict:
+# Nueva función para detectar tipo de archivo
+def extract_context(
+    uploaded_file, max_pages: int | None = MAX_PAGES
+) -> dict | Iterator[tuple[int, list[str]]]:
     """
-    Extracts text content from an uploaded PDF file, up to a maximum number of pages.
-
-    Args:
-        uploaded_file: The file-like object representing the uploaded PDF.
-        max_pages (int): The maximum number of pages to extract from the PDF.
+    Extiende soporte para PDF, Excel, y CSV.
 
-    Returns:
-        dict: A dictionary mapping page numbers to lists of paragraphs extracted from each page.
+    PDFs are returned as a {page: [paragraphs]} dict. Tables are streamed as (page, rows)
+    segments, to be embedded batch by batch (see nlp_proc.build_vector_index).
     """
-    # Read the uploaded file into a BytesIO buffer
-    file_buffer = BytesIO(uploaded_file.read())
-    # Reset buffer pointer to the beginning
-    file_buffer.seek(0)
-    # Encode the file buffer to base64 (for compatibility)
-    encoded_pdf = base64.b64encode(file_buffer.read()).decode("utf-8")
-    # Decode the base64 PDF file back to binary
-    pdf_binary_file = base64.b64decode(encoded_pdf)
-    pdf_file = BytesIO(pdf_binary_file)
-    if pdf_file is not None:
-        # Save the uploaded file to a temporary file for processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(pdf_file.read())
-            temp_file_path = temp_file.name
-
-    # Extract text from the temporary PDF file
-    final_text = extract_text_from_pdf_fitz(temp_file_path, max_pages)
-
-    return final_text
-
-
-def extract_excel_context(uploaded_file) -> dict:
-    """Procesa Excel/CSV a un formato similar al PDF."""
-    try:
-        if uploaded_file.name.lower().endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
-
-        # Convertir DataFrame a formato {página: [párrafos]}
-        full_text = {0: []}
-        for _, row in df.iterrows():
-            # Combina todas las columnas en un solo texto
-            row_text = " | ".join([str(val) for val in row.values])
-            full_text[0].append(row_text)
-        return full_text
-    except Exception as e:
-        raise ValueError(f"Error al procesar Excel/CSV: {str(e)}")
+    if source_type(uploaded_file.name) == "PDF":
+        return extract_pdf_context(uploaded_file, max_pages)
+    return extract_excel_context(uploaded_file)
 
 
-def identify_paragraphs(text: str) -> list:
+def extract_pdf_context(
+    uploaded_file, max_pages: int | None, progress: Callable[[int, int], None] | None = None
+) -> dict:
     """
-    Splits a string into paragraphs based on the occurrence of at least two newline (\n) characters,
-    possibly separated by spaces.
+    Extracts text content from an uploaded PDF file, within an optional page budget.
+
+    The PDF is opened straight from the uploaded bytes: no copy is made and nothing is written to
+    disk.
 
     Args:
-        text (str): The input text to split into paragraphs.
+        uploaded_file: The file-like object representing the uploaded PDF.
+        max_pages (int | None): Page budget, or None to extract every page of the PDF.
+        progress (Callable[[int, int], None] | None): Called with the pages extracted so far and
+            the pages to extract.
 
     Returns:
-        list: A list of paragraphs (strings) with newlines replaced by spaces and stripped of whitespace.
-    """
-    # Split the text based on the pattern of two or more newlines (with optional spaces)
-    parts = re.split(r"(\n\s*\n)+", text)
-    # Filter out any empty strings or strings that only contain whitespace
-    parts = [part.replace("\n", " ").strip() for part in parts if part.strip()]
-    return parts
-
-
-def extract_text_from_pdf_fitz(pdf_file: str, max_nb_pages: int = 5) -> dict:
+        dict: A dictionary mapping page numbers to lists of paragraphs extracted from each page.
     """
-    Extracts text from a PDF file using PyMuPDF (fitz), up to a specified number of pages.
+    # In-memory uploads (Streamlit's UploadedFile is a BytesIO) expose their buffer without a copy
+    if hasattr(uploaded_file, "getbuffer"):
+        pdf_buffer = uploaded_file.getbuffer()
+    else:
+        pdf_buffer = memoryview(uploaded_file.read(MAX_UPLOAD_BYTES + 1))
 
-    Args:
-        pdf_file (str): Path to the PDF file.
-        max_nb_pages (int): Maximum number of pages to extract.
+    # Released on exit, so the upload buffer can be resized or freed again
+    with pdf_buffer:
+        if pdf_buffer.nbytes > MAX_UPLOAD_BYTES:
+            raise ValueError(
+                f"El PDF supera el tamaño máximo de {MAX_UPLOAD_BYTES / 1024**2:.0f} MB."
+            )
+        return extract_text_from_pdf_fitz(pdf_buffer, max_pages, progress=progress)
 
-    Returns:
-        dict: A dictionary mapping page numbers to lists of paragraphs.
-    """
-    # Open the PDF document
-    doc = fitz.open(pdf_file)
-    # Get an iterator for the specified range of pages
-    pages = doc.pages(0, max_nb_pages)
-    full_text = {}
-    for pn, page in enumerate(pages):
-        # Extract text from each page
-        page_text = page.get_text()
-        if page_text:
-            # Split the page text into paragraphs
-            full_text[pn] = identify_paragraphs(page_text)
 
-    return full_text
+def extract_excel_context(uploaded_file) -> Iterator[tuple[int, list[str]]]:
+    """Procesa Excel/CSV por lotes de filas, a un formato similar al PDF."""
+    try:
+        yield from iter_table_segments(uploaded_file, uploaded_file.name)
+    except Exception as e:
+        raise ValueError(f"Error al procesar Excel/CSV: {str(e)}")
 
 
 def hash_string(string_to_hash: str, algorithm: str = "sha256") -> str:
@@ -156,36 +135,208 @@ def hash_string(string_to_hash: str, algorithm: str = "sha256") -> str:
     return hash_obj.hexdigest()
 
 
-def store_dataframe(filename: str, df: pd.DataFrame) -> bool:
+def file_sha256(uploaded_file) -> str:
+    """
+    Computes the sha256 of a file-like object by streaming its content, without parsing it.
+
+    Args:
+        uploaded_file: The binary file-like object (e.g. Streamlit's UploadedFile).
+
+    Returns:
+        str: The hexadecimal digest. The file position is left unchanged.
+    """
+    position = uploaded_file.tell()
+    uploaded_file.seek(0)
+    # Reads in fixed-size blocks, or straight from the buffer of in-memory files
+    digest = hashlib.file_digest(uploaded_file, "sha256").hexdigest()
+    uploaded_file.seek(position)
+    return digest
+
+
+def document_key(uploaded_file, max_pages: int | None = MAX_PAGES) -> str:
     """
-    Stores a pandas DataFrame using a hashed filename (for privacy/uniqueness).
+    Computes the storage key of a document from its content and the processing parameters.
+
+    The same file under another name maps to the same key, while two different files sharing a
+    name never collide. Changing the embedding model, dimension or chunking gives a new key.
 
     Args:
-        filename (str): The original filename to hash.
-        df (pd.DataFrame): The DataFrame to store.
+        uploaded_file: The binary file-like object of the document.
+        max_pages (int | None): Page budget used to extract the document.
+
+    Returns:
+        str: The sha256 hexadecimal key.
+    """
+    params = {
+        "sha256": file_sha256(uploaded_file),
+        "model": OPENAI_EMBEDDINGS_MODEL,
+        "dimension": EMBEDDINGS_DIMENSION,
+        "chunking": CHUNKING_VERSION,
+        "max_pages": max_pages,
+    }
+    return hash_string(json.dumps(params, sort_keys=True), "sha256")
+
+
+def store_index(doc_key: str, index: VectorIndex, file_name: str) -> bool:
+    """
+    Stores a document's vector index under its content key and records its file name.
+
+    Args:
+        doc_key (str): Key of the document, from `document_key`.
+        index (VectorIndex): The index to store.
+        file_name (str): Name of the uploaded file, recorded as an alias of the key.
 
     Returns:
         bool: True if the storage was successful, False otherwise.
     """
-    # Hash the filename for storage
-    filename_hashed = hash_string(filename, "md5")
-    # Upload the DataFrame using the hashed filename
-    is_ok = upload_file(filename_hashed, df)
+    manifest = {
+        "model": OPENAI_EMBEDDINGS_MODEL,
+        "dimension": index.dimension,
+        "chunking": CHUNKING_VERSION,
+        "file_name": file_name,
+        "index_mode": index.mode,
+        "index_params": index.params,
+    }
+    # Upload the chunks, vectors, ANN index and manifest under the document key
+    is_ok = upload_embeddings(
+        doc_key, index.chunks, index.matrix, manifest, ann_index=index.serialize()
+    )
+    if is_ok:
+        get_document_aliases().add(file_name, doc_key)
     return is_ok
 
 
-def retrieve_dataframe(filename: str) -> pd.DataFrame:
+def retrieve_index(doc_key: str, file_name: str | None = None) -> VectorIndex | None:
     """
-    Retrieves a pandas DataFrame using a hashed filename.
+    Retrieves a document's vector index from its content key.
 
     Args:
-        filename (str): The original filename to hash.
+        doc_key (str): Key of the document, from `document_key`.
+        file_name (str | None): Name of the uploaded file, recorded as an alias when found.
 
     Returns:
-        pd.DataFrame: The loaded DataFrame, or an empty DataFrame if not found.
+        VectorIndex | None: The index in the mode chosen at ingestion, with memory-mapped vectors,
+        or None if not found or if it was computed with a different embedding model.
     """
-    # Hash the filename for retrieval
-    filename_hashed = hash_string(filename, "md5")
-    # Download the DataFrame using the hashed filename
-    db = download_file(filename_hashed)
-    return db
+    store = download_embeddings(doc_key)
+    if store is None:
+        return None
+
+    chunks, vectors, manifest = store
+    if manifest.get("model") != OPENAI_EMBEDDINGS_MODEL:
+        logger.warning(
+            f"Stored embeddings of {file_name or doc_key} use model {manifest.get('model')}, "
+            f"expected {OPENAI_EMBEDDINGS_MODEL}; they will be recomputed."
+        )
+        return None
+    if file_name is not None:
+        get_document_aliases().add(file_name, doc_key)
+    # Stored vectors are already unit-normalized, so the memory map is used as is
+    return load_index(chunks, vectors, manifest, ann_index_path(doc_key))
+
+
+def _file_size(uploaded_file) -> int:
+    """Returns the size in bytes of a file-like object, leaving its position unchanged."""
+    position = uploaded_file.tell()
+    size = uploaded_file.seek(0, os.SEEK_END)
+    uploaded_file.seek(position)
+    return size
+
+
+def ingest_document(
+    uploaded_file,
+    max_pages: int | None = MAX_PAGES,
+    progress: Callable[[float, str], None] | None = None,
+) -> tuple[str, LoadedDocument]:
+    """
+    Loads an uploaded document, reusing its stored index and table when already processed.
+
+    Documents already loaded by any session are taken from the process-wide index cache. PDFs are
+    split into paragraphs and embedded. Tables are loaded into their query engine and
+    only their free-text columns are embedded.
+
+    Args:
+        uploaded_file: The uploaded PDF, Excel or CSV file.
+        max_pages (int | None): Page budget of PDFs, or None to extract every page.
+        progress (Callable[[float, str], None] | None): Called with the completed fraction of the
+            ingestion and a message for the user, as pages, table rows and embedding batches are
+            done.
+
+    Returns:
+        tuple: The document key and its loaded indexes, shared with the other sessions.
+    """
+
+    def report(fraction: float, message: str) -> None:
+        if progress is not None:
+            progress(min(fraction, 1.0), message)
+
+    file_name = uploaded_file.name
+    source = source_type(file_name)
+    # Keyed by content: renamed files are reused, homonyms do not collide
+    doc_key = document_key(uploaded_file, max_pages)
+
+    cache = get_index_cache()
+    document = cache.get(doc_key)
+    if document is not None:
+        get_document_aliases().add(file_name, doc_key)
+        report(1.0, "Documento procesado")
+        return doc_key, document
+
+    table = None
+    if source != "PDF":
+        table = TableEngine.open(table_path(doc_key))
+        if table is None:
+            size = _file_size(uploaded_file) or 1
+
+            def reported_batches():
+                rows = 0
+                for batch in iter_table_batches(uploaded_file, file_name):
+                    yield batch
+                    rows += batch.num_rows
+                    # The readers consume the file as they go: its position tells the progress
+                    report(
+                        EXTRACTION_PROGRESS_SHARE * uploaded_file.tell() / size,
+                        f"Cargando tabla ({rows} filas)",
+                    )
+
+            try:
+                table = TableEngine.ingest(table_path(doc_key), reported_batches())
+            except Exception as e:
+                raise ValueError(f"Error al procesar Excel/CSV: {str(e)}")
+
+    index = retrieve_index(doc_key, file_name)
+    if index is None:
+        if table is not None:
+            segments = table.free_text_segments()
+            # Upper bound: rows without free text are not embedded
+            total = table.row_count
+        else:
+            segments = extract_pdf_context(
+                uploaded_file,
+                max_pages,
+                progress=lambda done, pages: report(
+                    EXTRACTION_PROGRESS_SHARE * done / pages,
+                    f"Extrayendo páginas ({done}/{pages})",
+                ),
+            )
+            total = sum(len(paragraphs) for paragraphs in segments.values())
+        report(EXTRACTION_PROGRESS_SHARE, "Generando embeddings")
+
+        def embedded(done: int) -> None:
+            share = 1.0 - EXTRACTION_PROGRESS_SHARE - INDEXING_PROGRESS_SHARE
+            report(
+                EXTRACTION_PROGRESS_SHARE + share * done / max(total, 1),
+                f"Generando embeddings ({done}/{total} fragmentos)",
+            )
+
+        vector_index = build_vector_index(segments, source=source, progress=embedded)
+        report(1.0 - INDEXING_PROGRESS_SHARE, "Guardando índice")
+        # The index is built once per document and reused for every question
+        index = build_index(vector_index)
+        store_index(doc_key, index, file_name)
+        # Answers given over a previous index of the document are not reused
+        get_question_cache().invalidate(doc_key)
+    # Builds the BM25 index once per process, for every session querying the document
+    document = cache.put(doc_key, index, table=table)
+    report(1.0, "Documento procesado")
+    return doc_key, document
@@ -0,0 +1,124 @@
+"""
+In-memory vector index for the RAG chatbot.
+
+The index keeps the paragraph metadata (page, paragraph, text, source) in a DataFrame and the
+embeddings in a contiguous float32 matrix whose rows are normalized to unit length once, at
+ingestion. Scoring a question is then a single matrix-vector product (cosine similarity) and the
+top results are selected with `argpartition`, without sorting or mutating the stored corpus.
+"""
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scales every row of a matrix to unit L2 norm. Rows with zero norm are left as zeros.
+
+    Args:
+        matrix (np.ndarray): A 2D array of embeddings.
+
+    Returns:
+        np.ndarray: A contiguous float32 array with normalized rows.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a document's paragraph embeddings.
+
+    Attributes:
+        chunks (pd.DataFrame): Paragraph metadata, one row per matrix row.
+        matrix (np.ndarray): Float32 matrix of unit-normalized embeddings (n_chunks x dimension).
+        mode (str): Search mode of the index ('exact' here, see ann_index for approximate modes).
+    """
+
+    mode = "exact"
+
+    def __init__(self, chunks: pd.DataFrame, matrix: np.ndarray, normalized: bool = False) -> None:
+        """
+        Args:
+            chunks (pd.DataFrame): Paragraph metadata, without the embeddings column.
+            matrix (np.ndarray): The embeddings, one row per chunk.
+            normalized (bool): Whether the rows of `matrix` already have unit norm.
+        """
+        if len(chunks) != len(matrix):
+            raise ValueError(
+                f"Chunks ({len(chunks)}) and embeddings ({len(matrix)}) sizes do not match."
+            )
+        self.chunks = chunks.reset_index(drop=True)
+        self.matrix = (
+            np.ascontiguousarray(matrix, dtype=np.float32)
+            if normalized
+            else normalize_rows(matrix)
+        )
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "VectorIndex":
+        """
+        Builds an index from the DataFrame returned by `compute_embeddings`.
+
+        Args:
+            df (pd.DataFrame): DataFrame with an 'embeddings' column and paragraph metadata.
+
+        Returns:
+            VectorIndex: The index. The input DataFrame is not modified.
+        """
+        chunks = df.drop(columns=["embeddings", "similarities"], errors="ignore")
+        if df.empty:
+            return cls(chunks, np.zeros((0, 0), dtype=np.float32), normalized=True)
+        # Stored embeddings are nested as [[...]], so reshape to one row per chunk
+        matrix = np.asarray(df["embeddings"].tolist(), dtype=np.float32).reshape(len(df), -1)
+        return cls(chunks, matrix)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def dimension(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index: vectors and chunk metadata."""
+        return int(self.matrix.nbytes + self.chunks.memory_usage(deep=True).sum())
+
+    @property
+    def params(self) -> dict:
+        """Search parameters of the index, recorded in the store manifest."""
+        return {}
+
+    def serialize(self) -> bytes | None:
+        """Returns the index structure to persist next to the vectors (none for exact search)."""
+        return None
+
+    def search(self, query_embedding: list | np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k chunks most similar to a query embedding.
+
+        Args:
+            query_embedding (list | np.ndarray): The query embedding.
+            k (int): Number of results to return.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Row positions in `chunks` and their cosine
+            similarities, sorted by decreasing similarity.
+        """
+        if len(self) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
@@ -0,0 +1,11 @@
+"""
+Test settings: placeholder OpenAI configuration, so modules creating the shared clients at import
+time can be loaded. No test reaches the API.
+"""
+
+# Standard imports
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_COMPLETIONS_MODEL", "test-completions")
+os.environ.setdefault("OPENAI_EMBEDDINGS_MODEL", "test-embeddings")
@@ -0,0 +1,54 @@
+"""
+Tests of the chat answer cache, with a stub OpenAI-compatible client.
+"""
+
+# Standard imports
+from types import SimpleNamespace
+
+# Third party imports
+import pytest
+
+# Internal imports
+from src.models_ia import answer_cache
+from src.models_ia.answer_cache import AnswerCache, cached_chat_completion
+
+MESSAGES = [{"role": "user", "content": "¿Cómo reinicio el router?"}]
+
+
+class CountingClient:
+    """Answers every request with its number, so that cache hits can be told apart."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **params):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(answer_cache, "_default_cache", AnswerCache(str(tmp_path / "a.sqlite")))
+
+
+def test_deterministic_answers_are_cached_by_model():
+    client = CountingClient()
+
+    first = cached_chat_completion(client, "model-a", MESSAGES, temperature=0)
+    again = cached_chat_completion(client, "model-a", MESSAGES, temperature=0)
+    other = cached_chat_completion(client, "model-b", MESSAGES, temperature=0)
+
+    assert first == again == "answer 1"
+    assert other == "answer 2"
+
+
+def test_sampled_and_unnamed_model_answers_are_not_cached():
+    client = CountingClient()
+
+    for _ in range(2):
+        cached_chat_completion(client, "model-a", MESSAGES, temperature=0.7)
+        cached_chat_completion(client, None, MESSAGES, temperature=0)
+
+    assert client.calls == 4
@@ -0,0 +1,38 @@
+"""
+Tests of the converter of the legacy pickled embeddings into the embedding cache.
+"""
+
+# Standard imports
+import pickle
+
+# Third party imports
+import pandas as pd
+import pytest
+
+# Internal imports
+from src.models_ia.embedding_cache import EmbeddingCache
+from src.rag.b_basica.convert_pickles import convert_pickle
+
+
+def test_pickled_paragraphs_seed_the_embedding_cache(tmp_path):
+    # Layout of the legacy compute_embeddings: nested embeddings, one row per paragraph
+    legacy = pd.DataFrame(
+        {
+            "page": [1, 1],
+            "paragraph": [0, 1],
+            "embeddings": [[[0.6, 0.8, 0.0]], [[0.0, 0.0, 1.0]]],
+            "text": ["Instalación de la batería.", "Puertos del chasis."],
+        }
+    )
+    pickle_path = tmp_path / "manual.pkl"
+    with open(pickle_path, "wb") as f:
+        pickle.dump(legacy, f)
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+
+    assert convert_pickle(str(pickle_path), "test-embeddings", cache) == 2
+
+    texts = ["Puertos del chasis.", "Instalación de la batería.", "Texto nuevo."]
+    cached = cache.get_many(texts, "test-embeddings", 3)
+    assert cached[0] == [0.0, 0.0, 1.0]
+    assert cached[1] == pytest.approx([0.6, 0.8, 0.0])
+    assert cached[2] is None
@@ -0,0 +1,53 @@
+"""
+Tests of the sparse BM25 index against the rank_bm25 implementation it replaces.
+"""
+
+# Third party imports
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+# Internal imports
+from src.rag.b_basica.lexical_index import LexicalIndex, tokenize
+
+CHUNKS = [
+    "El router Nokia 7750 SR usa el módulo SFP-10G-LR en el puerto 1/1/5.",
+    "La batería ZXDUPA-WR12 del router se instala en la bahía inferior.",
+    "El router Nokia admite dos fuentes de alimentación redundantes.",
+    "Router Nokia: consulte la guía de instalación del chasis antes de encender el equipo.",
+    "El puerto de consola del router Nokia usa 115200 baudios.",
+]
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["router nokia", "batería ZXDUPA-WR12", "SFP-10G-LR puerto 1/1/5", "fuentes router", "wifi"],
+)
+def test_scores_match_bm25okapi(query):
+    # "router" and "nokia" are in most chunks: negative IDFs, floored by epsilon * mean IDF
+    index = LexicalIndex(CHUNKS)
+    reference = BM25Okapi([tokenize(chunk) for chunk in CHUNKS])
+
+    expected = reference.get_scores(tokenize(query))
+    np.testing.assert_allclose(index.scores(query), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_batch_scores_match_single_queries():
+    index = LexicalIndex(CHUNKS)
+    queries = ["router nokia", "batería", "puerto de consola"]
+
+    batch = index.batch_scores(queries)
+
+    for row, query in enumerate(queries):
+        np.testing.assert_allclose(batch[row], index.scores(query), rtol=1e-6)
+
+
+@pytest.mark.parametrize("chunks", [CHUNKS[:1], CHUNKS[:2]])
+def test_tiny_segments_still_find_identifiers(chunks):
+    # Every IDF of a one- or two-chunk index is negative: the floor must stay positive
+    index = LexicalIndex(chunks)
+
+    ids, scores = index.search("SFP-10G-LR", k=3)
+
+    assert ids.tolist() == [0]
+    assert scores[0] > 0
@@ -0,0 +1,34 @@
+"""
+Tests of the retrieval of the RAG chatbot, on a stub corpus.
+"""
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Internal imports
+from src.rag.b_basica import nlp_proc
+
+
+class StubCorpus:
+    """A corpus whose question names a known identifier that the lexical index does not rank."""
+
+    def exact_identifiers(self, query, doc_ids=None):
+        return ["sfp-10g-lr"]
+
+    def lexical_search(self, query, k, doc_ids=None):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    def search(self, embedding, k, doc_ids=None):
+        return np.array([1, 0]), np.array([0.9, 0.8], dtype=np.float32)
+
+    def rows(self, ids):
+        return pd.DataFrame({"text": [f"chunk {i}" for i in ids]})
+
+
+def test_identifier_without_lexical_hits_falls_back_to_dense_retrieval():
+    rows = nlp_proc.retrieve_chunks(
+        "¿Qué alcance tiene el SFP-10G-LR?", StubCorpus(), k=2, question_embedding=[0.0]
+    )
+
+    assert rows["text"].tolist() == ["chunk 1", "chunk 0"]
@@ -0,0 +1,102 @@
+"""
+Tests of the hedging and failover of the model router.
+
+The backends are stub asynchronous clients that answer or fail after a fixed delay.
+"""
+
+# Standard imports
+import asyncio
+import time
+from types import SimpleNamespace
+
+# Internal imports
+from src.models_ia.router import Backend, ModelRouter
+
+
+class FakeAsyncClient:
+    """An asynchronous OpenAI-compatible client answering its model name after a delay."""
+
+    def __init__(self, delay: float, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.started = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model: str, messages: list, **params):
+        self.started.append(time.monotonic())
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{model} is down")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=model))])
+
+
+def backend(name: str, client: FakeAsyncClient) -> Backend:
+    return Backend(name, name, client=None, async_client=client)
+
+
+def test_losing_hedge_is_recorded_as_a_loss():
+    slow, fast = FakeAsyncClient(1.0), FakeAsyncClient(0.05)
+    router = ModelRouter([backend("slow", slow), backend("fast", fast)], hedge_delay=0.1)
+
+    response = router.chat.completions.create(messages=[])
+
+    assert response.choices[0].message.content == "fast"
+    time.sleep(0.05)  # let the cancellation of the slow request run
+    stats = router.stats()["slow"]
+    # A lower bound of its latency, kept out of its p95 and error rate
+    assert stats["loss_rate"] == 1.0
+    assert stats["p95"] is None and stats["error_rate"] == 0.0
+    assert stats["ranking_latency"] >= 0.1
+
+
+def test_backend_losing_every_race_is_demoted():
+    slow, fast = FakeAsyncClient(1.0), FakeAsyncClient(0.01)
+    router = ModelRouter([backend("slow", slow), backend("fast", fast)], hedge_delay=0.2)
+
+    durations = []
+    for _ in range(4):
+        start = time.monotonic()
+        router.chat.completions.create(messages=[])
+        durations.append(time.monotonic() - start)
+        time.sleep(0.02)
+
+    # Only the first request waited for the hedge deadline
+    assert durations[0] >= 0.2
+    assert max(durations[1:]) < 0.1
+    assert len(slow.started) == 1
+    assert [b.name for b in router.ranking()] == ["fast", "slow"]
+
+
+def test_backend_with_only_errors_goes_after_measured_ones():
+    down, fast = FakeAsyncClient(0, fail=True), FakeAsyncClient(0.01)
+    router = ModelRouter([backend("down", down), backend("fast", fast)])
+
+    router.chat.completions.create(messages=[])
+
+    assert [b.name for b in router.ranking()] == ["fast", "down"]
+
+
+def test_failover_backend_gets_its_own_deadline():
+    down, slow, fast = FakeAsyncClient(0.15, fail=True), FakeAsyncClient(0.3), FakeAsyncClient(0)
+    router = ModelRouter(
+        [backend("down", down), backend("slow", slow), backend("fast", fast)], hedge_delay=0.2
+    )
+
+    response = router.chat.completions.create(messages=[])
+
+    assert response.choices[0].message.content == "fast"
+    # Hedged once the promoted backend had run for hedge_delay, not the failed one
+    assert fast.started[0] - slow.started[0] >= 0.2
+
+
+def test_streamed_requests_stay_out_of_the_latencies():
+    def lazy_stream(model, messages, stream, **params):
+        yield from ["Hola", " mundo"]
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lazy_stream)))
+    router = ModelRouter([Backend("local", "local", client=client)])
+
+    assert list(router.chat.completions.create(messages=[], stream=True)) == ["Hola", " mundo"]
+    stats = router.stats()["local"]
+    assert stats["samples"] == 1
+    assert stats["completed"] == 0 and stats["ranking_latency"] is None
@@ -0,0 +1,123 @@
+"""
+Tests of the rate-limit-aware scheduler of the embedding requests.
+
+The provider is replaced by stub callables that fail the way the OpenAI client does.
+"""
+
+# Standard imports
+import threading
+import time
+from types import SimpleNamespace
+
+# Third party imports
+import httpx
+import pytest
+from openai import APIConnectionError
+
+# Internal imports
+from src.models_ia.scheduler import RateLimitScheduler, is_transient, retry_after_seconds
+
+
+class FakeStatusError(Exception):
+    """An HTTP error of the provider, with its status code and response headers."""
+
+    def __init__(self, status_code: int, headers: dict | None = None) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def connection_error() -> APIConnectionError:
+    return APIConnectionError(request=httpx.Request("POST", "http://test/v1/embeddings"))
+
+
+def test_retry_after_seconds_reads_headers():
+    assert retry_after_seconds(FakeStatusError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(FakeStatusError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(FakeStatusError(429)) is None
+
+
+def test_is_transient():
+    assert is_transient(connection_error())
+    assert is_transient(FakeStatusError(502))
+    assert not is_transient(FakeStatusError(429))
+    assert not is_transient(FakeStatusError(400))
+    assert not is_transient(ValueError("bad input"))
+
+
+def test_rate_limit_halves_concurrency():
+    scheduler = RateLimitScheduler(max_concurrency=4, max_retries=2, base_delay=0.01)
+    limits = []
+
+    def request(item: int) -> int:
+        limits.append(scheduler.concurrency)
+        if len(limits) == 1:
+            raise FakeStatusError(429)
+        return item
+
+    assert scheduler.map(request, [7]) == [7]
+    # Retried under half the limit, which one success is not enough to raise again
+    assert limits == [4, 2]
+    assert scheduler.concurrency == 2
+
+
+def test_rate_limit_pauses_every_request():
+    scheduler = RateLimitScheduler(max_concurrency=4, max_retries=2, base_delay=0.01)
+    lock = threading.Lock()
+    starts = []
+    rate_limited_at = []
+
+    def request(item: int) -> int:
+        with lock:
+            starts.append(time.monotonic())
+            first_call = item == 0 and not rate_limited_at
+            if first_call:
+                rate_limited_at.append(time.monotonic())
+        if first_call:
+            raise FakeStatusError(429, {"retry-after-ms": "200"})
+        time.sleep(0.02)
+        return item * 10
+
+    results = scheduler.map(request, list(range(8)))
+
+    assert results == [item * 10 for item in range(8)]
+    # No request started during the pause asked by the retry-after-ms header
+    after = [start for start in starts if start > rate_limited_at[0]]
+    assert after
+    assert min(after) >= rate_limited_at[0] + 0.2
+
+
+def test_transient_errors_are_retried_without_lowering_concurrency():
+    scheduler = RateLimitScheduler(max_concurrency=4, max_retries=3, base_delay=0.01)
+    failures = {1: [connection_error()], 2: [FakeStatusError(502), FakeStatusError(503)]}
+    lock = threading.Lock()
+
+    def request(item: int) -> int:
+        with lock:
+            pending = failures.get(item)
+            error = pending.pop(0) if pending else None
+        if error is not None:
+            raise error
+        return item
+
+    assert scheduler.map(request, list(range(4))) == [0, 1, 2, 3]
+    assert scheduler.concurrency == 4
+
+
+def test_client_errors_and_exhausted_retries_are_raised():
+    scheduler = RateLimitScheduler(max_concurrency=2, max_retries=2, base_delay=0.001)
+    calls = []
+
+    def bad_request(item: int) -> int:
+        raise FakeStatusError(400)
+
+    def always_down(item: int) -> int:
+        calls.append(item)
+        raise FakeStatusError(502)
+
+    with pytest.raises(FakeStatusError):
+        scheduler.map(bad_request, [0, 1])
+    with pytest.raises(FakeStatusError):
+        scheduler.map(always_down, [0])
+    # The first attempt and its two retries
+    assert len(calls) == 3
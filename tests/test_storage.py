@@ -0,0 +1,36 @@
+"""
+Tests of the columnar embedding stores.
+"""
+
+# Standard imports
+import os
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Internal imports
+from src.rag.b_basica import storage
+
+
+def store(count: int, value: float) -> tuple[pd.DataFrame, np.ndarray, dict]:
+    chunks = pd.DataFrame({"text": [f"chunk {i}" for i in range(count)]})
+    vectors = np.full((count, 4), value, dtype=np.float32)
+    return chunks, vectors, {"model": "test-embeddings", "dimension": 4}
+
+
+def test_replacing_a_store_keeps_open_memory_maps(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DATA_PATH", tmp_path)
+    monkeypatch.setattr(storage, "IS_AWS_AVAILABLE", False)
+    assert storage.upload_embeddings("doc", *store(3, 0.5))
+    _, mapped, _ = storage.download_embeddings("doc")
+
+    assert storage.upload_embeddings("doc", *store(5, 0.25))
+
+    # The previous vectors are still readable through the old memory map
+    assert mapped.shape == (3, 4)
+    assert float(mapped.sum()) == 6.0
+    chunks, vectors, manifest = storage.download_embeddings("doc")
+    assert manifest["count"] == len(chunks) == len(vectors) == 5
+    # No staging folder is left next to the stores
+    assert os.listdir(tmp_path / "embeddings") == ["doc"]
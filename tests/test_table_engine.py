@@ -0,0 +1,33 @@
+"""
+Tests of the SQLite query engine of the tabular uploads.
+"""
+
+# Third party imports
+import pyarrow as pa
+
+# Internal imports
+from src.rag.b_basica.table_engine import TableEngine
+
+
+def text_table(names: list[str], rows: list[list[str]]) -> pa.Table:
+    columns = [pa.array([row[i] for row in rows], pa.string()) for i in range(len(names))]
+    return pa.table(columns, names=names)
+
+
+def test_duplicate_headers_are_renamed(tmp_path):
+    batch = text_table(["a", "a", "A"], [["1", "2", "x"], ["3", "4", "y"]])
+
+    engine = TableEngine.ingest(str(tmp_path / "dup.sqlite"), [batch])
+
+    assert list(engine.columns) == ["a", "a.1", "A.2"]
+    assert engine.row_count == 2
+
+
+def test_source_column_named_like_the_row_number_is_renamed(tmp_path):
+    batch = text_table(["__row", "vendor", "norm"], [["7", "Nokia", "x"], ["8", "Cisco", "y"]])
+
+    engine = TableEngine.ingest(str(tmp_path / "row.sqlite"), [batch])
+
+    assert list(engine.columns) == ["__row.1", "vendor", "norm"]
+    # The row numbers are still the positions of the rows
+    assert engine.rows([0, 1]) == {0: "7 | Nokia | x", 1: "8 | Cisco | y"}